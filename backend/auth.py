@@ -16,6 +16,8 @@ USERS_FILE = "users.json"
 
 pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Same scheme, but a missing token yields None instead of a 401
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 # DATABASE HELPERS
 
@@ -109,4 +111,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     user = get_user(username)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+async def get_optional_user(token: Optional[str] = Depends(oauth2_scheme_optional)):
+    """The current user when a token is sent, None for anonymous requests."""
+    if not token:
+        return None
+    return await get_current_user(token)
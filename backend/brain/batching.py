@@ -0,0 +1,113 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of a model. One worker thread owns the model;
+    callers submit() single items and get a Future back. The worker takes the first
+    waiting item, lingers up to batch_wait_ms for more (at most max_batch in total),
+    and hands the whole list to process_batch, which returns one result per item.
+    Under load batches fill up on their own; when idle a request waits at most
+    batch_wait_ms.
+    """
+
+    # Upper bounds of the batch-size histogram buckets
+    SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+    def __init__(self, process_batch, max_batch: int = 8, batch_wait_ms: float = 10, name: str = "batcher"):
+        self._process_batch = process_batch
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.largest_batch = 0
+        self.total_batch_ms = 0.0
+        self.histogram = [0] * (len(self.SIZE_BUCKETS) + 1)
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        self._ensure_thread()
+        return future
+
+    async def run(self, item):
+        """submit() for async callers."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def on_start(self):
+        """Hook run once on the worker thread before the first batch."""
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # Callers that gave up while queued are dropped here
+        return [job for job in batch if job[1].set_running_or_notify_cancel()]
+
+    def _run(self):
+        self.on_start()
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            failed = False
+            try:
+                results = list(self._process_batch([item for item, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: {len(results)} results for a batch of {len(batch)}")
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                failed = True
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self._record(len(batch), (time.perf_counter() - start) * 1000, failed)
+
+    def _record(self, size: int, elapsed_ms: float, failed: bool):
+        with self._stats_lock:
+            self.batches += 1
+            self.items += size
+            self.errors += failed
+            self.largest_batch = max(self.largest_batch, size)
+            self.total_batch_ms += elapsed_ms
+            bucket = next((i for i, b in enumerate(self.SIZE_BUCKETS) if size <= b), len(self.SIZE_BUCKETS))
+            self.histogram[bucket] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            labels = [f"<={b}" for b in self.SIZE_BUCKETS] + [f">{self.SIZE_BUCKETS[-1]}"]
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch": self.max_batch,
+                "batch_wait_ms": self.batch_wait * 1000,
+                "batches": self.batches,
+                "requests": self.items,
+                "errors": self.errors,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+                "largest_batch": self.largest_batch,
+                "batch_size_histogram": dict(zip(labels, self.histogram)),
+                "avg_batch_ms": round(self.total_batch_ms / self.batches, 1) if self.batches else None,
+            }
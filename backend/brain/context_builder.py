@@ -0,0 +1,125 @@
+import os
+import threading
+
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
+
+from . import memory_manager
+
+# CONFIGURATION
+# Total prompt budget (estimated tokens) for one LLM call, minus room for the reply
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+RESPONSE_TOKEN_RESERVE = int(os.getenv("RESPONSE_TOKEN_RESERVE", "512"))
+
+# Messages that must pile up outside the verbatim window before the summary is redone
+SUMMARY_REFRESH_TURNS = int(os.getenv("SUMMARY_REFRESH_TURNS", "8"))
+# Upper bound on messages folded into the summary by one refresh
+SUMMARY_MAX_BATCH = int(os.getenv("SUMMARY_MAX_BATCH", "40"))
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _to_message(msg) -> BaseMessage:
+    if isinstance(msg, BaseMessage):
+        return msg
+    if msg.get("role") == "human":
+        return HumanMessage(content=msg.get("content", ""))
+    return AIMessage(content=msg.get("content", ""))
+
+
+class HistoryWindow:
+    """
+    Filled in by build_messages: seq of the oldest history message sent word for word
+    (None when history carries no seqs). Everything before it belongs in the summary.
+    Across several calls for one turn (e.g. a search follow-up) the narrowest window wins.
+    """
+
+    def __init__(self):
+        self.start_seq = None
+
+    def record(self, seq: int):
+        self.start_seq = seq if self.start_seq is None else max(self.start_seq, seq)
+
+
+def build_messages(system_text: str, user_text: str, history=(), memory_context: str = "",
+                   summary: str = "", search_results: str = "", budget: int = None,
+                   window: HistoryWindow = None) -> list:
+    """
+    Assemble the message list for one LLM call within a token budget.
+    Fixed parts (system prompt, memories, rolling summary, search results, current turn) always go in;
+    history is kept word for word from the newest message backwards until the budget runs out.
+    Pass a HistoryWindow to learn where the kept history starts.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+
+    head = [SystemMessage(content=system_text)]
+    if memory_context:
+        head.append(SystemMessage(content=f"Long Term Memory Context: {memory_context}"))
+    if summary:
+        head.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+    if search_results:
+        head.append(SystemMessage(content=(
+            f"Web search results:\n{search_results}\n\n"
+            "Answer the user's latest message using these results. "
+            "Respond normally; do not output JSON or call a tool."
+        )))
+
+    remaining = budget - RESPONSE_TOKEN_RESERVE - memory_manager.estimate_tokens(user_text)
+    remaining -= sum(memory_manager.estimate_tokens(m.content) for m in head)
+
+    history = list(history)
+    recent = []
+    for msg in reversed(history):
+        msg = _to_message(msg)
+        cost = memory_manager.estimate_tokens(msg.content)
+        if cost > remaining:
+            break
+        remaining -= cost
+        recent.append(msg)
+    recent.reverse()
+
+    if window is not None and history and isinstance(history[-1], dict) and "seq" in history[-1]:
+        # Nothing kept: the window starts after the newest loaded message
+        first = history[len(history) - len(recent)] if recent else None
+        window.record(first["seq"] if first else history[-1]["seq"] + 1)
+
+    return [*head, *recent, HumanMessage(content=user_text)]
+
+
+def refresh_summary(chat_id: str, user_id: str, window_start_seq: int) -> bool:
+    """
+    Fold messages older than the verbatim window into the chat's cached rolling summary.
+    Does nothing until SUMMARY_REFRESH_TURNS unsummarized messages have accumulated.
+    Meant to run after the response is sent; returns True when the summary changed.
+    """
+    key = (user_id, chat_id)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    try:
+        current = memory_manager.get_chat_summary(chat_id, user_id) or {}
+        upto_seq = current.get("upto_seq", -1)
+        pending = window_start_seq - upto_seq - 1
+        if pending < SUMMARY_REFRESH_TURNS:
+            return False
+
+        batch = memory_manager.get_history_page(chat_id, user_id, before=window_start_seq, limit=pending)
+        batch = batch[:SUMMARY_MAX_BATCH]
+        if not batch:
+            return False
+
+        from . import llm_services
+        text = llm_services.summarize_conversation(current.get("text", ""), batch)
+        if not text:
+            return False
+
+        memory_manager.save_chat_summary(chat_id, user_id, text, batch[-1]["seq"])
+        return True
+    except Exception as e:
+        print(f"⚠️ Summary refresh failed for chat {chat_id}: {e}")
+        return False
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
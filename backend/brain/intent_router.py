@@ -0,0 +1,210 @@
+import os
+import re
+import threading
+
+# CONFIGURATION
+# Obvious device commands ("open notepad", "set volume to 40") are turned into the
+# local_action JSON here instead of asking the LLM to write it
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "true").lower() in ("1", "true", "yes")
+
+# ---------------- APP TABLE ----------------
+# Keys of the allow-list in local_agent/os_controller.open_application, with their executables.
+# Anything not listed here is left to the LLM (and would be refused by the agent anyway).
+APPS = {
+    "notepad": "notepad.exe",
+    "calculator": "calc.exe",
+    "paint": "mspaint.exe",
+    "cmd": "cmd.exe",
+    "powershell": "powershell.exe",
+    "task_manager": "taskmgr.exe",
+    "control_panel": "control.exe",
+    "settings": "ms-settings:",
+    "file_explorer": "explorer.exe",
+    "snipping_tool": "snippingtool.exe",
+    "character_map": "charmap.exe",
+    "on_screen_keyboard": "osk.exe",
+    "magnifier": "magnify.exe",
+    "chrome": "chrome.exe",
+    "edge": "msedge.exe",
+    "firefox": "firefox.exe",
+    "brave": "brave.exe",
+    "opera": "opera.exe",
+    "word": "winword.exe",
+    "excel": "excel.exe",
+    "powerpoint": "powerpnt.exe",
+    "outlook": "outlook.exe",
+    "onenote": "onenote.exe",
+    "vscode": "Code.exe",
+    "pycharm": "pycharm64.exe",
+    "intellij": "idea64.exe",
+    "git_bash": "git-bash.exe",
+    "spotify": "spotify.exe",
+    "vlc": "vlc.exe",
+    "windows_media_player": "wmplayer.exe",
+    "discord": "discord.exe",
+    "teams": "ms-teams.exe",
+    "zoom": "zoom.exe",
+    "skype": "skype.exe",
+    "steam": "steam.exe",
+    "obs": "obs64.exe",
+    "virtualbox": "VirtualBox.exe",
+    "docker_desktop": "Docker Desktop.exe",
+}
+
+# Spoken names for app keys, besides the key itself with "_" read as a space
+APP_ALIASES = {
+    "calc": "calculator",
+    "command prompt": "cmd",
+    "terminal": "cmd",
+    "control panel": "control_panel",
+    "explorer": "file_explorer",
+    "windows explorer": "file_explorer",
+    "file manager": "file_explorer",
+    "snipping tool": "snipping_tool",
+    "google chrome": "chrome",
+    "microsoft edge": "edge",
+    "mozilla firefox": "firefox",
+    "ms word": "word",
+    "microsoft word": "word",
+    "microsoft excel": "excel",
+    "microsoft powerpoint": "powerpoint",
+    "microsoft outlook": "outlook",
+    "microsoft teams": "teams",
+    "vs code": "vscode",
+    "visual studio code": "vscode",
+    "media player": "windows_media_player",
+    "vlc player": "vlc",
+    "obs studio": "obs",
+    "docker": "docker_desktop",
+}
+
+# Browsers close_website knows how to close
+BROWSERS = ("chrome", "edge", "firefox")
+
+# Without an explicit http(s):// a name only counts as a website if it ends in one of these,
+# so files like "report.pdf", "config.py" or "notepad.exe" are left to the LLM
+WEBSITE_TLDS = frozenset(
+    "com org net edu gov mil int io ai dev app co uk us ca au in de fr es it nl se no jp cn kr br "
+    "ru ch eu me tv info biz news tech gg ly fm".split()
+)
+
+
+def _app_names() -> dict:
+    names = {key.replace("_", " "): key for key in APPS}
+    names.update(APP_ALIASES)
+    return names
+
+
+_APP_NAMES = _app_names()
+# Longest names first, so "google chrome" wins over "chrome"
+_APP = "|".join(re.escape(n) for n in sorted(_APP_NAMES, key=len, reverse=True))
+
+# ---------------- PATTERNS ----------------
+# Every pattern must match the whole (normalized) utterance. Anything with extra words
+# ("open notepad and write a poem") falls through to the LLM.
+_FILLER_START = re.compile(r"^(?:(?:hey |ok |okay )?jarvis[, ]+)?(?:(?:please|can you|could you|would you|kindly) )*")
+_FILLER_END = re.compile(r"(?: (?:please|for me|now|jarvis))*$")
+
+_OPEN_APP = re.compile(rf"^(?:open|launch|start|run|fire up) (?:the |my )?(?P<app>{_APP})(?: app| application| program)?$")
+_CLOSE_APP = re.compile(rf"^(?:close|quit|exit|kill|shut down|shutdown) (?:the |my )?(?P<app>{_APP})(?: app| application| program)?$")
+_CLOSE_BROWSER = re.compile(rf"^(?:close|quit|exit) (?:the |my )?(?P<browser>{'|'.join(BROWSERS)}) (?:browser|window|tabs?)$")
+_OPEN_WEBSITE = re.compile(
+    r"^(?:open|go to|goto|visit|browse to|navigate to|take me to) (?:the website |the site |website |site )?"
+    r"(?P<url>(?:https?://)?(?:[a-z0-9-]+\.)+[a-z]{2,}(?:/\S*)?)$"
+)
+_SET_VOLUME = re.compile(
+    r"^(?:(?:set|change|turn|put|adjust) (?:the )?(?:system |computer |pc )?volume (?:to |at )?|volume (?:to |at )?)"
+    r"(?P<level>\d{1,3})(?: ?%| percent)?$"
+)
+
+
+def normalize(text: str) -> str:
+    text = " ".join(text.casefold().split()).strip(" .!?")
+    text = _FILLER_START.sub("", text)
+    return _FILLER_END.sub("", text).strip(" ,")
+
+
+def _close_target(app: str) -> str:
+    # close_application kills "<app>.exe", so send the executable's name
+    exe = APPS[app]
+    return exe[:-4] if exe.lower().endswith(".exe") else app
+
+
+def route(text: str):
+    """
+    The local_action for an unambiguous device command, in the same shape the LLM emits,
+    or None when the text should go to the LLM. Destructive and path-based actions
+    (delete_file, create_folder, run_exe) are never routed here.
+    """
+    utterance = normalize(text)
+    if not utterance:
+        return None
+
+    m = _OPEN_APP.match(utterance)
+    if m:
+        return {"type": "local_action", "action": "open_app", "app": _APP_NAMES[m["app"]]}
+
+    m = _CLOSE_BROWSER.match(utterance)
+    if m:
+        return {"type": "local_action", "action": "close_website", "browser": m["browser"]}
+
+    m = _CLOSE_APP.match(utterance)
+    if m:
+        app = _APP_NAMES[m["app"]]
+        # close_application runs an unquoted "taskkill /IM <app>.exe", so names with spaces can't go through it
+        if not APPS[app].lower().endswith(".exe") or " " in APPS[app]:
+            return None
+        return {"type": "local_action", "action": "close_app", "app": _close_target(app)}
+
+    m = _OPEN_WEBSITE.match(utterance)
+    if m:
+        url = m["url"]
+        if url.startswith("http"):
+            return {"type": "local_action", "action": "open_website", "url": url}
+        if url.split("/")[0].rsplit(".", 1)[1] in WEBSITE_TLDS:
+            return {"type": "local_action", "action": "open_website", "url": f"https://{url}"}
+        return None
+
+    m = _SET_VOLUME.match(utterance)
+    if m and int(m["level"]) <= 100:
+        return {"type": "local_action", "action": "set_volume", "level": int(m["level"])}
+
+    return None
+
+
+# ---------------- METRICS ----------------
+class RouterStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routed = {}
+        self.passed = 0
+
+    def record(self, cmd):
+        with self._lock:
+            if cmd is None:
+                self.passed += 1
+            else:
+                self.routed[cmd["action"]] = self.routed.get(cmd["action"], 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routed = sum(self.routed.values())
+            total = routed + self.passed
+            return {
+                "enabled": INTENT_ROUTER,
+                "routed": dict(self.routed),
+                "passed_to_llm": self.passed,
+                "route_rate": round(routed / total, 4) if total else 0.0,
+            }
+
+
+stats = RouterStats()
+
+
+def match(text: str):
+    """route() when the router is enabled, with the outcome counted for /status."""
+    if not INTENT_ROUTER:
+        return None
+    cmd = route(text)
+    stats.record(cmd)
+    return cmd
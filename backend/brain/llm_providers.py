@@ -0,0 +1,438 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+import groq
+import httpx
+from langchain_groq import ChatGroq
+
+from .remote_calls import LatencyStats, LoopAsyncClient
+
+# ---------------- CONFIG ----------------
+# Providers tried in order; ones that aren't configured are left out:
+#   groq          - GROQ_MODEL on Groq (needs GROQ_API_KEY)
+#   groq_fallback - a smaller Groq model, GROQ_FALLBACK_MODEL
+#   local         - any OpenAI-compatible server (Ollama, llama.cpp, vLLM...) at LOCAL_LLM_BASE_URL
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "groq,groq_fallback,local")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+GROQ_FALLBACK_MODEL = os.getenv("GROQ_FALLBACK_MODEL", "llama-3.1-8b-instant")
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "")  # e.g. http://localhost:11434/v1
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "llama3.2")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+
+# One attempt may take LLM_TIMEOUT seconds; a whole call, retries and failover included, LLM_DEADLINE
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "45"))
+# Retries per provider on 429/5xx/timeouts, with exponential backoff (seconds) and jitter
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+# A provider that failed this many calls in a row is skipped for LLM_BREAKER_RESET seconds
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+# ---------------- ERRORS ----------------
+class ProviderError(Exception):
+    """A failed LLM call, classified for the retry and failover logic."""
+
+    def __init__(self, message: str, status: int = None, kind: str = "other",
+                 retryable: bool = False, retry_after: float = None):
+        super().__init__(message)
+        self.status = status
+        self.kind = kind
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _from_status(status: int, message: str, retry_after: float = None) -> ProviderError:
+    kind = "429" if status == 429 else "5xx" if status >= 500 else "4xx"
+    return ProviderError(message, status=status, kind=kind,
+                         retryable=status in RETRY_STATUSES, retry_after=retry_after)
+
+
+def classify(error: Exception) -> ProviderError:
+    """Map client library errors onto ProviderError."""
+    if isinstance(error, ProviderError):
+        return error
+    if isinstance(error, groq.APIStatusError):
+        return _from_status(error.status_code, str(error), _retry_after(error.response))
+    if isinstance(error, (groq.APITimeoutError, httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return ProviderError(str(error) or "timed out", kind="timeout", retryable=True)
+    if isinstance(error, (groq.APIConnectionError, httpx.TransportError, ConnectionError)):
+        return ProviderError(str(error), kind="connection", retryable=True)
+    return ProviderError(f"{type(error).__name__}: {error}")
+
+
+# ---------------- METRICS ----------------
+class ProviderStats(LatencyStats):
+    """Per-provider latency histogram, retries and error counts by kind, exposed through /status."""
+
+    BUCKETS_MS = (250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def _reset(self):
+        super()._reset()
+        self.retries = 0
+        self.error_kinds = {}
+
+    def _record_error(self, error: ProviderError):
+        self.error_kinds[error.kind] = self.error_kinds.get(error.kind, 0) + 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def _snapshot(self) -> dict:
+        return {**super()._snapshot(), "retries": self.retries, "errors": dict(self.error_kinds)}
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `failures` failed calls in a row it opens and the
+    provider is skipped; after `reset_seconds` one trial call is let through (half-open),
+    which closes the breaker on success and reopens it on failure.
+    """
+
+    def __init__(self, failures: int = None, reset_seconds: float = None):
+        self.failures = failures or LLM_BREAKER_FAILURES
+        self.reset_seconds = LLM_BREAKER_RESET if reset_seconds is None else reset_seconds
+        self._lock = threading.Lock()
+        self._count = 0
+        self._opened_at = None
+        self._trial_at = None  # a trial that never reports back expires after reset_seconds
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._trial_at is not None or time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_seconds:
+                return False
+            if self._trial_at is not None and now - self._trial_at < self.reset_seconds:
+                return False
+            self._trial_at = now
+            return True
+
+    def success(self):
+        with self._lock:
+            self._count = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def failure(self):
+        with self._lock:
+            self._count += 1
+            if self._trial_at is not None or self._count >= self.failures:
+                self._opened_at = time.monotonic()
+                self._trial_at = None
+
+
+# ---------------- PROVIDERS ----------------
+class Provider:
+    """One model behind one API. Subclasses return plain text."""
+
+    def __init__(self, name: str, model: str, timeout: float = None):
+        self.name = name
+        self.model = model
+        self.timeout = timeout or LLM_TIMEOUT
+        self.breaker = CircuitBreaker()
+        self.stats = ProviderStats()
+
+    def complete(self, messages: list, timeout: float) -> str:
+        raise NotImplementedError
+
+    async def acomplete(self, messages: list, timeout: float) -> str:
+        raise NotImplementedError
+
+    async def astream(self, messages: list, timeout: float):
+        raise NotImplementedError
+        yield
+
+    def close(self):
+        pass
+
+
+class GroqProvider(Provider):
+    def __init__(self, name: str, model: str, api_key: str, timeout: float = None):
+        super().__init__(name, model, timeout)
+        # Retries are ours, so the client must not retry on its own
+        self.llm = ChatGroq(
+            groq_api_key=api_key,
+            model_name=model,
+            temperature=LLM_TEMPERATURE,
+            request_timeout=self.timeout,
+            max_retries=0,
+        )
+
+    def complete(self, messages: list, timeout: float) -> str:
+        return self.llm.invoke(messages, timeout=timeout).content
+
+    async def acomplete(self, messages: list, timeout: float) -> str:
+        return (await self.llm.ainvoke(messages, timeout=timeout)).content
+
+    async def astream(self, messages: list, timeout: float):
+        async for chunk in self.llm.astream(messages, timeout=timeout):
+            if chunk.content:
+                yield chunk.content
+
+
+class OpenAICompatibleProvider(Provider):
+    """
+    Chat completions over plain httpx against any OpenAI-compatible server.
+    Connections are pooled and kept alive between calls.
+    """
+
+    _ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: str = "", timeout: float = None):
+        super().__init__(name, model, timeout)
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._limits = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+        self._client = httpx.Client(headers=self._headers, limits=self._limits)
+        self._aclient = LoopAsyncClient(headers=self._headers, limits=self._limits)
+
+    def _payload(self, messages: list, stream: bool = False) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": self._ROLES.get(m.type, "user"), "content": m.content} for m in messages],
+            "temperature": LLM_TEMPERATURE,
+            "stream": stream,
+        }
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code >= 400:
+            raise _from_status(response.status_code, f"HTTP {response.status_code}", _retry_after(response))
+
+    def complete(self, messages: list, timeout: float) -> str:
+        response = self._client.post(self.url, json=self._payload(messages), timeout=timeout)
+        self._check(response)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def acomplete(self, messages: list, timeout: float) -> str:
+        response = await self._aclient.get().post(self.url, json=self._payload(messages), timeout=timeout)
+        self._check(response)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def astream(self, messages: list, timeout: float):
+        request = self._aclient.get().stream("POST", self.url, json=self._payload(messages, True), timeout=timeout)
+        async with request as response:
+            if response.status_code >= 400:
+                await response.aread()
+            self._check(response)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    def close(self):
+        self._client.close()
+        self._aclient.reset()
+
+
+# ---------------- CHAIN ----------------
+class ProviderChain:
+    """
+    Ordered failover over providers. Each provider gets up to max_retries retries on
+    retryable errors, with backoff; other errors, exhausted retries and open circuit
+    breakers move on to the next provider. Everything stays within `deadline` seconds.
+    A stream only fails over before its first delta has been yielded.
+    """
+
+    def __init__(self, providers: list, deadline: float = None, max_retries: int = None):
+        self.providers = providers
+        self.deadline = deadline or LLM_DEADLINE
+        self.max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+        self._lock = threading.Lock()
+        self.failovers = 0
+
+    def _backoff(self, attempt: int, error: ProviderError) -> float:
+        delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if error.retry_after is not None:
+            delay = max(delay, min(error.retry_after, LLM_BACKOFF_MAX))
+        return delay
+
+    def _failed(self, provider: Provider, error: Exception, start: float) -> ProviderError:
+        err = classify(error)
+        provider.stats.record((time.perf_counter() - start) * 1000, err)
+        print(f"⚠️ LLM provider {provider.name} failed ({err.status or err.kind}): {err}")
+        return err
+
+    def _succeeded(self, provider: Provider, start: float):
+        provider.stats.record((time.perf_counter() - start) * 1000)
+        provider.breaker.success()
+
+    def _retry_delay(self, provider: Provider, attempt: int, err: ProviderError, deadline: float):
+        """Seconds to wait before retrying `provider`, or None to give up on it."""
+        if not err.retryable or attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt, err)
+        if time.monotonic() + delay >= deadline:
+            return None
+        provider.stats.record_retry()
+        return delay
+
+    def _give_up(self, provider: Provider):
+        provider.breaker.failure()
+        if provider is not self.providers[-1]:
+            with self._lock:
+                self.failovers += 1
+
+    def _exhausted(self, last: ProviderError) -> ProviderError:
+        return last or ProviderError("No LLM provider available", kind="unavailable")
+
+    def invoke(self, messages: list) -> str:
+        deadline = time.monotonic() + self.deadline
+        last = None
+        for provider in self.providers:
+            if not provider.breaker.allow():
+                continue
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ProviderError("LLM deadline exceeded", kind="timeout")
+                start = time.perf_counter()
+                try:
+                    text = provider.complete(messages, min(provider.timeout, remaining))
+                except Exception as e:
+                    last = self._failed(provider, e, start)
+                    delay = self._retry_delay(provider, attempt, last, deadline)
+                    if delay is None:
+                        break
+                    time.sleep(delay)
+                    continue
+                self._succeeded(provider, start)
+                return text
+            self._give_up(provider)
+        raise self._exhausted(last)
+
+    async def ainvoke(self, messages: list) -> str:
+        deadline = time.monotonic() + self.deadline
+        last = None
+        for provider in self.providers:
+            if not provider.breaker.allow():
+                continue
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ProviderError("LLM deadline exceeded", kind="timeout")
+                timeout = min(provider.timeout, remaining)
+                start = time.perf_counter()
+                try:
+                    text = await asyncio.wait_for(provider.acomplete(messages, timeout), timeout)
+                except Exception as e:
+                    last = self._failed(provider, e, start)
+                    delay = self._retry_delay(provider, attempt, last, deadline)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+                    continue
+                self._succeeded(provider, start)
+                return text
+            self._give_up(provider)
+        raise self._exhausted(last)
+
+    async def astream(self, messages: list):
+        deadline = time.monotonic() + self.deadline
+        last = None
+        for provider in self.providers:
+            if not provider.breaker.allow():
+                continue
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ProviderError("LLM deadline exceeded", kind="timeout")
+                produced = False
+                start = time.perf_counter()
+                stream = provider.astream(messages, min(provider.timeout, remaining))
+                try:
+                    # The deadline bounds every delta, so a trickling stream can't outlive it
+                    while True:
+                        try:
+                            delta = await asyncio.wait_for(stream.__anext__(), deadline - time.monotonic())
+                        except StopAsyncIteration:
+                            break
+                        produced = True
+                        yield delta
+                except Exception as e:
+                    last = self._failed(provider, e, start)
+                    if produced:
+                        provider.breaker.failure()
+                        raise last from e
+                    delay = self._retry_delay(provider, attempt, last, deadline)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+                    continue
+                finally:
+                    await stream.aclose()
+                self._succeeded(provider, start)
+                return
+            self._give_up(provider)
+        raise self._exhausted(last)
+
+    def stats(self) -> dict:
+        return {
+            "deadline_s": self.deadline,
+            "max_retries": self.max_retries,
+            "failovers": self.failovers,
+            "providers": [
+                {"name": p.name, "model": p.model, "circuit": p.breaker.state, **p.stats.snapshot()}
+                for p in self.providers
+            ],
+        }
+
+    def close(self):
+        for provider in self.providers:
+            provider.close()
+
+
+def _build_provider(name: str):
+    groq_key = os.getenv("GROQ_API_KEY")
+    if name == "groq":
+        return GroqProvider("groq", GROQ_MODEL, groq_key) if groq_key else None
+    if name == "groq_fallback":
+        return GroqProvider("groq_fallback", GROQ_FALLBACK_MODEL, groq_key) if groq_key and GROQ_FALLBACK_MODEL else None
+    if name == "local":
+        return OpenAICompatibleProvider("local", LOCAL_LLM_BASE_URL, LOCAL_LLM_MODEL, LOCAL_LLM_API_KEY) if LOCAL_LLM_BASE_URL else None
+    print(f"⚠️ Unknown LLM provider '{name}' in LLM_PROVIDERS")
+    return None
+
+
+def build_chain() -> ProviderChain:
+    """The configured providers from LLM_PROVIDERS, in order."""
+    names = [n.strip() for n in LLM_PROVIDERS.split(",") if n.strip()]
+    return ProviderChain([p for p in map(_build_provider, names) if p is not None])
+
+
+def any_configured() -> bool:
+    """True when at least one provider has what it needs to be built."""
+    return bool(os.getenv("GROQ_API_KEY") or LOCAL_LLM_BASE_URL)
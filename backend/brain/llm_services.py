@@ -11,31 +11,35 @@ else:
     load_dotenv()
 
 # IMPORTS 
-from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
+from . import context_builder
+from . import llm_providers
+
 # LOAD ENVIRONMENT VARIABLES
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Stand-in replies when the model can't answer; never worth caching or repeating
+UNAVAILABLE_REPLY = "I couldn't contact the language model right now; please try again later."
+FAILED_REPLY = "I apologize, sir. My neural pathways failed to generate a response."
+
 class Brain:
     def __init__(self):
         # Initialize state; do NOT perform heavy network ops here without handling errors.
         self.llm = None
         self._init_error = None
 
-        # Attempt to initialize the ChatGroq client only if the env var is present
-        groq_key = os.getenv("GROQ_API_KEY")
-        if not groq_key:
-            self._init_error = "GROQ_API_KEY not set"
+        # Build the provider chain from whatever is configured (Groq key, local endpoint)
+        if not llm_providers.any_configured():
+            self._init_error = "No LLM provider configured (set GROQ_API_KEY or LOCAL_LLM_BASE_URL)"
             return
 
         try:
-            # Initialize Groq 
-            self.llm = ChatGroq(
-                groq_api_key=groq_key,
-                model_name="llama-3.3-70b-versatile",
-                temperature=0.3,
-            )
+            # Groq first, then the fallbacks in LLM_PROVIDERS order
+            self.llm = llm_providers.build_chain()
+            if not self.llm.providers:
+                self._init_error = "No LLM provider in LLM_PROVIDERS is configured"
+                return
 
             # UPDATED SYSTEM MESSAGE (
             # This teaches Jarvis to output JSON when he needs to search
@@ -106,53 +110,90 @@ class Brain:
             # Capture initialization errors and avoid raising during import
             self._init_error = str(e)
 
-    def generate_response(self, user_text, chat_history=[], context=""):
-        # Convert Chat History
-        formatted_history = []
+    def generate_response(self, user_text, chat_history=[], context="", summary="", search_results="", window=None):
+        try:
+            # Fit system prompt, memories, rolling summary and recent turns into the budget
+            all_messages = context_builder.build_messages(
+                self.system_message_text,
+                user_text,
+                history=chat_history,
+                memory_context=context,
+                summary=summary,
+                search_results=search_results,
+                window=window,
+            )
 
-        if context:
-            formatted_history.append(SystemMessage(content=f"Long Term Memory Context: {context}"))
+            return self.llm.invoke(all_messages)
 
-        for msg in chat_history:
-            if isinstance(msg, dict):
-                if msg.get('role') == 'human':
-                    formatted_history.append(HumanMessage(content=msg.get('content')))
-                else:
-                    formatted_history.append(AIMessage(content=msg.get('content')))
-            else:
-                formatted_history.append(msg)
+        except Exception as e:
+            # Catch any unexpected error
+            print(f"❌ generate_response error: {e}")
+            return FAILED_REPLY
 
+    async def agenerate_response(self, user_text, chat_history=[], context="", summary="", search_results="", window=None):
+        """Async version of generate_response; awaits the LLM without blocking the event loop."""
         try:
-            # 2. Use LLM directly
-            all_messages = [
-                SystemMessage(content=self.system_message_text),
-                *formatted_history,
-                HumanMessage(content=user_text)
-            ]
+            all_messages = context_builder.build_messages(
+                self.system_message_text,
+                user_text,
+                history=chat_history,
+                memory_context=context,
+                summary=summary,
+                search_results=search_results,
+                window=window,
+            )
 
-            response = self.llm.invoke(all_messages)
-            return response.content
+            return await self.llm.ainvoke(all_messages)
 
         except Exception as e:
-            # Catch any unexpected error
-            print(f"❌ generate_response error: {e}")
-            return "I apologize, sir. My neural pathways failed to generate a response."
+            print(f"❌ agenerate_response error: {e}")
+            return FAILED_REPLY
+
+    async def astream_response(self, user_text, chat_history=[], context="", summary="", search_results="", window=None):
+        """Yield response text deltas as the model produces them."""
+        all_messages = context_builder.build_messages(
+            self.system_message_text,
+            user_text,
+            history=chat_history,
+            memory_context=context,
+            summary=summary,
+            search_results=search_results,
+            window=window,
+        )
+        async for delta in self.llm.astream(all_messages):
+            yield delta
+
+    def summarize(self, previous_summary, messages):
+        """Fold older messages into the running conversation summary."""
+        transcript = "\n".join(
+            f"{'User' if m.get('role') == 'human' else 'JARVIS'}: {m.get('content', '')}"
+            for m in messages
+        )
+        prompt = [
+            SystemMessage(content=(
+                "You maintain a running summary of a conversation between a user and J.A.R.V.I.S.\n"
+                "Merge the new messages into the current summary. Keep names, facts, preferences, "
+                "decisions and unfinished requests; drop small talk. At most 150 words."
+            )),
+            HumanMessage(content=f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"),
+        ]
+        return self.llm.invoke(prompt).strip()
 
 # Lazy Global Instance
 _brain_instance = None
 
 
 def _get_brain_instance():
-    """Return a Brain instance, re-attempt initialization when a GROQ key becomes available."""
+    """Return a Brain instance, re-attempt initialization when an LLM provider becomes available."""
     global _brain_instance
-    groq_key = os.getenv("GROQ_API_KEY")
+    configured = llm_providers.any_configured()
 
     # If already initialized and healthy, return it
     if _brain_instance is not None and not getattr(_brain_instance, "_init_error", None):
         return _brain_instance
 
-    # If we had a previous init error but a key is now present, reattempt
-    if _brain_instance is not None and getattr(_brain_instance, "_init_error", None) and groq_key:
+    # If we had a previous init error but a provider is now configured, reattempt
+    if _brain_instance is not None and getattr(_brain_instance, "_init_error", None) and configured:
         try:
             _brain_instance = Brain()
             if getattr(_brain_instance, "_init_error", None):
@@ -164,11 +205,11 @@ def _get_brain_instance():
             _brain_instance = None
             return None
 
-    # If we have no key, do not attempt network init
-    if not groq_key:
+    # If no provider is configured, do not attempt network init
+    if not configured:
         return None
 
-    # Last resort: try to initialize with a key present
+    # Last resort: try to initialize with a provider configured
     try:
         _brain_instance = Brain()
         if getattr(_brain_instance, "_init_error", None):
@@ -181,28 +222,82 @@ def _get_brain_instance():
         return None
 
 
-def get_brain_response(user_input: str, chat_history: list, long_term_memory: list):
+def get_brain_response(user_input: str, chat_history: list, long_term_memory: list, summary: str = "",
+                       search_results: str = "", window=None):
     """High-level entrypoint for other modules."""
     # Go directly to the LLM
     memory_context = "\n".join([f"- {m}" for m in long_term_memory])
     inst = _get_brain_instance()
     if inst is None:
-        return "I couldn't contact the language model right now; please try again later."
-    resp = inst.generate_response(user_input, chat_history, memory_context)
+        return UNAVAILABLE_REPLY
+    resp = inst.generate_response(user_input, chat_history, memory_context, summary, search_results, window)
     if not resp:
-        return "I couldn't contact the language model right now; please try again later."
+        return UNAVAILABLE_REPLY
     return resp
 
 
+async def aget_brain_response(user_input: str, chat_history: list, long_term_memory: list, summary: str = "",
+                              search_results: str = "", window=None):
+    """Async entrypoint for the FastAPI handlers."""
+    memory_context = "\n".join([f"- {m}" for m in long_term_memory])
+    inst = _get_brain_instance()
+    if inst is None:
+        return UNAVAILABLE_REPLY
+    resp = await inst.agenerate_response(user_input, chat_history, memory_context, summary, search_results, window)
+    if not resp:
+        return UNAVAILABLE_REPLY
+    return resp
+
+
+async def stream_brain_response(user_input: str, chat_history: list, long_term_memory: list, summary: str = "",
+                                search_results: str = "", window=None):
+    """Streaming counterpart of get_brain_response: yields text deltas."""
+    memory_context = "\n".join([f"- {m}" for m in long_term_memory])
+    inst = _get_brain_instance()
+    if inst is None:
+        yield UNAVAILABLE_REPLY
+        return
+
+    produced = False
+    try:
+        async for delta in inst.astream_response(user_input, chat_history, memory_context, summary, search_results, window):
+            produced = True
+            yield delta
+    except Exception as e:
+        print(f"❌ stream_brain_response error: {e}")
+        if not produced:
+            yield FAILED_REPLY
+
+
+def system_prompt() -> str:
+    """The system prompt the model currently answers under, or "" when it is unavailable."""
+    inst = _get_brain_instance()
+    return getattr(inst, "system_message_text", "") if inst is not None else ""
+
+
+def summarize_conversation(previous_summary: str, messages: list):
+    """Return an updated rolling summary, or None if the LLM is unavailable."""
+    inst = _get_brain_instance()
+    if inst is None:
+        return None
+    try:
+        return inst.summarize(previous_summary, messages) or None
+    except Exception as e:
+        print(f"❌ summarize error: {e}")
+        return None
+
+
 # STATUS CHECK
 def check_status() -> dict:
     """Return a lightweight status dict describing model availability."""
     # Local multimodal availability is cheap to check
     try:
-        from backend.brain.local_multimodal import is_available as _local_avail
+        from backend.brain.local_multimodal import is_available as _local_avail, readiness as _local_readiness
         local_ok = _local_avail()
+        local_state = _local_readiness()["state"]
     except Exception:
         local_ok = False
+        local_state = "unavailable"
 
     # Captioner libraries present?
     captioner_libs = True
@@ -217,6 +312,8 @@ def check_status() -> dict:
         "brain_initialized": _brain_instance is not None,
         "brain_init_error": getattr(_brain_instance, "_init_error", None) if _brain_instance else None,
         "llm_available": (_brain_instance is not None and getattr(_brain_instance, "_init_error", None) is None),
+        "llm_providers": _brain_instance.llm.stats() if getattr(_brain_instance, "llm", None) else None,
         "local_multimodal_available": local_ok,
+        "local_multimodal_state": local_state,
         "captioner_libraries_present": captioner_libs,
     }
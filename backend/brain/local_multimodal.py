@@ -1,13 +1,37 @@
 import io
 import os
+import threading
+import time
 from PIL import Image
 
+from .batching import MicroBatcher
+
 # Global variables to cache the model so we don't reload it every time
 _model = None
 _processor = None
+_dtype = None  # input dtype when the model runs in reduced precision
 # We use Salesforce BLIP. It's fast, accurate, and downloads automatically.
 _model_name = "Salesforce/blip-image-captioning-large"
 
+# Concurrent requests are captioned together: the batcher waits up to
+# VISION_BATCH_WAIT_MS for company and runs at most VISION_MAX_BATCH images per generate()
+VISION_MAX_BATCH = int(os.getenv("VISION_MAX_BATCH", "8"))
+VISION_BATCH_WAIT_MS = float(os.getenv("VISION_BATCH_WAIT_MS", "10"))
+VISION_MAX_NEW_TOKENS = 50
+DEFAULT_PROMPT = "a photography of"
+
+# Load the model in the background when the app starts instead of on the first request
+VISION_PRELOAD = os.getenv("VISION_PRELOAD", "false").lower() in ("1", "true", "yes")
+# fp32 (default), fp16 / bf16 (half the memory; fp16 wants a GPU), or
+# int8 (dynamically quantized Linear layers, for small CPU hosts)
+VISION_PRECISION = os.getenv("VISION_PRECISION", "fp32").lower()
+
+# Readiness: not_loaded -> loading -> ready | failed
+_state = "not_loaded"
+_load_error = None
+_load_seconds = None
+_load_lock = threading.Lock()
+
 def is_available():
     """Checks if the necessary libraries are installed."""
     try:
@@ -18,56 +42,123 @@ def is_available():
     except ImportError:
         return False
 
+def _load(precision):
+    import torch
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+
+    # Load processor and model (downloads automatically if not found)
+    processor = BlipProcessor.from_pretrained(_model_name)
+    dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(precision)
+    if dtype is not None:
+        model = BlipForConditionalGeneration.from_pretrained(_model_name, dtype=dtype)
+    else:
+        model = BlipForConditionalGeneration.from_pretrained(_model_name)
+        if precision == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return processor, model.eval(), dtype
+
 def _init_model():
-    """Loads the model into memory. Called once on startup by main.py."""
-    global _model, _processor
-    
+    """
+    Loads the model into memory. Called once on startup by main.py when VISION_PRELOAD
+    is set, otherwise by the first request. Single-flight: concurrent callers wait for
+    the one load in progress instead of starting their own.
+    """
+    global _model, _processor, _dtype, _state, _load_error, _load_seconds
+
     if _model is not None:
         return  # Already loaded
 
-    print(f"⏳ Loading Vision Model ({_model_name})... this may take a moment...")
-    try:
-        from transformers import BlipProcessor, BlipForConditionalGeneration
-        
-        # Load processor and model (downloads automatically if not found)
-        _processor = BlipProcessor.from_pretrained(_model_name)
-        _model = BlipForConditionalGeneration.from_pretrained(_model_name)
-        print("✅ Vision Model Loaded Successfully!")
-    except Exception as e:
-        print(f"❌ Failed to load Vision Model: {e}")
+    with _load_lock:
+        if _model is not None:
+            return  # Loaded while we waited
+
+        _state = "loading"
+        print(f"⏳ Loading Vision Model ({_model_name}, {VISION_PRECISION})... this may take a moment...")
+        start = time.perf_counter()
+        try:
+            _processor, _model, _dtype = _load(VISION_PRECISION)
+            _load_seconds = time.perf_counter() - start
+            _load_error = None
+            _state = "ready"
+            print(f"✅ Vision Model Loaded Successfully in {_load_seconds:.1f}s!")
+        except Exception as e:
+            _load_error = str(e)
+            _state = "failed"
+            print(f"❌ Failed to load Vision Model: {e}")
+
+def start_background_load():
+    """Warm the model on a daemon thread so startup is not blocked; returns the thread or None."""
+    if _model is not None or _state == "loading" or not is_available():
+        return None
+    thread = threading.Thread(target=_init_model, name="vision-load", daemon=True)
+    thread.start()
+    return thread
+
+def readiness() -> dict:
+    return {
+        "state": _state,
+        "ready": _model is not None,
+        "precision": VISION_PRECISION,
+        "load_seconds": round(_load_seconds, 1) if _load_seconds is not None else None,
+        "error": _load_error,
+    }
+
+
+def _caption_batch(jobs):
+    """
+    Runs on the batcher thread: one processor call and one generate() per prompt
+    length in the batch. Images that fail to decode get their own error instead
+    of sinking the whole batch.
+    """
+    results = [None] * len(jobs)
+    # BLIP's generate() assumes every prompt ends in the same column, so prompts are
+    # only batched with others of the same token length and never need padding
+    groups = {}
+    for i, (image_bytes, question) in enumerate(jobs):
+        try:
+            image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            results[i] = (None, str(e))
+            continue
+        # If the user asked a specific question, we condition the generation on that text.
+        prompt = question if question else DEFAULT_PROMPT
+        length = len(_processor.tokenizer(prompt)["input_ids"])
+        groups.setdefault(length, []).append((i, image, prompt))
+
+    for group in groups.values():
+        slots, images, prompts = zip(*group)
+        inputs = _processor(list(images), list(prompts), return_tensors="pt")
+        if _dtype is not None:
+            inputs["pixel_values"] = inputs["pixel_values"].to(_dtype)
+        out = _model.generate(**inputs, max_new_tokens=VISION_MAX_NEW_TOKENS)
+        for i, tokens in zip(slots, out):
+            results[i] = (_processor.decode(tokens, skip_special_tokens=True), None)
+    return results
+
+
+batcher = MicroBatcher(_caption_batch, VISION_MAX_BATCH, VISION_BATCH_WAIT_MS, name="vision")
+
+
+def get_stats() -> dict:
+    return {**readiness(), **batcher.stats()}
+
 
 def analyze_image_with_local_llm(image_bytes, user_question=None):
     """
     Takes raw image bytes and a user question (optional).
     Returns (answer_string, error_string).
+    Blocks until the batcher has captioned the image, so call it off the event loop.
     """
-    global _model, _processor
-
     # Ensure model is loaded
     if _model is None:
         _init_model()
-    
+
     if _model is None:
         return None, "Vision model could not be loaded."
 
     try:
-        # Convert bytes to PIL Image
-        raw_image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-
-        # Prepare inputs
-        # If the user asked a specific question, we condition the generation on that text.
-        text_input = user_question if user_question else "a photography of"
-        
-        inputs = _processor(raw_image, text_input, return_tensors="pt")
-
-        # Generate response
-        out = _model.generate(**inputs, max_new_tokens=50)
-        
-        # Decode
-        caption = _processor.decode(out[0], skip_special_tokens=True)
-        
-        return caption, None
-
+        return batcher.submit((image_bytes, user_question)).result()
     except Exception as e:
         print(f"Error processing image: {e}")
-        return None, str(e)
\ No newline at end of file
+        return None, str(e)
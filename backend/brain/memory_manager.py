@@ -1,58 +1,287 @@
 import json
 import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # CONFIGURATION
 DATA_DIR = "data"
 USERS_DIR = os.path.join(DATA_DIR, "users")
 
+# Storage engine: "jsonl" (append-only files, default) or "sqlite"
+STORAGE_BACKEND = os.getenv("JARVIS_STORAGE_BACKEND", "jsonl").lower()
+
+# Rough characters-per-token ratio used for history budgets
+CHARS_PER_TOKEN = 4
+
+# Superseded index records tolerated before a background compaction is scheduled
+INDEX_COMPACT_THRESHOLD = int(os.getenv("CHAT_INDEX_COMPACT_THRESHOLD", "64"))
+
 os.makedirs(USERS_DIR, exist_ok=True)
 
+# STORAGE LAYOUT (per user)
+#   chats/index.jsonl      append-only journal of create / rename / delete records
+#   chats/chat-<chat_id>.jsonl  append-only message log, one JSON record per line
+#   chats/chat-<chat_id>.summary.json  rolling summary of messages up to a seq
+#   memory.json            long-term memory list
+# Legacy chats.json files are migrated into this layout on first access.
+# Per-chat files carry a "chat-" prefix so no chat id can map onto index.jsonl.
+
+_user_locks = {}
+_user_locks_guard = threading.Lock()
+_compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-compactor")
+_pending_compactions = set()
+
 # INTERNAL HELPERS
 def _sanitize_user_id(user_id: str) -> str:
     """Prevent path traversal & invalid folder names"""
     return "".join(c for c in user_id if c.isalnum() or c in ("-", "_"))
 
+def _sanitize_chat_id(chat_id: str) -> str:
+    return "".join(c for c in chat_id if c.isalnum())
+
+def _get_user_lock(user_id: str) -> threading.RLock:
+    safe_id = _sanitize_user_id(user_id)
+    with _user_locks_guard:
+        lock = _user_locks.get(safe_id)
+        if lock is None:
+            lock = _user_locks[safe_id] = threading.RLock()
+        return lock
+
 def _get_user_dir(user_id: str) -> str:
     safe_id = _sanitize_user_id(user_id)
     user_dir = os.path.join(USERS_DIR, safe_id)
     os.makedirs(user_dir, exist_ok=True)
     return user_dir
 
-def _get_chats_path(user_id: str) -> str:
+def _get_legacy_chats_path(user_id: str) -> str:
     return os.path.join(_get_user_dir(user_id), "chats.json")
 
+def _get_chats_dir(user_id: str) -> str:
+    return os.path.join(_get_user_dir(user_id), "chats")
+
+def _get_index_path(user_id: str) -> str:
+    return os.path.join(_get_chats_dir(user_id), "index.jsonl")
+
+def _log_filename(chat_id: str) -> str:
+    return f"chat-{_sanitize_chat_id(chat_id)}.jsonl"
+
+def _get_log_path(chat_id: str, user_id: str) -> str:
+    return os.path.join(_get_chats_dir(user_id), _log_filename(chat_id))
+
+def _get_summary_path(chat_id: str, user_id: str) -> str:
+    return os.path.join(_get_chats_dir(user_id), f"chat-{_sanitize_chat_id(chat_id)}.summary.json")
+
 def _get_memory_path(user_id: str) -> str:
     return os.path.join(_get_user_dir(user_id), "memory.json")
 
+def _append_record(path: str, record: dict):
+    """Append one JSON line. Only the new bytes are written, never the whole file."""
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    with open(path, "a+b") as f:
+        # Terminate a torn line from an earlier crash so it can't swallow this record
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+
+def _read_records(path: str) -> list:
+    """Read every record of a log, skipping a torn trailing line left by a crash."""
+    if not os.path.exists(path):
+        return []
+
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def _iter_records_reversed(path: str, block: int = 8192):
+    """Yield complete records newest-first, reading the log backwards from EOF."""
+    if not os.path.exists(path):
+        return
+
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + tail).split(b"\n")
+            # lines[0] may be cut mid-record unless we reached the start of the file
+            tail = lines.pop(0) if pos > 0 else b""
+            for raw in reversed(lines):
+                raw = raw.strip()
+                if not raw:
+                    continue
+                try:
+                    yield json.loads(raw.decode("utf-8"))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+
+def _read_last_record(path: str):
+    """Return the final complete record of a log without reading the rest."""
+    return next(_iter_records_reversed(path), None)
+
+def _write_atomic(path: str, lines: list):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in lines:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+def _replay_index(records: list) -> dict:
+    """Fold index journal records into {chat_id: {title, created_at}}"""
+    chats = {}
+    for rec in records:
+        op = rec.get("op")
+        chat_id = rec.get("chat_id")
+        if op == "create":
+            chats[chat_id] = {
+                "title": rec.get("title", "New Conversation"),
+                "created_at": rec.get("created_at", ""),
+            }
+        elif op == "rename" and chat_id in chats:
+            chats[chat_id]["title"] = rec.get("title", chats[chat_id]["title"])
+        elif op == "delete":
+            chats.pop(chat_id, None)
+    return chats
+
+def _load_index(user_id: str) -> dict:
+    return _replay_index(_read_records(_get_index_path(user_id)))
+
+def _migrate_legacy_chats(user_id: str):
+    """Split a legacy chats.json into per-chat logs plus an index journal."""
+    legacy_path = _get_legacy_chats_path(user_id)
+    try:
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        data = {}
+
+    index = []
+    for chat_id, chat in data.items():
+        index.append({
+            "op": "create",
+            "chat_id": chat_id,
+            "title": chat.get("title", "New Conversation"),
+            "created_at": chat.get("created_at", ""),
+        })
+        messages = [
+            {"seq": seq, **msg}
+            for seq, msg in enumerate(chat.get("messages", []))
+        ]
+        _write_atomic(_get_log_path(chat_id, user_id), messages)
+
+    # The index is written last so an interrupted migration is simply redone
+    _write_atomic(_get_index_path(user_id), index)
+    os.replace(legacy_path, f"{legacy_path}.migrated")
+    print(f"📦 Migrated {len(index)} chats for {_sanitize_user_id(user_id)} to append-only logs")
+
 def _ensure_user_files(user_id: str):
-    chats_path = _get_chats_path(user_id)
+    chats_dir = _get_chats_dir(user_id)
+    index_path = _get_index_path(user_id)
     memory_path = _get_memory_path(user_id)
 
-    if not os.path.exists(chats_path):
-        with open(chats_path, "w", encoding="utf-8") as f:
-            json.dump({}, f)
+    if not os.path.exists(index_path):
+        with _get_user_lock(user_id):
+            if not os.path.exists(index_path):
+                os.makedirs(chats_dir, exist_ok=True)
+                if os.path.exists(_get_legacy_chats_path(user_id)):
+                    _migrate_legacy_chats(user_id)
+                else:
+                    open(index_path, "a", encoding="utf-8").close()
 
     if not os.path.exists(memory_path):
         with open(memory_path, "w", encoding="utf-8") as f:
             json.dump([], f)
 
+def _append_index_record(user_id: str, record: dict):
+    _append_record(_get_index_path(user_id), record)
+    _maybe_schedule_compaction(user_id)
+
+def _maybe_schedule_compaction(user_id: str):
+    records = _read_records(_get_index_path(user_id))
+    live = len(_replay_index(records))
+    if len(records) - live < INDEX_COMPACT_THRESHOLD:
+        return
+
+    safe_id = _sanitize_user_id(user_id)
+    with _user_locks_guard:
+        if safe_id in _pending_compactions:
+            return
+        _pending_compactions.add(safe_id)
+    _compactor.submit(_compact_index, user_id)
+
+def _compact_index(user_id: str):
+    """Rewrite the index journal with one create record per live chat."""
+    safe_id = _sanitize_user_id(user_id)
+    try:
+        with _get_user_lock(user_id):
+            chats = _load_index(user_id)
+            _write_atomic(_get_index_path(user_id), [
+                {"op": "create", "chat_id": chat_id, **chat}
+                for chat_id, chat in chats.items()
+            ])
+    except Exception as e:
+        print(f"⚠️ Chat index compaction failed for {safe_id}: {e}")
+    finally:
+        with _user_locks_guard:
+            _pending_compactions.discard(safe_id)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; good enough for budgeting prompt history."""
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+def _take_tail(records_newest_first, before=None, limit=None, max_tokens=None) -> list:
+    """Collect newest records until a count or token budget is hit; returns oldest-first."""
+    picked = []
+    used = 0
+    for rec in records_newest_first:
+        if before is not None and rec.get("seq", 0) >= before:
+            continue
+        if limit is not None and len(picked) >= limit:
+            break
+        if max_tokens is not None:
+            used += estimate_tokens(rec.get("content", ""))
+            if used > max_tokens:
+                break
+        picked.append(rec)
+    picked.reverse()
+    return picked
+
+def _sqlite():
+    """Return the SQLite store when it is the configured backend, else None."""
+    if STORAGE_BACKEND != "sqlite":
+        return None
+    from . import sqlite_store
+    return sqlite_store
+
 # PUBLIC INIT
 def init_db(user_id: str):
     """Initialize per-user storage"""
+    if _sqlite():
+        return _sqlite().init_db(user_id)
     _ensure_user_files(user_id)
 
 # CHAT FUNCTIONS
 def get_all_chats(user_id: str):
     """Returns chat list for sidebar"""
+    if _sqlite():
+        return _sqlite().get_all_chats(user_id)
     _ensure_user_files(user_id)
 
-    with open(_get_chats_path(user_id), "r", encoding="utf-8") as f:
-        data = json.load(f)
-
     chats = []
-    for chat_id, chat in data.items():
+    for chat_id, chat in _load_index(user_id).items():
         chats.append({
             "chat_id": chat_id,
             "name": chat.get("title", "New Conversation"),
@@ -64,101 +293,154 @@ def get_all_chats(user_id: str):
 
 def create_new_chat(user_id: str):
     """Create new chat scoped to user"""
+    if _sqlite():
+        return _sqlite().create_new_chat(user_id)
     _ensure_user_files(user_id)
 
     chat_id = uuid.uuid4().hex
     now = datetime.utcnow().isoformat()
+    title = "New Conversation"
 
-    new_chat = {
-        "title": "New Conversation",
-        "created_at": now,
-        "messages": []
-    }
-
-    path = _get_chats_path(user_id)
-    with open(path, "r+", encoding="utf-8") as f:
-        data = json.load(f)
-        data[chat_id] = new_chat
-        f.seek(0)
-        json.dump(data, f, indent=4)
-        f.truncate()
+    with _get_user_lock(user_id):
+        open(_get_log_path(chat_id, user_id), "a", encoding="utf-8").close()
+        _append_index_record(user_id, {
+            "op": "create",
+            "chat_id": chat_id,
+            "title": title,
+            "created_at": now,
+        })
 
-    return {"chat_id": chat_id, "name": new_chat["title"]}
+    return {"chat_id": chat_id, "name": title}
 
 def rename_chat(chat_id: str, new_name: str, user_id: str):
+    if _sqlite():
+        return _sqlite().rename_chat(chat_id, new_name, user_id)
     _ensure_user_files(user_id)
-    path = _get_chats_path(user_id)
 
-    with open(path, "r+", encoding="utf-8") as f:
-        data = json.load(f)
-        if chat_id not in data:
+    with _get_user_lock(user_id):
+        if chat_id not in _load_index(user_id):
             return False
-
-        data[chat_id]["title"] = new_name
-        f.seek(0)
-        json.dump(data, f, indent=4)
-        f.truncate()
+        _append_index_record(user_id, {"op": "rename", "chat_id": chat_id, "title": new_name})
 
     return True
 
 def delete_chat(chat_id: str, user_id: str):
+    if _sqlite():
+        return _sqlite().delete_chat(chat_id, user_id)
     _ensure_user_files(user_id)
-    path = _get_chats_path(user_id)
 
-    with open(path, "r+", encoding="utf-8") as f:
-        data = json.load(f)
-        if chat_id not in data:
+    with _get_user_lock(user_id):
+        if chat_id not in _load_index(user_id):
             return False
-
-        del data[chat_id]
-        f.seek(0)
-        json.dump(data, f, indent=4)
-        f.truncate()
+        _append_index_record(user_id, {"op": "delete", "chat_id": chat_id})
+        for path in (_get_log_path(chat_id, user_id), _get_summary_path(chat_id, user_id)):
+            if os.path.exists(path):
+                os.remove(path)
 
     return True
 
 def get_chat_history(chat_id: str, user_id: str):
+    if _sqlite():
+        return _sqlite().get_chat_history(chat_id, user_id)
     _ensure_user_files(user_id)
-
-    with open(_get_chats_path(user_id), "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    return data.get(chat_id, {}).get("messages", [])
+    return _read_records(_get_log_path(chat_id, user_id))
+
+def get_recent_history(chat_id: str, user_id: str, limit: int = None, max_tokens: int = None):
+    """
+    Last messages of a chat, oldest-first, bounded by message count and/or an
+    estimated token budget. Only the tail of the log is read.
+    """
+    if _sqlite():
+        return _sqlite().get_recent_history(chat_id, user_id, limit, max_tokens)
+    _ensure_user_files(user_id)
+    return _take_tail(
+        _iter_records_reversed(_get_log_path(chat_id, user_id)),
+        limit=limit,
+        max_tokens=max_tokens,
+    )
+
+def get_history_page(chat_id: str, user_id: str, before: int = None, limit: int = 50):
+    """
+    Cursor pagination over a chat: up to `limit` messages with seq < before
+    (or the latest ones when before is None), oldest-first.
+    """
+    if _sqlite():
+        return _sqlite().get_history_page(chat_id, user_id, before, limit)
+    _ensure_user_files(user_id)
+    return _take_tail(
+        _iter_records_reversed(_get_log_path(chat_id, user_id)),
+        before=before,
+        limit=limit,
+    )
 
 def append_to_chat(chat_id: str, role: str, content: str, user_id: str):
+    if _sqlite():
+        return _sqlite().append_to_chat(chat_id, role, content, user_id)
     _ensure_user_files(user_id)
-    path = _get_chats_path(user_id)
+    path = _get_log_path(chat_id, user_id)
 
-    with open(path, "r+", encoding="utf-8") as f:
-        data = json.load(f)
-        if chat_id not in data:
+    with _get_user_lock(user_id):
+        # The log file exists exactly as long as the chat does
+        if not os.path.exists(path):
             return
 
-        data[chat_id]["messages"].append({
+        last = _read_last_record(path)
+        _append_record(path, {
+            "seq": last["seq"] + 1 if last and "seq" in last else 0,
             "role": role,
             "content": content,
             "timestamp": datetime.utcnow().isoformat()
         })
 
-        f.seek(0)
-        json.dump(data, f, indent=4)
-        f.truncate()
+def get_chat_summary(chat_id: str, user_id: str):
+    """Cached rolling summary as {"text", "upto_seq"}, or None if never summarized."""
+    if _sqlite():
+        return _sqlite().get_chat_summary(chat_id, user_id)
+    _ensure_user_files(user_id)
+    try:
+        with open(_get_summary_path(chat_id, user_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def save_chat_summary(chat_id: str, user_id: str, text: str, upto_seq: int):
+    if _sqlite():
+        return _sqlite().save_chat_summary(chat_id, user_id, text, upto_seq)
+    _ensure_user_files(user_id)
+
+    with _get_user_lock(user_id):
+        if not os.path.exists(_get_log_path(chat_id, user_id)):
+            return
+        path = _get_summary_path(chat_id, user_id)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "text": text,
+                "upto_seq": upto_seq,
+                "updated_at": datetime.utcnow().isoformat()
+            }, f, ensure_ascii=False)
+        os.replace(tmp, path)
 
 # LONG-TERM MEMORY
 def get_long_term_memory(user_id: str):
+    if _sqlite():
+        return _sqlite().get_long_term_memory(user_id)
     _ensure_user_files(user_id)
 
     with open(_get_memory_path(user_id), "r", encoding="utf-8") as f:
         return json.load(f)
 
 def add_long_term_memory(memory_text: str, user_id: str):
+    if _sqlite():
+        return _sqlite().add_long_term_memory(memory_text, user_id)
     _ensure_user_files(user_id)
     path = _get_memory_path(user_id)
 
-    with open(path, "r+", encoding="utf-8") as f:
-        memories = json.load(f)
-        if memory_text not in memories:
-            memories.append(memory_text)
-            f.seek(0)
-            json.dump(memories, f, indent=4)
-            f.truncate()
+    with _get_user_lock(user_id):
+        with open(path, "r+", encoding="utf-8") as f:
+            memories = json.load(f)
+            if memory_text not in memories:
+                memories.append(memory_text)
+                f.seek(0)
+                json.dump(memories, f, indent=4)
+                f.truncate()
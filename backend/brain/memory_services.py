@@ -1,8 +1,21 @@
+import hashlib
 import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import chromadb
+import numpy as np
 from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
 from langchain_mistralai import MistralAIEmbeddings
 from dotenv import load_dotenv
 
+from . import memory_manager
+from .batching import MicroBatcher
+
 # Load environment variables
 load_dotenv()
 
@@ -10,28 +23,489 @@ load_dotenv()
 PERSIST_DIRECTORY = "./chroma_db"
 COLLECTION_NAME = "jarvis_long_term_memory"
 
+# Which embedder backs the memory store:
+#   auto      - Mistral when MISTRAL_API_KEY is set, otherwise hashing
+#   mistral   - MistralAIEmbeddings (remote)
+#   hashing   - HashingEmbeddings (offline, no model download)
+#   sentence-transformers - a small local model, if the package is installed
+MEMORY_EMBEDDINGS = os.getenv("MEMORY_EMBEDDINGS", "auto")
+SENTENCE_TRANSFORMER_MODEL = os.getenv("SENTENCE_TRANSFORMER_MODEL", "all-MiniLM-L6-v2")
+
+# Open vector stores are pooled: "per_user" keeps one Chroma directory per user, at most
+# MEMORY_STORE_POOL_SIZE open at once; "shared" puts everyone in one collection filtered by user_id
+MEMORY_STORE_MODE = os.getenv("MEMORY_STORE_MODE", "per_user")
+MEMORY_STORE_POOL_SIZE = int(os.getenv("MEMORY_STORE_POOL_SIZE", "32"))
+MEMORY_STORE_IDLE_SECONDS = float(os.getenv("MEMORY_STORE_IDLE_SECONDS", "900"))
+
+# Embeddings are cached on disk by content hash (LRU, at most EMBEDDING_CACHE_MAX_ENTRIES vectors);
+# empty EMBEDDING_CACHE_PATH keeps the cache next to the vector stores
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+# Cache misses from concurrent callers are sent to the embedder together
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+# Retrieval: at most MEMORY_TOP_K memories per turn, each at least this relevant (0..1)
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "4"))
+MEMORY_MIN_RELEVANCE = float(os.getenv("MEMORY_MIN_RELEVANCE", "0.3"))
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by do does did for from has have how i i'm in is it its me my "
+    "of on or so that the their them there they this to was we were what when where which who "
+    "why will with you your".split()
+)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline embedder: content words are hashed into a fixed number of signed buckets
+    and the vector is L2-normalized, so cosine similarity measures word overlap.
+    No model, no network; good enough to rank a user's own memories.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _tokens(self, text: str) -> list:
+        words = re.findall(r"[a-z0-9]+(?:'[a-z]+)?", text.lower())
+        return [w.split("'")[0] for w in words if w not in _STOPWORDS]
+
+    def _embed(self, text: str) -> list:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in self._tokens(text):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vec[value % self.dim] += 1.0 if (value >> 63) == 0 else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._embed(text)
+
+
+def embedding_backend() -> str:
+    if MEMORY_EMBEDDINGS != "auto":
+        return MEMORY_EMBEDDINGS
+    return "mistral" if os.getenv("MISTRAL_API_KEY") else "hashing"
+
 def _get_embedding_function():
+    backend = embedding_backend()
+    if backend == "hashing":
+        return HashingEmbeddings()
+    if backend == "sentence-transformers":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=SENTENCE_TRANSFORMER_MODEL)
+
     api_key = os.getenv("MISTRAL_API_KEY")
     if not api_key:
         raise ValueError("MISTRAL_API_KEY not found in .env file.")
     return MistralAIEmbeddings(mistral_api_key=api_key)
 
-def get_vector_store(user_id: str):
-    embeddings = _get_embedding_function()
-    return Chroma(
-        collection_name=f"jarvis_memory_{user_id}",
-        embedding_function=embeddings,
-        persist_directory=f"./chroma_db/{user_id}"
-    )
 
+class EmbeddingCache:
+    """
+    On-disk LRU cache of embedding vectors in SQLite, keyed by a hash of the model and text.
+    Every lookup refreshes last_used, so the eviction order survives restarts.
+    """
+
+    def __init__(self, path: str, max_entries: int = None):
+        self.path = path
+        self.max_entries = max_entries or EMBEDDING_CACHE_MAX_ENTRIES
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            # Shared across threads; every access holds self._lock
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        return self._conn
+
+    def get_many(self, keys: list) -> dict:
+        """Cached vectors for whichever keys are present."""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            db = self._db()
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, blob in db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk):
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                db.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({marks})", [time.time(), *chunk])
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(vec, dtype=np.float32).tobytes(), now) for key, vec in items.items()]
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+                excess = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    db.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedder with the content-hash cache and a micro-batcher.
+    Cache misses are submitted text by text; the batcher folds the misses of every
+    concurrent caller (bulk add_texts, queries from other requests) into one
+    embed_documents call. All backends here embed queries and documents the
+    same way, so both share cache entries and batches.
+    """
+
+    def __init__(self, inner: Embeddings, model: str, cache: EmbeddingCache,
+                 max_batch: int = None, batch_wait_ms: float = None):
+        self.inner = inner
+        self.model = model
+        self.cache = cache
+        self.batcher = MicroBatcher(
+            self._embed_batch,
+            max_batch or EMBEDDING_MAX_BATCH,
+            EMBEDDING_BATCH_WAIT_MS if batch_wait_ms is None else batch_wait_ms,
+            name=f"embeddings-{model}",
+        )
+
+    def _embed_batch(self, texts: list) -> list:
+        # Identical texts queued by different callers are embedded once
+        unique = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique, self.inner.embed_documents(unique)))
+        return [vectors[t] for t in texts]
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [EmbeddingCache.key(self.model, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = self.batcher.submit(text)
+        if missing:
+            fresh = {key: future.result() for key, future in missing.items()}
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        return {"model": self.model, "cache": self.cache.stats(), "batching": self.batcher.stats()}
+
+
+def _model_name(backend: str, inner: Embeddings) -> str:
+    detail = getattr(inner, "model", None) or getattr(inner, "model_name", None) or getattr(inner, "dim", "")
+    return f"{backend}:{detail}"
+
+
+class UserMemoryStore:
+    """
+    One user's view of a Chroma store. In per-user mode it is a thin pass-through;
+    in shared mode ids are prefixed with the user and every read and write is
+    scoped by a user_id metadata filter.
+    Handles from the pool must be released (or used as a context manager) so the
+    pool knows when it may close the underlying client.
+    """
 
-def add_text_to_memory(text: str, vector_store: Chroma):
+    def __init__(self, store: Chroma, user_id: str, shared: bool, release=None):
+        self.store = store
+        self.user_id = user_id
+        self.shared = shared
+        self._release = release
+
+    def release(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def _scoped(self, ids):
+        return [f"{self.user_id}:{i}" for i in ids] if self.shared else list(ids)
+
+    def _unscoped(self, ids):
+        return [i.split(":", 1)[1] for i in ids] if self.shared else list(ids)
+
+    def add_texts(self, texts: list, ids: list = None):
+        metadatas = [{"user_id": self.user_id} for _ in texts] if self.shared else None
+        return self.store.add_texts(texts, metadatas=metadatas, ids=self._scoped(ids) if ids else None)
+
+    def get(self, ids: list, include=()):
+        result = self.store.get(ids=self._scoped(ids), include=list(include))
+        return {**result, "ids": self._unscoped(result["ids"])}
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4):
+        flt = {"user_id": self.user_id} if self.shared else None
+        return self.store.similarity_search_with_relevance_scores(query, k=k, filter=flt)
+
+
+class _PooledStore:
+    """A pool entry: one open client and its store, plus how many handles are out."""
+
+    def __init__(self, client, store):
+        self.client = client
+        self.store = store
+        self.last_used = 0.0
+        self.users = 0
+        self.retired = False
+        self.closed = False
+
+
+class VectorStoreManager:
+    """
+    Keeps the Chroma stores that are in use open, instead of reopening one per call.
+    - One embedding client per backend, shared by every store.
+    - At most max_open per-user stores are open; the least recently used is closed first.
+    - Stores untouched for idle_seconds are closed by close_idle().
+    - A store evicted while handles to it are still out is closed when the last one is released.
+    - In shared mode there is one store and one collection for everybody,
+      partitioned by user_id metadata, so the user count doesn't drive open files.
+    """
+
+    def __init__(self, max_open: int = None, idle_seconds: float = None, mode: str = None):
+        self.max_open = max_open or MEMORY_STORE_POOL_SIZE
+        self.idle_seconds = MEMORY_STORE_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.mode = mode or MEMORY_STORE_MODE
+        self._stores = OrderedDict()  # key -> _PooledStore, least recently used first
+        self._embeddings = {}
+        self._lock = threading.RLock()
+        self._client_lock = threading.Lock()
+        self.opened = 0
+        self.closed = 0
+
+    def embeddings(self) -> CachedEmbeddings:
+        backend = embedding_backend()
+        key = (PERSIST_DIRECTORY, backend)
+        with self._lock:
+            if key not in self._embeddings:
+                inner = _get_embedding_function()
+                path = EMBEDDING_CACHE_PATH or os.path.join(PERSIST_DIRECTORY, "embedding_cache.sqlite3")
+                self._embeddings[key] = CachedEmbeddings(inner, _model_name(backend, inner), EmbeddingCache(path))
+            return self._embeddings[key]
+
+    def get(self, user_id: str) -> UserMemoryStore:
+        user_id = memory_manager._sanitize_user_id(user_id)
+        backend = embedding_backend()
+        shared = self.mode == "shared"
+        key = (PERSIST_DIRECTORY, backend, "" if shared else user_id)
+
+        with self._lock:
+            entry = self._stores.get(key)
+            if entry is not None:
+                return self._checkout(key, entry, user_id, shared)
+
+        # Opening a client touches the disk, so it happens outside the pool lock:
+        # lookups of stores that are already open never wait on someone else's cold open
+        retired = []
+        with self._client_lock:
+            with self._lock:
+                entry = self._stores.get(key)
+                if entry is not None:  # opened while we waited
+                    return self._checkout(key, entry, user_id, shared)
+            client, store = self._open(backend, None if shared else user_id)
+            with self._lock:
+                entry = self._stores[key] = _PooledStore(client, store)
+                self.opened += 1
+                while len(self._stores) > self.max_open:
+                    retired += self._retire(self._stores.popitem(last=False)[1])
+                handle = self._checkout(key, entry, user_id, shared)
+        self._close_clients(retired)
+        return handle
+
+    def _checkout(self, key, entry, user_id: str, shared: bool) -> UserMemoryStore:
+        self._stores.move_to_end(key)
+        entry.last_used = time.monotonic()
+        entry.users += 1
+        return UserMemoryStore(entry.store, user_id, shared, release=lambda: self._release(entry))
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            retired = self._close(entry) if entry.retired and entry.users == 0 else []
+        self._close_clients(retired)
+
+    def _retire(self, entry) -> list:
+        """Take an entry out of the pool; its client closes once nobody is using it."""
+        entry.retired = True
+        return self._close(entry) if entry.users == 0 else []
+
+    def _open(self, backend: str, user_id: str = None):
+        # Vectors from different embedders can't be compared, so each gets its own collection
+        suffix = "" if backend == "mistral" else f"_{backend.replace('-', '_')}"
+        owner = user_id or "shared"
+        client = chromadb.PersistentClient(path=os.path.join(PERSIST_DIRECTORY, owner))
+        store = Chroma(
+            client=client,
+            collection_name=f"jarvis_memory_{owner}{suffix}",
+            embedding_function=self.embeddings(),
+            collection_metadata={"hnsw:space": "cosine"}
+        )
+        return client, store
+
+    def _close(self, entry) -> list:
+        """Mark an entry closed; returns its client for _close_clients(), once."""
+        if entry.closed:
+            return []
+        entry.closed = True
+        self.closed += 1
+        return [entry.client]
+
+    def _close_clients(self, clients: list):
+        # Called without the pool lock held. Chroma's per-path client registry isn't
+        # thread-safe, so opens and closes take turns on _client_lock.
+        for client in clients:
+            close = getattr(client, "close", None)  # chromadb >= 1.x
+            if close is None:
+                continue
+            with self._client_lock:
+                try:
+                    close()
+                except Exception as e:
+                    print(f"⚠️ Error closing memory store: {e}")
+
+    def close_idle(self, now: float = None) -> int:
+        """Close stores unused for idle_seconds; returns how many were closed."""
+        now = time.monotonic() if now is None else now
+        retired = []
+        with self._lock:
+            idle = [k for k, e in self._stores.items() if e.users == 0 and now - e.last_used >= self.idle_seconds]
+            for key in idle:
+                retired += self._retire(self._stores.pop(key))
+        self._close_clients(retired)
+        return len(idle)
+
+    def close_all(self):
+        """Close every store, in use or not; for shutdown."""
+        retired = []
+        with self._lock:
+            while self._stores:
+                entry = self._stores.popitem(last=False)[1]
+                entry.retired = True
+                retired += self._close(entry)
+            for embeddings in self._embeddings.values():
+                embeddings.cache.close()
+        self._close_clients(retired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "open_stores": len(self._stores),
+                "in_use": sum(1 for e in self._stores.values() if e.users),
+                "max_open": self.max_open,
+                "opened": self.opened,
+                "closed": self.closed,
+                "embeddings": [e.stats() for e in self._embeddings.values()],
+            }
+
+
+stores = VectorStoreManager()
+
+def get_vector_store(user_id: str) -> UserMemoryStore:
+    """
+    The user's memory store from the shared pool, opening it on first use.
+    Use it as a context manager (or call release()) so it can be closed later.
+    """
+    # Piggyback idle cleanup on normal traffic instead of running a timer thread
+    stores.close_idle()
+    return stores.get(user_id)
+
+
+def _memory_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+def add_text_to_memory(text: str, vector_store: UserMemoryStore):
     """Saves text to the long-term database."""
-    vector_store.add_texts([text])
+    vector_store.add_texts([text], ids=[_memory_id(text)])
     print(f"💾 Memory stored: {text}")
 
-def search_memory(query: str, vector_store: Chroma) -> list[str]:
-    """Finds relevant past memories."""
-    # k=2 means "find the top 2 most relevant memories"
-    docs = vector_store.similarity_search(query, k=2)
-    return [doc.page_content for doc in docs]
\ No newline at end of file
+def sync_memories(memories: list, vector_store: UserMemoryStore) -> int:
+    """Embed any memories the vector store doesn't have yet; returns how many were added."""
+    ids = [_memory_id(m) for m in memories]
+    present = set(vector_store.get(ids=ids, include=[])["ids"])
+    missing = {i: m for i, m in zip(ids, memories) if i not in present}
+    if missing:
+        vector_store.add_texts(list(missing.values()), ids=list(missing.keys()))
+    return len(missing)
+
+def search_memory(query: str, vector_store: UserMemoryStore, k: int = None, min_relevance: float = None) -> list[str]:
+    """Finds relevant past memories: the top k whose relevance clears min_relevance."""
+    k = k or MEMORY_TOP_K
+    min_relevance = MEMORY_MIN_RELEVANCE if min_relevance is None else min_relevance
+    scored = vector_store.similarity_search_with_relevance_scores(query, k=k)
+    return [doc.page_content for doc, score in scored if score >= min_relevance]
+
+def retrieve_relevant_memories(user_id: str, query: str, memories: list, k: int = None,
+                               min_relevance: float = None) -> list[str]:
+    """
+    Retrieval stage for one chat turn: only the memories relevant to `query` go into the prompt.
+    Falls back to the most recent k memories if the vector store is unavailable.
+    """
+    if not memories:
+        return []
+    k = k or MEMORY_TOP_K
+    try:
+        with get_vector_store(user_id) as store:
+            sync_memories(memories, store)
+            return search_memory(query, store, k, min_relevance)
+    except Exception as e:
+        print(f"⚠️ Memory retrieval failed, using recent memories: {e}")
+        return memories[-k:]
@@ -0,0 +1,106 @@
+"""
+One-shot import of the JSON chat/memory tree into the SQLite store.
+
+Run from the backend directory:
+    python -m brain.migrate_to_sqlite [--users-dir data/users] [--db data/jarvis.db]
+
+Handles both legacy chats.json files and the append-only chat logs without
+modifying them, and can be re-run safely. Afterwards start the backend with JARVIS_STORAGE_BACKEND=sqlite.
+"""
+import argparse
+import json
+import os
+
+from . import memory_manager, sqlite_store
+
+
+def _read_legacy_chats(path: str) -> dict:
+    """{chat_id: {title, created_at, messages}} from a legacy chats.json."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+    return {
+        chat_id: {
+            "title": chat.get("title", "New Conversation"),
+            "created_at": chat.get("created_at", ""),
+            "messages": [{"seq": seq, **msg} for seq, msg in enumerate(chat.get("messages", []))],
+        }
+        for chat_id, chat in data.items()
+    }
+
+
+def _read_chat_logs(chats_dir: str) -> dict:
+    """{chat_id: {title, created_at, messages}} from an index journal plus per-chat logs."""
+    index = memory_manager._replay_index(memory_manager._read_records(os.path.join(chats_dir, "index.jsonl")))
+    return {
+        chat_id: {
+            **meta,
+            "messages": memory_manager._read_records(os.path.join(chats_dir, memory_manager._log_filename(chat_id))),
+        }
+        for chat_id, meta in index.items()
+    }
+
+
+def read_user(user_dir: str) -> tuple:
+    """
+    (chats, memories) of one user folder, read as-is: nothing under user_dir is
+    created, renamed or rewritten, whichever layout it is in.
+    """
+    chats_dir = os.path.join(user_dir, "chats")
+    legacy_path = os.path.join(user_dir, "chats.json")
+    if os.path.exists(os.path.join(chats_dir, "index.jsonl")):
+        chats = _read_chat_logs(chats_dir)
+    elif os.path.exists(legacy_path):
+        chats = _read_legacy_chats(legacy_path)
+    else:
+        chats = {}
+
+    memories = []
+    memory_path = os.path.join(user_dir, "memory.json")
+    if os.path.exists(memory_path):
+        with open(memory_path, "r", encoding="utf-8") as f:
+            memories = json.load(f)
+    return chats, memories
+
+
+def migrate(users_dir: str, db_path: str) -> dict:
+    """
+    Import every user folder under users_dir into the SQLite database at db_path
+    (sqlite_store.DB_PATH is pointed at it). The source tree is only read.
+    Returns per-run totals.
+    """
+    sqlite_store.DB_PATH = db_path
+
+    totals = {"users": 0, "chats": 0, "messages": 0}
+    if not os.path.isdir(users_dir):
+        return totals
+
+    for user_id in sorted(os.listdir(users_dir)):
+        user_dir = os.path.join(users_dir, user_id)
+        if not os.path.isdir(user_dir):
+            continue
+
+        chats, memories = read_user(user_dir)
+        n_chats, n_messages = sqlite_store.import_user(user_id, chats, memories)
+        totals["users"] += 1
+        totals["chats"] += n_chats
+        totals["messages"] += n_messages
+        print(f"✅ {user_id}: {n_chats} chats, {n_messages} messages, {len(memories)} memories")
+
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import JSON chat storage into SQLite.")
+    parser.add_argument("--users-dir", default=memory_manager.USERS_DIR)
+    parser.add_argument("--db", default=sqlite_store.DB_PATH)
+    args = parser.parse_args()
+
+    totals = migrate(args.users_dir, args.db)
+    print(f"📦 Imported {totals['users']} users, {totals['chats']} chats, {totals['messages']} messages into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
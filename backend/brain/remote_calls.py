@@ -0,0 +1,87 @@
+"""Shared plumbing for the outbound HTTP APIs (web search, LLM providers)."""
+import asyncio
+import threading
+
+import httpx
+
+
+# ---------------- METRICS ----------------
+class LatencyStats:
+    """Call latency histogram and error counts, exposed through /status."""
+
+    # Upper bounds (ms) of the latency histogram buckets
+    BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = None
+        self.last_error = None
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float, error: Exception = None):
+        with self._lock:
+            self.requests += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.last_ms = elapsed_ms
+            bucket = next((i for i, b in enumerate(self.BUCKETS_MS) if elapsed_ms <= b), len(self.BUCKETS_MS))
+            self.histogram[bucket] += 1
+            if error is not None:
+                self.errors += 1
+                self.last_error = str(error)
+                self._record_error(error)
+
+    def _record_error(self, error: Exception):
+        """Hook for subclasses that break errors down further; runs under the lock."""
+
+    def _snapshot(self) -> dict:
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "avg_latency_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+            "max_latency_ms": round(self.max_ms, 1),
+            "last_latency_ms": round(self.last_ms, 1) if self.last_ms is not None else None,
+            "latency_histogram": dict(zip(labels, self.histogram)),
+            "last_error": self.last_error,
+        }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return self._snapshot()
+
+
+# ---------------- CLIENTS ----------------
+class LoopAsyncClient:
+    """
+    httpx.AsyncClient built lazily from fixed settings. A client's connection pool
+    belongs to the event loop it was first used on, so a new one is made per loop.
+    """
+
+    def __init__(self, **settings):
+        self._settings = settings
+        self._client = None
+        self._loop = None
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(**self._settings)
+            self._loop = loop
+        return self._client
+
+    def reset(self):
+        self._client = None
+        self._loop = None
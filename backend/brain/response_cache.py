@@ -0,0 +1,144 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# CONFIGURATION
+# Opt-in: stateless knowledge questions ("what is the capital of France?") that open a
+# chat are answered from cache instead of a fresh LLM call
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+# Near-duplicate matching by embedding; off means exact (normalized) matches only
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+
+# Words that tie a question to the conversation, the user or the moment it is asked.
+# Their answers depend on history, memories or the clock, so they are never cached.
+_STATEFUL_WORDS = frozenset(
+    "i me my mine myself we us our ours you your yours yourself it its that this these those "
+    "he him his she her they them their again above previous earlier before last more else "
+    "also continue same now today tonight tomorrow yesterday current currently latest recent".split()
+)
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for a question: case-folded, whitespace collapsed, trailing punctuation dropped."""
+    return " ".join(text.casefold().split()).strip(" ?!.")
+
+
+def is_cacheable(text: str, memories=(), history=(), summary: str = "") -> bool:
+    """
+    True when the answer to `text` can't depend on who asks or what was said before:
+    the chat has no history or summary yet, no memories were retrieved for it, and
+    it doesn't refer to the user or the current time.
+    """
+    if memories or history or summary or not text.strip():
+        return False
+    words = re.findall(r"[a-z]+", text.casefold())
+    return bool(words) and not any(w in _STATEFUL_WORDS for w in words)
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of model replies keyed on (system prompt hash, normalized question).
+    With an `embed` function, a miss on the exact key falls back to the most similar
+    cached question under the same system prompt, if it clears `similarity`.
+    """
+
+    def __init__(self, ttl: float = None, max_size: int = None, embed=None, similarity: float = None):
+        self.ttl = RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.max_size = max_size or RESPONSE_CACHE_SIZE
+        self.embed = embed
+        self.similarity = similarity or RESPONSE_CACHE_SIMILARITY
+        self._entries = OrderedDict()  # (prompt_hash, question) -> (expires_at, reply, vector)
+        self._lock = threading.Lock()
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self.skipped = 0
+
+    @staticmethod
+    def prompt_hash(system_prompt: str) -> str:
+        return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+    def _vector(self, question: str):
+        vec = np.asarray(self.embed(question), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, system_prompt: str, text: str):
+        """Cached reply for `text`, or None."""
+        key = (self.prompt_hash(system_prompt), normalize_text(text))
+        now = time.monotonic()
+        with self._lock:
+            for k in [k for k, (expires_at, _, _) in self._entries.items() if expires_at < now]:
+                del self._entries[k]
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits["exact"] += 1
+                return entry[1]
+            candidates = [(k, v) for k, (_, _, v) in self._entries.items() if k[0] == key[0] and v is not None]
+
+        if self.embed is not None and candidates:
+            query = self._vector(key[1])
+            scores = np.stack([v for _, v in candidates]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity:
+                with self._lock:
+                    entry = self._entries.get(candidates[best][0])
+                    if entry is not None:
+                        self._entries.move_to_end(candidates[best][0])
+                        self.hits["semantic"] += 1
+                        return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, system_prompt: str, text: str, reply: str):
+        key = (self.prompt_hash(system_prompt), normalize_text(text))
+        vector = self._vector(key[1]) if self.embed is not None else None
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, reply, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def skip(self):
+        """Count a question that was answered without consulting the cache."""
+        with self._lock:
+            self.skipped += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits["exact"] + self.hits["semantic"]
+            lookups = hits + self.misses
+            return {
+                "enabled": RESPONSE_CACHE,
+                "semantic": self.embed is not None,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _embed_question(text: str) -> list:
+    # Same embedder (and embedding cache) as long-term memory
+    from . import memory_services
+    return memory_services.stores.embeddings().embed_query(text)
+
+
+cache = ResponseCache(embed=_embed_question if RESPONSE_CACHE_SEMANTIC else None)
@@ -1,96 +1,403 @@
-import warnings
+import asyncio
+import gc
+import io
 import os
-import shutil
-import sys
-import torch
-import torchaudio
-import whisper
-import soundfile as sf
-import numpy as np
+import threading
+import time
+import warnings
+import wave
+from concurrent.futures import Future
 
-if not hasattr(torchaudio, "list_audio_backends"):
-    def _list_audio_backends():
-        return ["soundfile"]
-    torchaudio.list_audio_backends = _list_audio_backends
+import numpy as np
 
-from speechbrain.inference import EncoderClassifier
-from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+from . import voice_profiles
+from .batching import MicroBatcher
 
 warnings.filterwarnings("ignore", category=UserWarning)
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"Speech Services running on: {DEVICE}")
-
+# CONFIGURATION
+# Nothing heavy is imported or loaded here: torch, Whisper, SpeechT5 and the
+# x-vector encoder are all pulled in by the first call that needs them.
 VOICE_FILENAME = "jarvis_voice.wav"
-VOICES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "voices")
-REF_VOICE_PATH = os.path.join(VOICES_DIR, VOICE_FILENAME)
-
-print("Loading Whisper model...")
-stt_model = whisper.load_model("base", device=DEVICE)
-
-print("Loading SpeechT5 models...")
-processor = SpeechT5Processor.from_pretrained("microsoft/speecht5_tts")
-tts_model = SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts").to(DEVICE)
-vocoder = SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan").to(DEVICE)
-
-print("Loading Voice Encoder...")
-classifier = EncoderClassifier.from_hparams(
-    source="speechbrain/spkrec-xvect-voxceleb", 
-    savedir="pretrained_xvect",
-    run_opts={"device": DEVICE}
-)
-
-def get_speaker_embedding(path):
-    if os.path.exists(path):
-        try:
-            signal, fs = torchaudio.load(path)
-            if fs != 16000:
-                transform = torchaudio.transforms.Resample(orig_freq=fs, new_freq=16000)
-                signal = transform(signal)
-            
-            with torch.no_grad():
-                embeddings = classifier.encode_batch(signal)
-                embeddings = torch.nn.functional.normalize(embeddings, dim=2)
-                xvec = embeddings.squeeze().mean(dim=0).unsqueeze(0)
-                if xvec.shape[-1] > 512:
-                    xvec = xvec[:, :512]
-            
-            print(f"Loaded Voice Profile: {path}")
-            return xvec.to(DEVICE)
-        except Exception as e:
-            print(f"Error loading voice file: {e}")
-    
-    print("Using Default System Voice (Randomized)")
-    return torch.randn(1, 512).to(DEVICE)
+VOICES_DIR = voice_profiles.VOICES_DIR
+REF_VOICE_PATH = os.path.join(VOICES_DIR, VOICE_FILENAME)  # source of the default profile
 
-SPEAKER_EMBEDDING = get_speaker_embedding(REF_VOICE_PATH)
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "base")
+SPEECHT5_MODEL = "microsoft/speecht5_tts"
+SPEECHT5_VOCODER = "microsoft/speecht5_hifigan"
+XVECTOR_SOURCE = "speechbrain/spkrec-xvect-voxceleb"
+XVECTOR_SAVEDIR = "pretrained_xvect"
 
-def transcribe_audio(file_path: str):
+SPEECH_DEVICE = os.getenv("SPEECH_DEVICE")  # default: cuda when available, else cpu
+# Models unused for this long are dropped from memory (0 keeps them forever)
+SPEECH_IDLE_UNLOAD_SECONDS = float(os.getenv("SPEECH_IDLE_UNLOAD_SECONDS", "600"))
+
+# Local TTS worker: requests arriving within LOCAL_TTS_BATCH_WAIT_MS of each other
+# are synthesized as one padded batch of up to LOCAL_TTS_MAX_BATCH texts
+LOCAL_TTS_MAX_BATCH = int(os.getenv("LOCAL_TTS_MAX_BATCH", "8"))
+LOCAL_TTS_BATCH_WAIT_MS = float(os.getenv("LOCAL_TTS_BATCH_WAIT_MS", "20"))
+LOCAL_TTS_THREADS = int(os.getenv("LOCAL_TTS_THREADS", "0"))  # torch intra-op threads; 0 = torch default
+TTS_SAMPLE_RATE = 16000  # SpeechT5 + HiFiGAN output rate
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable."""
     try:
-        abs_path = os.path.abspath(file_path)
-        if not os.path.exists(abs_path):
-            return "Error: Audio file missing."
-            
-        result = stt_model.transcribe(abs_path, fp16=False)
-        text = result["text"].strip()
-        return text if text else "..."
-    except Exception as e:
-        print(f"Transcription Error: {e}")
-        return "..."
-
-def generate_speech(text: str, output_file: str):
-    if not text:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
         return None
-    
-    inputs = processor(text=text, return_tensors="pt").to(DEVICE)
-    
-    with torch.no_grad():
-        audio = tts_model.generate_speech(
-            inputs["input_ids"], 
-            SPEAKER_EMBEDDING, 
-            vocoder=vocoder
+
+
+def _tensor_bytes(value):
+    """Parameter + buffer bytes of every torch module in `value` (a module or a tuple of them)."""
+    parts = value if isinstance(value, (tuple, list)) else (value,)
+    total = 0
+    for part in parts:
+        for attr in ("parameters", "buffers"):
+            if hasattr(part, attr):
+                total += sum(t.numel() * t.element_size() for t in getattr(part, attr)())
+    return total or None
+
+
+class LazyModel:
+    """
+    A model that is loaded on first get(), behind its own lock so concurrent
+    first callers load it once. Remembers how long the load took and roughly
+    how much memory it holds, and can be unloaded again.
+    """
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.loads = 0
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.last_used = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def get(self):
+        with self._lock:
+            if self._value is None:
+                print(f"⏳ Loading {self.name}...")
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                self._value = self._loader()
+                self.load_seconds = time.perf_counter() - start
+                rss_after = _rss_bytes()
+                self.memory_bytes = _tensor_bytes(self._value) or (
+                    rss_after - rss_before if rss_before is not None and rss_after is not None else None
+                )
+                self.loads += 1
+                print(f"✅ {self.name} loaded in {self.load_seconds:.1f}s")
+            self.last_used = time.monotonic()
+            return self._value
+
+    def unload(self) -> bool:
+        with self._lock:
+            if self._value is None:
+                return False
+            self._value = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        print(f"💤 Unloaded {self.name}")
+        return True
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "loads": self.loads,
+            "load_seconds": round(self.load_seconds, 2) if self.load_seconds is not None else None,
+            "memory_mb": round(self.memory_bytes / 2**20, 1) if self.memory_bytes else None,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1) if self.loaded and self.last_used else None,
+        }
+
+
+class LocalSpeechEngine:
+    """Offline STT (openai-whisper) and TTS (SpeechT5 + HiFiGAN with an x-vector voice)."""
+
+    def __init__(self, idle_unload_seconds: float = SPEECH_IDLE_UNLOAD_SECONDS):
+        self.idle_unload_seconds = idle_unload_seconds
+        self.stt = LazyModel(f"Whisper '{LOCAL_WHISPER_MODEL}'", self._load_whisper)
+        self.tts = LazyModel("SpeechT5", self._load_speecht5)
+        self.encoder = LazyModel("x-vector voice encoder", self._load_encoder)
+        self._device = SPEECH_DEVICE
+        self._embeddings = {}
+        self._embedding_lock = threading.Lock()
+        self._reaper = None
+        self._reaper_lock = threading.Lock()
+
+    @property
+    def models(self):
+        return (self.stt, self.tts, self.encoder)
+
+    @property
+    def device(self) -> str:
+        if self._device is None:
+            import torch
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"Speech Services running on: {self._device}")
+        return self._device
+
+    # ---------------- LOADERS ----------------
+    def _load_whisper(self):
+        import whisper
+        return whisper.load_model(LOCAL_WHISPER_MODEL, device=self.device)
+
+    def _load_speecht5(self):
+        from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+        processor = SpeechT5Processor.from_pretrained(SPEECHT5_MODEL)
+        model = SpeechT5ForTextToSpeech.from_pretrained(SPEECHT5_MODEL).to(self.device)
+        vocoder = SpeechT5HifiGan.from_pretrained(SPEECHT5_VOCODER).to(self.device)
+        return processor, model, vocoder
+
+    def _load_encoder(self):
+        import torchaudio
+        if not hasattr(torchaudio, "list_audio_backends"):
+            def _list_audio_backends():
+                return ["soundfile"]
+            torchaudio.list_audio_backends = _list_audio_backends
+
+        from speechbrain.inference import EncoderClassifier
+        return EncoderClassifier.from_hparams(
+            source=XVECTOR_SOURCE,
+            savedir=XVECTOR_SAVEDIR,
+            run_opts={"device": self.device}
         )
-    
-    sf.write(output_file, audio.cpu().numpy(), 16000)
-    return output_file
\ No newline at end of file
+
+    def _use(self, model: LazyModel):
+        value = model.get()
+        self._start_reaper()
+        return value
+
+    # ---------------- IDLE UNLOAD ----------------
+    def unload_idle(self, now: float = None) -> list:
+        """Unload every model unused for idle_unload_seconds; returns their names."""
+        if not self.idle_unload_seconds:
+            return []
+        now = time.monotonic() if now is None else now
+        return [
+            m.name for m in self.models
+            if m.loaded and m.last_used is not None
+            and now - m.last_used >= self.idle_unload_seconds
+            and m.unload()
+        ]
+
+    def _start_reaper(self):
+        if not self.idle_unload_seconds:
+            return
+        with self._reaper_lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_forever, name="speech-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_forever(self):
+        interval = max(1.0, min(60.0, self.idle_unload_seconds / 2))
+        while True:
+            time.sleep(interval)
+            self.unload_idle()
+
+    # ---------------- SPEECH ----------------
+    def encode_speaker(self, wav_path: str):
+        """Run the x-vector encoder over a reference recording; (512,) float32 numpy vector."""
+        import torch
+        import torchaudio
+        signal, fs = torchaudio.load(wav_path)
+        if fs != 16000:
+            transform = torchaudio.transforms.Resample(orig_freq=fs, new_freq=16000)
+            signal = transform(signal)
+
+        with torch.no_grad():
+            embeddings = self._use(self.encoder).encode_batch(signal)
+            embeddings = torch.nn.functional.normalize(embeddings, dim=2)
+            xvec = embeddings.squeeze().mean(dim=0)
+        return xvec[:voice_profiles.EMBEDDING_DIM].cpu().numpy()
+
+    def get_speaker_embedding(self, voice: str = None):
+        """
+        (1, 512) speaker tensor for a voice profile (default: DEFAULT_VOICE_PROFILE).
+        Profiles come from the voice-profile store; the encoder only ever runs if the
+        default profile has not been built yet and its reference wav is present.
+        """
+        import torch
+        name = voice or voice_profiles.DEFAULT_VOICE_PROFILE
+        with self._embedding_lock:
+            if name in self._embeddings:
+                return self._embeddings[name]
+
+            profiles = voice_profiles.store
+            if name not in profiles and voice is None and os.path.exists(REF_VOICE_PATH):
+                try:
+                    profiles.add_wav(name, REF_VOICE_PATH, self.encode_speaker)
+                except Exception as e:
+                    print(f"Error loading voice file: {e}")
+                # One-off job; the encoder is not needed again
+                self.encoder.unload()
+
+            if name in profiles:
+                print(f"Loaded Voice Profile: {name}")
+                vector = torch.from_numpy(np.array(profiles.get(name)))
+            elif voice is None:
+                print("Using Default System Voice (Randomized)")
+                vector = torch.randn(voice_profiles.EMBEDDING_DIM)
+            else:
+                raise ValueError(f"Unknown voice profile: {voice}")
+
+            embedding = self._embeddings[name] = vector.unsqueeze(0).to(self.device)
+            return embedding
+
+    def transcribe_audio(self, file_path: str):
+        try:
+            abs_path = os.path.abspath(file_path)
+            if not os.path.exists(abs_path):
+                return "Error: Audio file missing."
+
+            result = self._use(self.stt).transcribe(abs_path, fp16=False)
+            text = result["text"].strip()
+            return text if text else "..."
+        except Exception as e:
+            print(f"Transcription Error: {e}")
+            return "..."
+
+    def generate_speech(self, text: str, output_file: str, voice: str = None):
+        if not text:
+            return None
+
+        import torch
+        import soundfile as sf
+
+        speaker = self.get_speaker_embedding(voice)
+        processor, model, vocoder = self._use(self.tts)
+        inputs = processor(text=text, return_tensors="pt").to(self.device)
+
+        with torch.no_grad():
+            audio = model.generate_speech(
+                inputs["input_ids"],
+                speaker,
+                vocoder=vocoder
+            )
+
+        sf.write(output_file, audio.cpu().numpy(), 16000)
+        return output_file
+
+    def check_voice(self, voice: str):
+        """Raise ValueError for an unknown voice profile, before it can join a batch."""
+        if voice not in self._embeddings and voice not in voice_profiles.store:
+            raise ValueError(f"Unknown voice profile: {voice}")
+
+    def synthesize_batch(self, texts: list, voices: list) -> list:
+        """
+        Synthesize several texts in one padded forward pass.
+        Returns one float32 waveform per text, trimmed to its real length.
+        """
+        import torch
+
+        processor, model, vocoder = self._use(self.tts)
+        speakers = torch.cat([self.get_speaker_embedding(v) for v in voices])
+        inputs = processor(text=texts, return_tensors="pt", padding=True).to(self.device)
+
+        with torch.inference_mode():
+            waveforms, lengths = model.generate_speech(
+                inputs["input_ids"],
+                speakers,
+                attention_mask=inputs["attention_mask"],
+                vocoder=vocoder,
+                return_output_lengths=True
+            )
+
+        waveforms = waveforms.reshape(len(texts), -1).float().cpu().numpy()
+        return [waveforms[i, :int(n)] for i, n in enumerate(lengths)]
+
+    def status(self) -> dict:
+        return {
+            "device": self._device,
+            "idle_unload_seconds": self.idle_unload_seconds,
+            "voice_profiles": voice_profiles.store.names(),
+            "models": {m.name: m.status() for m in self.models},
+        }
+
+
+engine = LocalSpeechEngine()
+
+
+# ---------------- LOCAL TTS WORKER ----------------
+def to_wav_bytes(samples: np.ndarray, sample_rate: int = TTS_SAMPLE_RATE) -> bytes:
+    """Float waveform in [-1, 1] to a mono 16-bit WAV file, in memory."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+class BatchedSpeechWorker(MicroBatcher):
+    """
+    One inference thread in front of the local TTS model. Requests queue up while
+    a batch is running; the next batch takes everything waiting (up to max_batch),
+    lingering batch_wait_ms for stragglers, so throughput grows with load instead
+    of requests contending for the CPU. Voices are checked with check_voice before
+    queueing, so one bad voice can't fail everyone else's batch.
+    """
+
+    def __init__(self, synthesize_batch, max_batch: int = LOCAL_TTS_MAX_BATCH,
+                 batch_wait_ms: float = LOCAL_TTS_BATCH_WAIT_MS, threads: int = LOCAL_TTS_THREADS,
+                 check_voice=None):
+        super().__init__(
+            lambda jobs: synthesize_batch([text for text, _ in jobs], [voice for _, voice in jobs]),
+            max_batch=max_batch,
+            batch_wait_ms=batch_wait_ms,
+            name="local-tts",
+        )
+        self.threads = threads
+        self.check_voice = check_voice
+
+    def on_start(self):
+        if self.threads:
+            try:
+                import torch
+                torch.set_num_threads(self.threads)
+            except ImportError:
+                pass
+
+    def submit(self, text: str, voice: str = None) -> Future:
+        if voice is not None and self.check_voice is not None:
+            self.check_voice(voice)
+        return super().submit((text, voice))
+
+    async def synthesize(self, text: str, voice: str = None) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(text, voice))
+
+
+tts_worker = BatchedSpeechWorker(engine.synthesize_batch, check_voice=engine.check_voice)
+
+
+def get_status() -> dict:
+    return {**engine.status(), "tts_worker": tts_worker.stats()}
+
+
+# Module-level API kept for existing callers
+def get_speaker_embedding(voice: str = None):
+    return engine.get_speaker_embedding(voice)
+
+
+def transcribe_audio(file_path: str):
+    return engine.transcribe_audio(file_path)
+
+
+def generate_speech(text: str, output_file: str, voice: str = None):
+    return engine.generate_speech(text, output_file, voice)
@@ -0,0 +1,281 @@
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from . import memory_manager
+
+# CONFIGURATION
+DB_PATH = os.getenv("JARVIS_SQLITE_PATH", os.path.join(memory_manager.DATA_DIR, "jarvis.db"))
+BUSY_TIMEOUT_MS = int(os.getenv("JARVIS_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id     TEXT PRIMARY KEY,
+    created_at  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id     TEXT PRIMARY KEY,
+    user_id     TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    title       TEXT NOT NULL,
+    created_at  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_user_created ON chats(user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id          INTEGER PRIMARY KEY,
+    chat_id     TEXT NOT NULL REFERENCES chats(chat_id) ON DELETE CASCADE,
+    seq         INTEGER NOT NULL,
+    role        TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    timestamp   TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_chat_seq ON messages(chat_id, seq);
+
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    chat_id     TEXT PRIMARY KEY REFERENCES chats(chat_id) ON DELETE CASCADE,
+    text        TEXT NOT NULL,
+    upto_seq    INTEGER NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS memories (
+    id          INTEGER PRIMARY KEY,
+    user_id     TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    text        TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    UNIQUE (user_id, text)
+);
+CREATE INDEX IF NOT EXISTS idx_memories_user_created ON memories(user_id, created_at);
+"""
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+# CONNECTIONS
+def _connect(path: str) -> sqlite3.Connection:
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+
+    # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+
+    with _schema_lock:
+        if path not in _schema_ready:
+            conn.executescript(SCHEMA)
+            _schema_ready.add(path)
+    return conn
+
+def _get_conn() -> sqlite3.Connection:
+    """One connection per thread; SQLite connections must not be shared across threads."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _local.conn = _connect(DB_PATH)
+        _local.path = DB_PATH
+    return conn
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT, so concurrent writers queue instead of racing."""
+
+    def __enter__(self):
+        self.conn = _get_conn()
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+def _user_key(user_id: str) -> str:
+    return memory_manager._sanitize_user_id(user_id)
+
+def _ensure_user(conn: sqlite3.Connection, user_id: str):
+    conn.execute(
+        "INSERT OR IGNORE INTO users (user_id, created_at) VALUES (?, ?)",
+        (_user_key(user_id), datetime.utcnow().isoformat()),
+    )
+
+# PUBLIC INIT
+def init_db(user_id: str):
+    with _transaction() as conn:
+        _ensure_user(conn, user_id)
+
+# CHAT FUNCTIONS
+def get_all_chats(user_id: str):
+    rows = _get_conn().execute(
+        "SELECT chat_id, title, created_at FROM chats WHERE user_id = ? ORDER BY created_at DESC",
+        (_user_key(user_id),),
+    ).fetchall()
+    return [
+        {"chat_id": r["chat_id"], "name": r["title"], "timestamp": r["created_at"]}
+        for r in rows
+    ]
+
+def create_new_chat(user_id: str):
+    chat_id = uuid.uuid4().hex
+    title = "New Conversation"
+
+    with _transaction() as conn:
+        _ensure_user(conn, user_id)
+        conn.execute(
+            "INSERT INTO chats (chat_id, user_id, title, created_at) VALUES (?, ?, ?, ?)",
+            (chat_id, _user_key(user_id), title, datetime.utcnow().isoformat()),
+        )
+
+    return {"chat_id": chat_id, "name": title}
+
+def rename_chat(chat_id: str, new_name: str, user_id: str):
+    with _transaction() as conn:
+        cur = conn.execute(
+            "UPDATE chats SET title = ? WHERE chat_id = ? AND user_id = ?",
+            (new_name, chat_id, _user_key(user_id)),
+        )
+    return cur.rowcount > 0
+
+def delete_chat(chat_id: str, user_id: str):
+    with _transaction() as conn:
+        cur = conn.execute(
+            "DELETE FROM chats WHERE chat_id = ? AND user_id = ?",
+            (chat_id, _user_key(user_id)),
+        )
+    return cur.rowcount > 0
+
+def get_chat_history(chat_id: str, user_id: str):
+    rows = _get_conn().execute(
+        "SELECT m.seq, m.role, m.content, m.timestamp FROM messages m "
+        "JOIN chats c ON c.chat_id = m.chat_id "
+        "WHERE m.chat_id = ? AND c.user_id = ? ORDER BY m.seq",
+        (chat_id, _user_key(user_id)),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+def _iter_messages_desc(chat_id: str, user_id: str, before=None):
+    sql = (
+        "SELECT m.seq, m.role, m.content, m.timestamp FROM messages m "
+        "JOIN chats c ON c.chat_id = m.chat_id "
+        "WHERE m.chat_id = ? AND c.user_id = ?"
+    )
+    params = [chat_id, _user_key(user_id)]
+    if before is not None:
+        sql += " AND m.seq < ?"
+        params.append(before)
+    sql += " ORDER BY m.seq DESC"
+    # Rows are pulled lazily from the (chat_id, seq) index as the caller iterates
+    cur = _get_conn().execute(sql, params)
+    try:
+        for row in cur:
+            yield dict(row)
+    finally:
+        cur.close()
+
+def get_recent_history(chat_id: str, user_id: str, limit: int = None, max_tokens: int = None):
+    return memory_manager._take_tail(
+        _iter_messages_desc(chat_id, user_id),
+        limit=limit,
+        max_tokens=max_tokens,
+    )
+
+def get_history_page(chat_id: str, user_id: str, before: int = None, limit: int = 50):
+    return memory_manager._take_tail(
+        _iter_messages_desc(chat_id, user_id, before),
+        limit=limit,
+    )
+
+def append_to_chat(chat_id: str, role: str, content: str, user_id: str):
+    with _transaction() as conn:
+        owned = conn.execute(
+            "SELECT 1 FROM chats WHERE chat_id = ? AND user_id = ?",
+            (chat_id, _user_key(user_id)),
+        ).fetchone()
+        if not owned:
+            return
+
+        conn.execute(
+            "INSERT INTO messages (chat_id, seq, role, content, timestamp) "
+            "SELECT ?, COALESCE(MAX(seq) + 1, 0), ?, ?, ? FROM messages WHERE chat_id = ?",
+            (chat_id, role, content, datetime.utcnow().isoformat(), chat_id),
+        )
+
+def get_chat_summary(chat_id: str, user_id: str):
+    row = _get_conn().execute(
+        "SELECT s.text, s.upto_seq FROM chat_summaries s "
+        "JOIN chats c ON c.chat_id = s.chat_id "
+        "WHERE s.chat_id = ? AND c.user_id = ?",
+        (chat_id, _user_key(user_id)),
+    ).fetchone()
+    return dict(row) if row else None
+
+def save_chat_summary(chat_id: str, user_id: str, text: str, upto_seq: int):
+    with _transaction() as conn:
+        owned = conn.execute(
+            "SELECT 1 FROM chats WHERE chat_id = ? AND user_id = ?",
+            (chat_id, _user_key(user_id)),
+        ).fetchone()
+        if not owned:
+            return
+
+        conn.execute(
+            "INSERT INTO chat_summaries (chat_id, text, upto_seq, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET text = excluded.text, "
+            "upto_seq = excluded.upto_seq, updated_at = excluded.updated_at",
+            (chat_id, text, upto_seq, datetime.utcnow().isoformat()),
+        )
+
+# LONG-TERM MEMORY
+def get_long_term_memory(user_id: str):
+    rows = _get_conn().execute(
+        "SELECT text FROM memories WHERE user_id = ? ORDER BY created_at, id",
+        (_user_key(user_id),),
+    ).fetchall()
+    return [r["text"] for r in rows]
+
+def add_long_term_memory(memory_text: str, user_id: str):
+    with _transaction() as conn:
+        _ensure_user(conn, user_id)
+        conn.execute(
+            "INSERT OR IGNORE INTO memories (user_id, text, created_at) VALUES (?, ?, ?)",
+            (_user_key(user_id), memory_text, datetime.utcnow().isoformat()),
+        )
+
+# MIGRATION
+def import_user(user_id: str, chats: dict, memories: list) -> tuple:
+    """
+    Import one user's chats ({chat_id: {title, created_at, messages}}) and memories.
+    Safe to re-run: rows that already exist are left untouched.
+    Returns (chats_imported, messages_imported).
+    """
+    n_chats = n_messages = 0
+    with _transaction() as conn:
+        _ensure_user(conn, user_id)
+        for chat_id, chat in chats.items():
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO chats (chat_id, user_id, title, created_at) VALUES (?, ?, ?, ?)",
+                (chat_id, _user_key(user_id), chat.get("title", "New Conversation"), chat.get("created_at", "")),
+            )
+            n_chats += cur.rowcount
+            for seq, msg in enumerate(chat.get("messages", [])):
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO messages (chat_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    (chat_id, msg.get("seq", seq), msg.get("role", "human"), msg.get("content", ""), msg.get("timestamp", "")),
+                )
+                n_messages += cur.rowcount
+        for text in memories:
+            conn.execute(
+                "INSERT OR IGNORE INTO memories (user_id, text, created_at) VALUES (?, ?, ?)",
+                (_user_key(user_id), text, datetime.utcnow().isoformat()),
+            )
+    return n_chats, n_messages
@@ -0,0 +1,435 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+# CONFIGURATION
+FFMPEG_PATH = shutil.which("ffmpeg")
+SAMPLE_RATE = 16000  # what Whisper expects
+
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "tiny.en")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+# beam_size=1 is greedy decoding: fastest, slightly less accurate
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+# Skip silence with Silero VAD before decoding
+WHISPER_VAD_FILTER = os.getenv("WHISPER_VAD_FILTER", "false").lower() in ("1", "true", "yes")
+
+# Transcriptions run here, never on the event loop; extra requests wait in the queue
+STT_WORKERS = int(os.getenv("STT_WORKERS", "2"))
+
+# Live transcription over /ws/stt
+STT_STREAM_MAX_SECONDS = float(os.getenv("STT_STREAM_MAX_SECONDS", "30"))  # per-session audio cap
+STT_PARTIAL_INTERVAL = float(os.getenv("STT_PARTIAL_INTERVAL_MS", "800")) / 1000
+STT_ENDPOINT_SILENCE = float(os.getenv("STT_ENDPOINT_SILENCE_MS", "600")) / 1000
+STT_VAD_THRESHOLD = float(os.getenv("STT_VAD_THRESHOLD", "0.01"))  # frame RMS counted as speech
+STT_PREROLL = 0.3  # seconds kept from before speech starts, so the first syllable isn't clipped
+VAD_FRAME = SAMPLE_RATE * 30 // 1000  # 30 ms
+
+
+class AudioDecodeError(RuntimeError):
+    """ffmpeg could not turn the uploaded bytes into audio."""
+
+
+async def decode_audio(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode any container ffmpeg understands (webm/opus from the browser, wav, mp3, ...)
+    into mono float32 PCM in [-1, 1]. Bytes go in through stdin and samples come back
+    on stdout, so nothing touches the disk and the event loop is never blocked.
+    """
+    if not FFMPEG_PATH:
+        raise AudioDecodeError("ffmpeg is not installed")
+
+    proc = await asyncio.create_subprocess_exec(
+        FFMPEG_PATH,
+        "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ac", "1", "-ar", str(sample_rate),
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    pcm, err = await proc.communicate(data)
+
+    if proc.returncode != 0:
+        raise AudioDecodeError(err.decode(errors="ignore").strip() or f"ffmpeg exited with {proc.returncode}")
+
+    return pcm16_to_float(pcm)
+
+
+# ---------------- METRICS ----------------
+class STTStats:
+    """Queue depth and latency of the transcription pool, exposed through /status."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queued = 0
+            self.active = 0
+            self.completed = 0
+            self.errors = 0
+            self.total_wait_ms = 0.0
+            self.total_run_ms = 0.0
+            self.audio_seconds = 0.0
+
+    def enqueued(self):
+        with self._lock:
+            self.queued += 1
+
+    def started(self, wait_ms: float):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait_ms += wait_ms
+
+    def finished(self, run_ms: float, audio_seconds: float, error: bool = False):
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+            self.total_run_ms += run_ms
+            self.audio_seconds += audio_seconds
+            if error:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            done = self.completed
+            return {
+                "model": WHISPER_MODEL_SIZE,
+                "loaded": _model is not None,
+                "workers": STT_WORKERS,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "completed": done,
+                "errors": self.errors,
+                "avg_wait_ms": round(self.total_wait_ms / done, 1) if done else None,
+                "avg_run_ms": round(self.total_run_ms / done, 1) if done else None,
+                # Seconds of compute per second of audio; below 1 is faster than real time
+                "real_time_factor": round(self.total_run_ms / 1000 / self.audio_seconds, 3) if self.audio_seconds else None,
+            }
+
+
+stats = STTStats()
+
+
+# ---------------- MODEL ----------------
+_model = None
+_model_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+
+
+def get_whisper_model() -> WhisperModel:
+    """Load the shared Whisper model on first use. CTranslate2 models are safe to share across threads."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            print(f"🎙️ Loading Whisper model '{WHISPER_MODEL_SIZE}' ({WHISPER_DEVICE}/{WHISPER_COMPUTE_TYPE})")
+            _model = WhisperModel(WHISPER_MODEL_SIZE, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
+        return _model
+
+
+def get_stt_stats() -> dict:
+    return stats.snapshot()
+
+
+# ---------------- TRANSCRIPTION ----------------
+def _transcribe_worker(audio, language, beam_size, vad_filter, emit, cancelled, enqueued_at):
+    """
+    Runs on the STT pool. faster-whisper decodes lazily, so each segment is
+    handed to `emit` as soon as it exists rather than after the whole clip.
+    """
+    started_at = time.perf_counter()
+    stats.started((started_at - enqueued_at) * 1000)
+    error = False
+    try:
+        model = get_whisper_model()
+        segments, _info = model.transcribe(
+            audio,
+            language=language,
+            beam_size=beam_size,
+            vad_filter=vad_filter,
+        )
+        for seg in segments:
+            if cancelled.is_set():
+                break
+            emit({"text": seg.text.strip(), "start": round(seg.start, 2), "end": round(seg.end, 2)})
+    except Exception:
+        error = True
+        raise
+    finally:
+        stats.finished((time.perf_counter() - started_at) * 1000, len(audio) / SAMPLE_RATE, error)
+
+
+async def transcribe_stream(audio: np.ndarray, language: str = "en", beam_size: int = None, vad_filter: bool = None):
+    """
+    Async generator of {"text", "start", "end"} segments, yielded while the
+    rest of the clip is still being decoded. Closing it early stops the worker
+    at the next segment boundary.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    cancelled = threading.Event()
+
+    def emit(segment):
+        loop.call_soon_threadsafe(queue.put_nowait, segment)
+
+    stats.enqueued()
+    future = loop.run_in_executor(
+        _executor,
+        _transcribe_worker,
+        audio,
+        language,
+        WHISPER_BEAM_SIZE if beam_size is None else beam_size,
+        WHISPER_VAD_FILTER if vad_filter is None else vad_filter,
+        emit,
+        cancelled,
+        time.perf_counter(),
+    )
+
+    def on_done(f):
+        # Runs on the loop after every emit the worker scheduled, so the sentinel is last.
+        # Touching the exception also keeps an abandoned stream from logging it as unretrieved.
+        f.cancelled() or f.exception()
+        queue.put_nowait(done)
+
+    future.add_done_callback(on_done)
+
+    try:
+        while True:
+            segment = await queue.get()
+            if segment is done:
+                break
+            yield segment
+        await future  # surfaces worker errors
+    finally:
+        cancelled.set()
+
+
+async def transcribe(audio: np.ndarray, **options) -> str:
+    """Whole-clip transcription on the STT pool."""
+    return " ".join([seg["text"] async for seg in transcribe_stream(audio, **options)]).strip()
+
+
+# ---------------- LIVE STREAMING ----------------
+class RingBuffer:
+    """Fixed-size float32 audio buffer; once full, the oldest samples are overwritten."""
+
+    def __init__(self, capacity: int):
+        self._buf = np.zeros(capacity, dtype=np.float32)
+        self._end = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, samples: np.ndarray):
+        cap = len(self._buf)
+        n = len(samples)
+        if n >= cap:
+            self._buf[:] = samples[-cap:]
+            self._end, self._size = 0, cap
+            return
+        first = min(n, cap - self._end)
+        self._buf[self._end:self._end + first] = samples[:first]
+        self._buf[:n - first] = samples[first:]
+        self._end = (self._end + n) % cap
+        self._size = min(cap, self._size + n)
+
+    def get(self) -> np.ndarray:
+        """The buffered samples, oldest first, as a new array."""
+        start = (self._end - self._size) % len(self._buf)
+        if start + self._size <= len(self._buf):
+            return self._buf[start:start + self._size].copy()
+        return np.concatenate((self._buf[start:], self._buf[:self._end]))
+
+    def keep_last(self, n: int):
+        self._size = min(self._size, n)
+
+    def clear(self):
+        self._size = 0
+
+    @property
+    def full(self) -> bool:
+        return self._size == len(self._buf)
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Little-endian int16 PCM to float32 in [-1, 1]."""
+    # An odd trailing byte can only be a truncated sample
+    data = data[: len(data) - (len(data) % 2)]
+    return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class StreamDecoder:
+    """
+    One long-running ffmpeg process per live session. Container chunks (e.g. webm/opus
+    from MediaRecorder) go in on stdin as they arrive; PCM is handed to `on_audio` as
+    ffmpeg produces it.
+    """
+
+    def __init__(self, on_audio, sample_rate: int = SAMPLE_RATE):
+        self.on_audio = on_audio
+        self.sample_rate = sample_rate
+        self._proc = None
+        self._reader = None
+
+    async def start(self):
+        if not FFMPEG_PATH:
+            raise AudioDecodeError("ffmpeg is not installed")
+        self._proc = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH,
+            "-hide_banner", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ac", "1", "-ar", str(self.sample_rate),
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        leftover = b""
+        while True:
+            chunk = await self._proc.stdout.read(8192)
+            if not chunk:
+                break
+            chunk = leftover + chunk
+            cut = len(chunk) - (len(chunk) % 2)
+            leftover = chunk[cut:]
+            await self.on_audio(pcm16_to_float(chunk[:cut]))
+
+    async def feed(self, data: bytes):
+        try:
+            self._proc.stdin.write(data)
+            await self._proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            raise AudioDecodeError("ffmpeg stopped accepting audio")
+
+    async def close(self):
+        """Flush ffmpeg, wait for the last samples to be delivered, and reap the process."""
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except Exception:
+            pass
+        await self._reader
+        await self._proc.wait()
+        self._proc = None
+
+
+class StreamingSession:
+    """
+    Voice-activity endpointing for one /ws/stt client.
+
+    Audio is pushed in as float32 PCM. Energy VAD on 30 ms frames finds where an
+    utterance starts and ends. While the user speaks, a greedy partial transcript is
+    refreshed every STT_PARTIAL_INTERVAL. After STT_ENDPOINT_SILENCE of silence, the
+    utterance is decoded once more with full beam search and VAD filtering, and sent
+    as the final transcript.
+
+    All sessions share the one model and the STT pool. A session never has more
+    than one partial in flight, and partials are skipped while other jobs are
+    waiting, so finals stay fast under load.
+    """
+
+    def __init__(self, send):
+        self.send = send
+        self.buffer = RingBuffer(int(STT_STREAM_MAX_SECONDS * SAMPLE_RATE))
+        self.in_speech = False
+        self.utterance = 0
+        self._silence = 0.0
+        self._since_partial = 0.0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._partial_task = None
+        self._final_task = None
+
+    async def push(self, samples: np.ndarray):
+        samples = np.concatenate((self._pending, samples)) if len(self._pending) else samples
+        n_frames = len(samples) // VAD_FRAME
+        self._pending = samples[n_frames * VAD_FRAME:]
+        if not n_frames:
+            return
+
+        frames = samples[:n_frames * VAD_FRAME].reshape(n_frames, VAD_FRAME)
+        voiced = np.sqrt(np.mean(frames ** 2, axis=1)) >= STT_VAD_THRESHOLD
+        frame_seconds = VAD_FRAME / SAMPLE_RATE
+
+        for frame, is_voiced in zip(frames, voiced):
+            self.buffer.extend(frame)
+            if not self.in_speech:
+                if is_voiced:
+                    self.in_speech = True
+                    self._silence = 0.0
+                    self._since_partial = 0.0
+                else:
+                    self.buffer.keep_last(int(STT_PREROLL * SAMPLE_RATE))
+                continue
+
+            self._since_partial += frame_seconds
+            self._silence = 0.0 if is_voiced else self._silence + frame_seconds
+            if self._silence >= STT_ENDPOINT_SILENCE or self.buffer.full:
+                self._end_utterance()
+
+        if self.in_speech and self._since_partial >= STT_PARTIAL_INTERVAL:
+            self._schedule_partial()
+
+    def _schedule_partial(self):
+        if self._partial_task and not self._partial_task.done():
+            return
+        if stats.queued:
+            return  # pool is backed up; let finals through first
+        self._since_partial = 0.0
+        self._partial_task = asyncio.create_task(self._partial(self.buffer.get(), self.utterance))
+
+    async def _partial(self, audio, utterance):
+        try:
+            text = await transcribe(audio, beam_size=1, vad_filter=False)
+            # Drop it if the utterance was finalized while this was decoding
+            if text and utterance == self.utterance and self.in_speech:
+                await self.send({"type": "partial", "text": text})
+        except Exception as e:
+            print("STT partial error:", e)
+
+    def _end_utterance(self):
+        audio = self.buffer.get()
+        self.buffer.clear()
+        self.in_speech = False
+        self.utterance += 1
+        self._final_task = asyncio.create_task(self._final(audio, self._final_task))
+
+    async def _final(self, audio, previous):
+        # Finals go out in utterance order
+        if previous is not None:
+            await previous
+        try:
+            text = await transcribe(audio, vad_filter=True)
+            if text:
+                await self.send({"type": "final", "text": text})
+        except Exception as e:
+            print("STT final error:", e)
+
+    async def flush(self):
+        """Client says it stopped talking: finalize whatever is buffered and wait for it."""
+        if self.in_speech and len(self.buffer):
+            self._end_utterance()
+        if self._final_task is not None:
+            await self._final_task
+
+    async def close(self):
+        for task in (self._partial_task, self._final_task):
+            if task is not None and not task.done():
+                task.cancel()
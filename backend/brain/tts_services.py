@@ -0,0 +1,304 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import edge_tts
+
+# CONFIGURATION
+TTS_ENGINE = os.getenv("TTS_ENGINE", "edge")  # "edge" (online) or "local" (SpeechT5)
+TTS_VOICE = os.getenv("TTS_VOICE", "en-GB-RyanNeural")
+TTS_RATE = os.getenv("TTS_RATE", "+0%")
+TTS_MEDIA_TYPE = "audio/mpeg"
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("data", "tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(8 * 1024 * 1024)))
+
+# Sentence pipelining: how many sentences may be synthesized at once, and the
+# shortest chunk worth a separate request (shorter ones are merged with the next)
+TTS_PIPELINE_PARALLELISM = int(os.getenv("TTS_PIPELINE_PARALLELISM", "3"))
+TTS_MIN_SENTENCE_CHARS = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "20"))
+
+# Phrases pre-rendered at startup when TTS_WARMUP is on ("|"-separated to override)
+TTS_WARMUP = os.getenv("TTS_WARMUP", "false").lower() in ("1", "true", "yes")
+TTS_WARMUP_PHRASES = [p for p in os.getenv("TTS_WARMUP_PHRASES", "|".join([
+    "✅ Done on your system",
+    "I apologize, sir. My neural pathways failed to generate a response.",
+    "Hello sir, how can I help you today?",
+])).split("|") if p.strip()]
+
+
+def clean_text(text: str) -> str:
+    """Strip markdown symbols the voice would otherwise read out."""
+    return re.sub(r'[*#`_~]', '', text)
+
+
+async def stream_speech(text: str, voice: str = None, rate: str = None):
+    """Yield mp3 bytes from edge_tts as the service sends them; nothing is written to disk."""
+    communicate = edge_tts.Communicate(clean_text(text), voice or TTS_VOICE, rate=rate or TTS_RATE)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+# ---------------- CACHE ----------------
+def cache_key(text: str, voice: str = None, rate: str = None) -> str:
+    """Content address of one rendering: what is spoken, by which voice, how fast."""
+    spoken = " ".join(clean_text(text).split())
+    raw = json.dumps([spoken, voice or TTS_VOICE, rate or TTS_RATE], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two-tier LRU cache of rendered mp3s.
+    The memory tier holds the hottest clips up to `memory_bytes`; every clip is also
+    written to `directory`, whose total size is kept under `max_bytes`. File mtimes
+    record last use, so the disk LRU order survives restarts.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES,
+                 memory_bytes: int = TTS_CACHE_MEMORY_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None  # key -> size, least recently used first; scanned on first use
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _scan(self):
+        if self._disk is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".mp3"):
+                st = entry.stat()
+                files.append((st.st_mtime, entry.name[:-4], st.st_size))
+        self._disk = OrderedDict((key, size) for _, key, size in sorted(files))
+        self._disk_size = sum(self._disk.values())
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._scan()
+            return key in self._memory or key in self._disk
+
+    def get_memory(self, key: str):
+        """Audio bytes from the hot tier, or None. Never touches the disk."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+            return data
+
+    def get_path(self, key: str):
+        """Path of the cached file on disk, or None on a miss."""
+        with self._lock:
+            self._scan()
+            if key not in self._disk:
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+            self.hits["disk"] += 1
+            path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+            return None
+        return path
+
+    def put(self, key: str, data: bytes):
+        # File I/O happens outside the lock, which only guards the in-memory index,
+        # so get_memory() on the event loop never waits on a disk write
+        with self._lock:
+            self._scan()
+            if len(data) <= self.memory_bytes:
+                self._remember(key, data)
+
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        evicted = []
+        with self._lock:
+            self._disk_size += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            while self._disk_size > self.max_bytes:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key: str, data: bytes):
+        self._memory_size += len(data) - len(self._memory.pop(key, b""))
+        self._memory[key] = data
+        while self._memory_size > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits["memory"] + self.hits["disk"] + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk or ()),
+                "disk_bytes": self._disk_size,
+                "max_bytes": self.max_bytes,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            }
+
+
+cache = TTSCache()
+
+
+async def render(text: str, voice: str = None, rate: str = None) -> bytes:
+    return b"".join([chunk async for chunk in stream_speech(text, voice, rate)])
+
+
+async def warmup(phrases=None):
+    """Pre-render common phrases into the cache so their first request is a hit."""
+    for phrase in phrases or TTS_WARMUP_PHRASES:
+        key = cache_key(phrase)
+        if await asyncio.to_thread(cache.__contains__, key):
+            continue
+        try:
+            await asyncio.to_thread(cache.put, key, await render(phrase))
+        except Exception as e:
+            print(f"⚠️ TTS warmup failed for {phrase!r}: {e}")
+    print(f"🔊 TTS cache warmed: {cache.stats()['disk_entries']} clips on disk")
+
+
+# ---------------- SENTENCE PIPELINE ----------------
+# End of sentence: terminal punctuation (plus closing quotes/brackets) before whitespace, or a line break
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+|\n+")
+
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter for streamed text. feed() returns the sentences
+    completed by the new text; a trailing fragment is held until more text or flush().
+    """
+
+    def __init__(self, min_chars: int = None):
+        self.min_chars = TTS_MIN_SENTENCE_CHARS if min_chars is None else min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> list:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+def split_sentences(text: str) -> list:
+    splitter = SentenceSplitter()
+    return splitter.feed(text) + splitter.flush()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def render_cached(text: str, voice: str = None, rate: str = None) -> bytes:
+    """One complete clip, from the cache when possible."""
+    key = cache_key(text, voice, rate)
+    data = cache.get_memory(key)
+    if data is not None:
+        return data
+    path = await asyncio.to_thread(cache.get_path, key)
+    if path:
+        try:
+            return await asyncio.to_thread(_read_file, path)
+        except FileNotFoundError:
+            pass
+    data = await render(text, voice, rate)
+    await asyncio.to_thread(cache.put, key, data)
+    return data
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def speak_sentences(sentences, voice: str = None, rate: str = None, parallelism: int = None):
+    """
+    Yield one mp3 clip per sentence, in order, while later sentences are still being
+    synthesized. `sentences` may be a list or an async iterator (e.g. fed from a
+    streaming LLM reply). At most `parallelism` renders run at once and at most that
+    many finished clips wait to be sent. A sentence that fails to render is skipped.
+    """
+    parallelism = parallelism or TTS_PIPELINE_PARALLELISM
+    limit = asyncio.Semaphore(parallelism)
+    ordered = asyncio.Queue(maxsize=parallelism)
+
+    async def render_one(text):
+        async with limit:
+            return await render_cached(text, voice, rate)
+
+    async def produce():
+        # No finally here: once cancelled, the consumer is gone and nobody needs the sentinel
+        try:
+            async for sentence in _aiter(sentences):
+                await ordered.put(asyncio.create_task(render_one(sentence)))
+        except Exception:
+            await ordered.put(None)
+            raise
+        await ordered.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (task := await ordered.get()) is not None:
+            try:
+                yield await task
+            except Exception as e:
+                print(f"⚠️ TTS sentence failed: {e}")
+        await producer
+    finally:
+        producer.cancel()
+        while not ordered.empty():
+            task = ordered.get_nowait()
+            if task is not None:
+                task.cancel()
@@ -0,0 +1,149 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# CONFIGURATION
+VOICES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "voices")
+VOICE_PROFILES_DIR = os.getenv("VOICE_PROFILES_DIR", os.path.join(VOICES_DIR, "profiles"))
+DEFAULT_VOICE_PROFILE = os.getenv("DEFAULT_VOICE_PROFILE", "jarvis")
+EMBEDDING_DIM = 512  # SpeechT5 speaker embeddings are 512-d x-vectors
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's contents, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class VoiceProfileStore:
+    """
+    Named speaker embeddings on disk.
+    Each vector is stored once as <sha256 of the reference audio>.npy, so re-adding
+    the same wav (under any name) never runs the encoder again. index.json maps
+    profile names to digests. Vectors are memory-mapped on load.
+    """
+
+    def __init__(self, directory: str = VOICE_PROFILES_DIR):
+        self.directory = directory
+        self._index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_index(self, index: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self._index_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, self._index_path)
+
+    def _vector_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.npy")
+
+    def names(self) -> list:
+        return sorted(self._read_index())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._read_index()
+
+    def get(self, name: str) -> np.ndarray:
+        """Read-only, memory-mapped (EMBEDDING_DIM,) float32 vector for a profile."""
+        entry = self._read_index().get(name)
+        if entry is None:
+            raise ValueError(f"Unknown voice profile: {name}")
+
+        digest = entry["digest"]
+        with self._lock:
+            vector = self._loaded.get(digest)
+            if vector is None:
+                vector = self._loaded[digest] = np.load(self._vector_path(digest), mmap_mode="r")
+            return vector
+
+    def _save(self, name: str, digest: str, vector, source: str):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)[:EMBEDDING_DIM]
+        if vector.shape != (EMBEDDING_DIM,):
+            raise ValueError(f"Speaker embedding must have {EMBEDDING_DIM} values, got {vector.shape[0]}")
+
+        with self._lock:
+            path = self._vector_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                tmp = f"{path}.tmp.npy"
+                np.save(tmp, vector)
+                os.replace(tmp, path)
+            index = self._read_index()
+            index[name] = {"digest": digest, "source": os.path.basename(source)}
+            self._write_index(index)
+        return digest
+
+    def add_wav(self, name: str, wav_path: str, encode) -> str:
+        """
+        Register a reference recording. `encode(wav_path)` -> vector is only
+        called when no stored embedding matches the file's contents.
+        """
+        digest = file_digest(wav_path)
+        if os.path.exists(self._vector_path(digest)):
+            vector = np.load(self._vector_path(digest))
+        else:
+            print(f"⏳ Computing speaker embedding for {wav_path}...")
+            vector = encode(wav_path)
+        return self._save(name, digest, vector, wav_path)
+
+    def add_vector(self, name: str, vector, source: str = "array") -> str:
+        """Register a precomputed embedding (e.g. exported from another machine)."""
+        vector = np.asarray(vector, dtype=np.float32)
+        digest = hashlib.sha256(vector.tobytes()).hexdigest()
+        return self._save(name, digest, vector, source)
+
+
+store = VoiceProfileStore()
+
+
+# ---------------- CLI ----------------
+def main():
+    """
+    Build profiles ahead of deployment so the voice encoder never loads in production:
+        python -m brain.voice_profiles add jarvis voices/jarvis_voice.wav
+        python -m brain.voice_profiles add narrator narrator.npy
+        python -m brain.voice_profiles list
+    """
+    parser = argparse.ArgumentParser(description="Manage SpeechT5 voice profiles.")
+    parser.add_argument("--dir", default=VOICE_PROFILES_DIR, help="profile directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="add a profile from a .wav recording or a saved .npy/.txt vector")
+    add.add_argument("name")
+    add.add_argument("path")
+    sub.add_parser("list", help="list profiles")
+    args = parser.parse_args()
+
+    profiles = VoiceProfileStore(args.dir)
+    if args.command == "list":
+        for name in profiles.names():
+            print(name)
+        return
+
+    if args.path.endswith(".npy"):
+        digest = profiles.add_vector(args.name, np.load(args.path), args.path)
+    elif args.path.endswith(".txt"):
+        digest = profiles.add_vector(args.name, np.loadtxt(args.path), args.path)
+    else:
+        from . import speech_services
+        digest = profiles.add_wav(args.name, args.path, speech_services.engine.encode_speaker)
+    print(f"✅ Saved voice profile '{args.name}' ({digest[:12]})")
+
+
+if __name__ == "__main__":
+    main()
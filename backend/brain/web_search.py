@@ -1,43 +1,262 @@
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+import httpx
 from dotenv import load_dotenv
-from langchain_community.utilities import GoogleSerperAPIWrapper
 from langchain_core.tools import Tool
 
+from .remote_calls import LatencyStats, LoopAsyncClient
+
 # Load environment variables explicitly
 load_dotenv()
 
-def get_search_tool():
+# ---------------- CONFIG ----------------
+SERPER_API_URL = os.getenv("SERPER_API_URL", "https://google.serper.dev/search")
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "8"))
+SEARCH_CONNECT_TIMEOUT = float(os.getenv("SEARCH_CONNECT_TIMEOUT", "3"))
+SEARCH_MAX_CONNECTIONS = int(os.getenv("SEARCH_MAX_CONNECTIONS", "10"))
+SEARCH_KEEPALIVE_EXPIRY = float(os.getenv("SEARCH_KEEPALIVE_EXPIRY", "120"))
+# k=5 means it returns the top 5 results
+SEARCH_RESULTS_K = 5
+
+DISABLED_MESSAGE = "System Error: Web Search is disabled because the SERPER_API_KEY is missing."
+
+
+# ---------------- METRICS ----------------
+class SearchStats(LatencyStats):
+    """Per-query latency and error counters, exposed through /status."""
+
+
+stats = SearchStats()
+
+
+# ---------------- CLIENT ----------------
+class SerperClient:
+    """
+    Long-lived Serper client. HTTP connections are pooled and kept alive
+    across queries, so only the first search pays for the TLS handshake.
+    """
+
+    def __init__(self, api_key: str, url: str = None, k: int = SEARCH_RESULTS_K):
+        self.url = url or SERPER_API_URL
+        self.k = k
+        self._headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
+        self._timeout = httpx.Timeout(SEARCH_TIMEOUT, connect=SEARCH_CONNECT_TIMEOUT)
+        self._limits = httpx.Limits(
+            max_connections=SEARCH_MAX_CONNECTIONS,
+            max_keepalive_connections=SEARCH_MAX_CONNECTIONS,
+            keepalive_expiry=SEARCH_KEEPALIVE_EXPIRY,
+        )
+        self._client = httpx.Client(headers=self._headers, timeout=self._timeout, limits=self._limits)
+        self._aclient = LoopAsyncClient(headers=self._headers, timeout=self._timeout, limits=self._limits)
+
+    def _payload(self, query: str) -> dict:
+        return {"q": query, "gl": "us", "hl": "en", "num": self.k}
+
+    def run(self, query: str) -> str:
+        start = time.perf_counter()
+        try:
+            response = self._client.post(self.url, json=self._payload(query))
+            response.raise_for_status()
+            result = self._format(response.json())
+        except Exception as e:
+            stats.record((time.perf_counter() - start) * 1000, e)
+            raise
+        stats.record((time.perf_counter() - start) * 1000)
+        return result
+
+    async def arun(self, query: str) -> str:
+        start = time.perf_counter()
+        try:
+            response = await self._aclient.get().post(self.url, json=self._payload(query))
+            response.raise_for_status()
+            result = self._format(response.json())
+        except Exception as e:
+            stats.record((time.perf_counter() - start) * 1000, e)
+            raise
+        stats.record((time.perf_counter() - start) * 1000)
+        return result
+
+    def _format(self, data: dict) -> str:
+        """Flatten a Serper response into snippets, like GoogleSerperAPIWrapper.run."""
+        snippets = []
+
+        box = data.get("answerBox") or {}
+        for field in ("answer", "snippet", "snippetHighlighted"):
+            if box.get(field):
+                value = box[field]
+                return " ".join(value) if isinstance(value, list) else value
+
+        kg = data.get("knowledgeGraph") or {}
+        if kg.get("title") and kg.get("type"):
+            snippets.append(f"{kg['title']}: {kg['type']}.")
+        if kg.get("description"):
+            snippets.append(kg["description"])
+        for attribute, value in (kg.get("attributes") or {}).items():
+            snippets.append(f"{kg.get('title', '')} {attribute}: {value}.")
+
+        for result in (data.get("organic") or [])[:self.k]:
+            if result.get("snippet"):
+                snippets.append(result["snippet"])
+            for attribute, value in (result.get("attributes") or {}).items():
+                snippets.append(f"{attribute}: {value}.")
+
+        if not snippets:
+            return "No good Google Search Result was found"
+        return " ".join(snippets)
+
+    def close(self):
+        self._client.close()
+        self._aclient.reset()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_search_client():
     """
-    Returns the Google Serper search tool.
+    Shared SerperClient for the process, or None when SERPER_API_KEY is missing.
     Requires SERPER_API_KEY in the .env file.
     """
+    global _client
     api_key = os.getenv("SERPER_API_KEY")
+    if not api_key:
+        return None
+
+    with _client_lock:
+        if _client is None:
+            _client = SerperClient(api_key)
+        return _client
+
+
+def reset_search_client():
+    """Drop the shared client so the next search picks up new settings."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def get_search_tool():
+    """
+    Returns the Google Serper search tool, backed by the shared client.
+    Requires SERPER_API_KEY in the .env file.
+    """
+    client = get_search_client()
 
     # Check if the key exists before trying to initialize
-    if not api_key:
+    if client is None:
         print("⚠️ Warning: SERPER_API_KEY not found in .env file.")
         def _disabled_search(query: str):
-            return "System Error: Web Search is disabled because the SERPER_API_KEY is missing."
-        
+            return DISABLED_MESSAGE
+
         return Tool(
-            name="web_search", 
-            func=_disabled_search, 
+            name="web_search",
+            func=_disabled_search,
             description="Disabled search."
         )
 
+    return Tool(
+        name="web_search",
+        func=client.run,
+        description="Search the web for current events, news, facts, or specific information."
+    )
+
+
+def get_search_stats() -> dict:
+    return {"configured": bool(os.getenv("SERPER_API_KEY")), **stats.snapshot()}
+
+
+# ---------------- RESULT CACHE ----------------
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: case-folded, whitespace collapsed, trailing punctuation dropped."""
+    return " ".join(query.casefold().split()).strip(" ?!.")
+
+
+class SearchCache:
+    """TTL + LRU cache of search results keyed on the normalized query."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_size: int = SEARCH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = SearchCache()
+_inflight = {}
+
+
+async def search(query: str) -> str:
+    """
+    Run a web search through the cache. Concurrent identical queries
+    share a single in-flight request instead of each calling Serper.
+    """
+    client = get_search_client()
+    if client is None:
+        return DISABLED_MESSAGE
+
+    key = normalize_query(query)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # The leader was cancelled (its client went away), not us: search again
+            if pending.cancelled() and not asyncio.current_task().cancelling():
+                return await search(query)
+            raise
+
+    future = asyncio.get_running_loop().create_future()
+    # Mark a failure as retrieved even when nobody else was waiting on it
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = future
     try:
-        # Initialize Serper
-        # k=5 means it returns the top 5 results
-        search = GoogleSerperAPIWrapper(k=5)
-        
-        return Tool(
-            name="web_search",
-            func=search.run,
-            description="Search the web for current events, news, facts, or specific information."
-        )
-        
+        result = await client.arun(query)
+        _cache.put(key, result)
+        future.set_result(result)
+        return result
     except Exception as e:
-        print(f"❌ Error initializing Serper: {e}")
-        def _error_search(query: str):
-            return f"Search Error: {str(e)}"
-        return Tool(name="web_search", func=_error_search, description="Error in search.")
\ No newline at end of file
+        future.set_exception(e)
+        raise
+    finally:
+        # Cancelled before an outcome: release the followers instead of leaving them waiting
+        if not future.done():
+            future.cancel()
+        if _inflight.get(key) is future:
+            del _inflight[key]
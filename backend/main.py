@@ -6,19 +6,16 @@ import asyncio
 import pathlib
 import json
 import io
+import functools
 import uuid
-import subprocess
-import re
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from typing import Optional
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, status, WebSocket
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, status, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field
-from faster_whisper import WhisperModel
-import edge_tts
 
 # ---------------- ENV SILENCING ----------------
 os.environ["HF_HUB_VERBOSITY"] = "error"
@@ -42,21 +39,45 @@ import auth
 from brain import memory_manager as mem
 from brain import llm_services as brain
 from brain import web_search as searcher
-from langchain_core.messages import HumanMessage, AIMessage
+from brain import context_builder
+from brain import memory_services
+from brain import stt_services
+from brain import tts_services
+from brain import speech_services
+from brain import response_cache
+from brain import intent_router
 
 # ---------------- CONFIG ----------------
-FFMPEG_PATH = shutil.which("ffmpeg")
 connected_agent = None
 agent_lock = asyncio.Lock()
 
-whisper_model = None
-whisper_lock = asyncio.Lock()
+# Blocking storage calls run here so they never stall the event loop
+STORAGE_WORKERS = int(os.getenv("STORAGE_WORKERS", "8"))
+storage_executor = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix="storage")
+
+# Summary refreshes block on an LLM call, so they get their own pool instead of storage workers
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summary")
+
+# Prompt history is read from the tail of the chat, bounded by both limits
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "40"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "3000"))
+
+# Put only the long-term memories relevant to the current turn into the prompt
+MEMORY_RETRIEVAL = os.getenv("MEMORY_RETRIEVAL", "true").lower() in ("1", "true", "yes")
 
 # ---------------- LIFESPAN ----------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 JARVIS backend ready (Render-safe)")
+    warmup = asyncio.create_task(tts_services.warmup()) if tts_services.TTS_WARMUP else None
+    vision = _vision()
+    if vision.VISION_PRELOAD:
+        vision.start_background_load()
     yield
+    if warmup is not None:
+        warmup.cancel()
+    memory_services.stores.close_all()
 
 # ---------------- APP ----------------
 app = FastAPI(lifespan=lifespan)
@@ -81,12 +102,16 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     chat_id: str
+    cached: bool = False
 
 class RenameRequest(BaseModel):
     new_name: str
 
 class TTSRequest(BaseModel):
     text: str
+    voice: Optional[str] = None  # edge_tts voice, or a voice profile name for the local engine
+    rate: Optional[str] = None  # edge_tts format, e.g. "+10%"
+    engine: Optional[str] = None  # "edge" or "local"; defaults to TTS_ENGINE
 
 class SignupRequest(BaseModel):
     username: str
@@ -107,31 +132,39 @@ def extract_first_json(text: str):
             return text[start:i+1]
     return None
 
-def perform_search(query: str):
-    tool = searcher.get_search_tool()
+async def run_storage(fn, *args, **kwargs):
+    """Run a blocking memory_manager call on the bounded storage pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage_executor, functools.partial(fn, *args, **kwargs))
+
+async def perform_search(query: str):
     try:
-        result = tool.func(query)
+        result = await searcher.search(query)
         return str(result)[:2000]
     except Exception as e:
         print("Search error:", e)
         return "Search failed."
 
-async def get_whisper():
-    global whisper_model
-    async with whisper_lock:
-        if whisper_model is None:
-            whisper_model = WhisperModel(
-                "tiny.en",
-                device="cpu",
-                compute_type="int8"
-            )
-    return whisper_model
-
 # ---------------- ROOT ----------------
 @app.get("/")
 def root():
     return {"status": "Backend is running!"}
 
+@app.get("/status")
+def service_status():
+    """Model availability plus runtime metrics for search, speech and the TTS cache."""
+    return {
+        **brain.check_status(),
+        "search": searcher.get_search_stats(),
+        "stt": stt_services.get_stt_stats(),
+        "tts_cache": tts_services.cache.stats(),
+        "local_speech": speech_services.get_status(),
+        "vision": _vision().get_stats(),
+        "memory_stores": memory_services.stores.stats(),
+        "response_cache": response_cache.cache.stats(),
+        "intent_router": intent_router.stats.snapshot(),
+    }
+
 # ---------------- AUTH ----------------
 @app.post("/signup")
 def signup(user: SignupRequest):
@@ -200,87 +233,470 @@ async def agent_ws(ws: WebSocket):
             connected_agent = None
 
 
-# ---------------- CHAT ----------------
-@app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest, current_user=Depends(auth.get_current_user)):
-    user_id = current_user["username"]
-    chat_id = req.chat_id or mem.create_new_chat(user_id)["chat_id"]
+# ---------------- CHATS ----------------
+@app.get("/chats/{chat_id}/history")
+def chat_history(
+    chat_id: str,
+    before: Optional[int] = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user=Depends(auth.get_current_user)
+):
+    """One page of a chat, newest page first; pass next_before back to page older."""
+    messages = mem.get_history_page(chat_id, current_user["username"], before=before, limit=limit)
+    next_before = messages[0]["seq"] if messages and messages[0].get("seq", 0) > 0 else None
+    return {"messages": messages, "next_before": next_before}
 
-    history = mem.get_chat_history(chat_id, user_id)
-    lc_history = [
-        HumanMessage(h["content"]) if h["role"] == "human" else AIMessage(h["content"])
-        for h in history
-    ]
+# ---------------- CHAT ----------------
+async def _load_turn_context(chat_id: Optional[str], user_id: str, text: str = ""):
+    """Chat id plus history window, relevant memories and rolling summary for one turn."""
+    if not chat_id:
+        chat_id = (await run_storage(mem.create_new_chat, user_id))["chat_id"]
+
+    history, long_mem, summary = await asyncio.gather(
+        run_storage(
+            mem.get_recent_history, chat_id, user_id,
+            limit=HISTORY_MAX_MESSAGES,
+            max_tokens=HISTORY_MAX_TOKENS
+        ),
+        run_storage(mem.get_long_term_memory, user_id),
+        run_storage(mem.get_chat_summary, chat_id, user_id),
+    )
+    if MEMORY_RETRIEVAL and long_mem:
+        long_mem = await run_storage(memory_services.retrieve_relevant_memories, user_id, text, long_mem)
+    return chat_id, history, long_mem, (summary or {}).get("text", "")
+
+def _schedule_summary_refresh(chat_id: str, user_id: str, window: context_builder.HistoryWindow):
+    # Turns the prompt no longer carried word for word get folded into the summary after we reply
+    if window.start_seq is not None:
+        asyncio.get_running_loop().run_in_executor(
+            summary_executor, context_builder.refresh_summary, chat_id, user_id, window.start_seq
+        )
 
-    long_mem = mem.get_long_term_memory(user_id)
-    ai_response = brain.get_brain_response(req.text, lc_history, long_mem)
+def _parse_tool_call(ai_response: str):
+    """Strip code fences; return (text, tool-call dict or None)."""
     ai_response = ai_response.replace("```json", "").replace("```", "")
 
     tool_call = extract_first_json(ai_response)
+    if not tool_call:
+        return ai_response, None
+    try:
+        return ai_response, json.loads(tool_call)
+    except json.JSONDecodeError:
+        return ai_response, None
+
+async def _run_tool(cmd: dict, user_text: str, ai_response: str, history, long_mem, summary, window=None) -> str:
+    """Execute a tool call from the model and return the reply to show the user."""
+    if cmd.get("type") == "local_action":
+        await send_to_agent(cmd)
+        return "✅ Done on your system"
+
+    if cmd.get("type") == "web_search":
+        query = cmd.get("query") or user_text
+        results = await perform_search(query)
+        grounded = await brain.aget_brain_response(
+            user_text, history, long_mem,
+            summary=summary,
+            search_results=f"Query: {query}\n{results}",
+            window=window
+        )
+        return _parse_tool_call(grounded)[0]
+
+    return ai_response
+
+async def _cache_lookup(text: str, long_mem: list, history: list, summary: str):
+    """(system prompt, cached reply or None); the prompt is None when this turn mustn't be cached."""
+    if not response_cache.RESPONSE_CACHE:
+        return None, None
+    # Follow-ups ("what is the population?") depend on the chat so far
+    if not response_cache.is_cacheable(text, long_mem, history, summary):
+        response_cache.cache.skip()
+        return None, None
+    prompt = brain.system_prompt()
+    if not prompt:
+        return None, None
+    return prompt, await run_storage(response_cache.cache.get, prompt, text)
+
+async def _cache_store(prompt: Optional[str], text: str, response: str):
+    if prompt and response not in (brain.UNAVAILABLE_REPLY, brain.FAILED_REPLY):
+        await run_storage(response_cache.cache.put, prompt, text, response)
+
+async def _save_turn(chat_id: str, user_id: str, user_text: str, response: str):
+    await run_storage(mem.append_to_chat, chat_id, "human", user_text, user_id)
+    await run_storage(mem.append_to_chat, chat_id, "ai", response, user_id)
+
+async def _routed_turn(cmd: dict, text: str, chat_id: Optional[str], user_id: str):
+    """Run a command matched by the intent router; it needs no history, memories or summary."""
+    if not chat_id:
+        chat_id = (await run_storage(mem.create_new_chat, user_id))["chat_id"]
+    response = await _run_tool(cmd, text, "", [], [], "")
+    await _save_turn(chat_id, user_id, text, response)
+    return chat_id, response
 
-    if tool_call:
-        cmd = json.loads(tool_call)
+@app.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest, current_user=Depends(auth.get_current_user)):
+    user_id = current_user["username"]
+    # Obvious device commands skip context loading, the response cache and the LLM entirely
+    routed = intent_router.match(req.text)
+    if routed:
+        chat_id, response = await _routed_turn(routed, req.text, req.chat_id, user_id)
+        return ChatResponse(response=response, chat_id=chat_id)
+
+    chat_id, history, long_mem, summary = await _load_turn_context(req.chat_id, user_id, req.text)
+    prompt, cached = await _cache_lookup(req.text, long_mem, history, summary)
+    window = context_builder.HistoryWindow()
+
+    if cached is not None:
+        response = cached
+    else:
+        ai_response = await brain.aget_brain_response(req.text, history, long_mem, summary=summary, window=window)
+        response, cmd = _parse_tool_call(ai_response)
+        if cmd:
+            response = await _run_tool(cmd, req.text, response, history, long_mem, summary, window)
+        else:
+            await _cache_store(prompt, req.text, response)
+
+    await _save_turn(chat_id, user_id, req.text, response)
+    _schedule_summary_refresh(chat_id, user_id, window)
+
+    return ChatResponse(response=response, chat_id=chat_id, cached=cached is not None)
+
+# ---------------- CHAT STREAMING ----------------
+def _is_tool_call_start(text: str):
+    """True/False once the reply's opening reveals whether it is tool JSON, None while unsure."""
+    head = text.lstrip()
+    if not head:
+        return None
+    if head.startswith("{") or head.startswith("```"):
+        return True
+    if "```".startswith(head):
+        return None
+    return False
+
+async def _stream_turn(text: str, chat_id: Optional[str], user_id: str):
+    """
+    Yield events for one streamed turn: start, token..., done.
+    Replies that open with tool-call JSON are buffered instead of shown to the user;
+    a web search is run and the grounded answer is streamed in its place.
+    """
+    routed = intent_router.match(text)
+    if routed:
+        chat_id, response = await _routed_turn(routed, text, chat_id, user_id)
+        yield {"type": "start", "chat_id": chat_id}
+        yield {"type": "done", "chat_id": chat_id, "response": response}
+        return
+
+    chat_id, history, long_mem, summary = await _load_turn_context(chat_id, user_id, text)
+    yield {"type": "start", "chat_id": chat_id}
+
+    # Cache hits never have history, so there is nothing to summarize for them
+    prompt, cached = await _cache_lookup(text, long_mem, history, summary)
+    if cached is not None:
+        yield {"type": "token", "text": cached}
+        await _save_turn(chat_id, user_id, text, cached)
+        yield {"type": "done", "chat_id": chat_id, "response": cached, "cached": True}
+        return
+
+    parts = []
+    is_tool_call = None
+    window = context_builder.HistoryWindow()
+    async for delta in brain.stream_brain_response(text, history, long_mem, summary=summary, window=window):
+        parts.append(delta)
+        if is_tool_call is None:
+            is_tool_call = _is_tool_call_start("".join(parts))
+            if is_tool_call is False:
+                yield {"type": "token", "text": "".join(parts)}
+        elif not is_tool_call:
+            yield {"type": "token", "text": delta}
+
+    response, cmd = _parse_tool_call("".join(parts))
+    if cmd and is_tool_call and cmd.get("type") == "web_search":
+        query = cmd.get("query") or text
+        yield {"type": "search", "query": query}
+        results = await perform_search(query)
+
+        parts = []
+        async for delta in brain.stream_brain_response(
+            text, history, long_mem,
+            summary=summary,
+            search_results=f"Query: {query}\n{results}",
+            window=window
+        ):
+            parts.append(delta)
+            yield {"type": "token", "text": delta}
+        response = _parse_tool_call("".join(parts))[0]
+    elif cmd:
+        response = await _run_tool(cmd, text, response, history, long_mem, summary, window)
+    else:
+        await _cache_store(prompt, text, response)
+
+    await _save_turn(chat_id, user_id, text, response)
+    _schedule_summary_refresh(chat_id, user_id, window)
+    yield {"type": "done", "chat_id": chat_id, "response": response}
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, current_user=Depends(auth.get_current_user)):
+    """Server-Sent Events version of /chat."""
+    async def events():
+        try:
+            async for event in _stream_turn(req.text, req.chat_id, current_user["username"]):
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            print("Chat stream error:", e)
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        if cmd.get("type") == "local_action":
-            await send_to_agent(cmd)
-    
-            mem.append_to_chat(chat_id, "human", req.text, user_id)
-            mem.append_to_chat(chat_id, "ai", "✅ Done on your system", user_id)
-    
-            return ChatResponse(
-                response="✅ Done on your system",
-                chat_id=chat_id
-            )
+@app.websocket("/ws/chat")
+async def chat_ws(ws: WebSocket, token: str = Query(...)):
+    """WebSocket version of /chat: send {"text", "chatId"}, receive the same events as /chat/stream."""
+    try:
+        current_user = await auth.get_current_user(token)
+    except HTTPException:
+        await ws.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
+    await ws.accept()
+    try:
+        while True:
+            msg = await ws.receive_json()
+            try:
+                async for event in _stream_turn(msg.get("text", ""), msg.get("chatId"), current_user["username"]):
+                    await ws.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print("Chat socket error:", e)
+                await ws.send_json({"type": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        pass
 
-    
-    mem.append_to_chat(chat_id, "human", req.text, user_id)
-    mem.append_to_chat(chat_id, "ai", ai_response, user_id)
+# ---------------- STT ----------------
+async def _decode_upload(file: UploadFile):
+    if not stt_services.FFMPEG_PATH:
+        raise HTTPException(503, "STT unavailable")
 
-    return ChatResponse(response=ai_response, chat_id=chat_id)
+    try:
+        return await stt_services.decode_audio(await file.read())
+    except stt_services.AudioDecodeError as e:
+        raise HTTPException(400, f"Could not decode audio: {e}")
 
-# ---------------- STT ----------------
 @app.post("/stt")
 async def stt(file: UploadFile = File(...)):
-    if not FFMPEG_PATH:
-        raise HTTPException(503, "STT unavailable")
+    audio = await _decode_upload(file)
+    return {"text": await stt_services.transcribe(audio)}
+
+@app.post("/stt/stream")
+async def stt_stream(file: UploadFile = File(...)):
+    """Server-Sent Events: one "segment" event per decoded segment, then "done" with the full text."""
+    audio = await _decode_upload(file)
+
+    async def events():
+        texts = []
+        try:
+            async for seg in stt_services.transcribe_stream(audio):
+                texts.append(seg["text"])
+                yield f"data: {json.dumps({'type': 'segment', **seg})}\n\n"
+            yield f"data: {json.dumps({'type': 'done', 'text': ' '.join(texts).strip()})}\n\n"
+        except Exception as e:
+            print("STT stream error:", e)
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    uid = uuid.uuid4().hex
-    webm = f"{uid}.webm"
-    wav = f"{uid}.wav"
+@app.websocket("/ws/stt")
+async def stt_ws(ws: WebSocket, format: str = Query("webm")):
+    """
+    Live transcription. Send audio as binary frames: raw 16 kHz mono pcm16 with
+    ?format=pcm16, or MediaRecorder chunks (any container ffmpeg reads) by default.
+    Send {"type": "end"} when the user stops talking to get the last final, then "done".
+    Receive {"type": "partial"|"final", "text"} while audio is streaming.
+    """
+    await ws.accept()
+    session = stt_services.StreamingSession(ws.send_json)
+    decoder = None
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+
+            if msg.get("bytes") is not None:
+                if format == "pcm16":
+                    await session.push(stt_services.pcm16_to_float(msg["bytes"]))
+                    continue
+                if decoder is None:
+                    decoder = stt_services.StreamDecoder(session.push)
+                    await decoder.start()
+                await decoder.feed(msg["bytes"])
+                continue
+
+            try:
+                control = json.loads(msg.get("text") or "{}")
+            except ValueError:
+                control = None
+            if not isinstance(control, dict):
+                await ws.send_json({"type": "error", "detail": "Control frames must be JSON objects"})
+                continue
+            if control.get("type") == "end":
+                if decoder is not None:
+                    await decoder.close()
+                    decoder = None
+                await session.flush()
+                await ws.send_json({"type": "done"})
+    except stt_services.AudioDecodeError as e:
+        await ws.send_json({"type": "error", "detail": str(e)})
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if decoder is not None:
+            await decoder.close()
+        await session.close()
+
+# ---------------- IMAGE QA ----------------
+IMAGE_QA_UNAVAILABLE = "I'm unable to analyze this image right now, sir. The vision model is not available."
 
+def _vision():
+    # Resolve the same module object whether the app runs as `backend.main` or `main`
     try:
-        with open(webm, "wb") as f:
-            f.write(await file.read())
-
-        subprocess.run(
-            [FFMPEG_PATH, "-y", "-i", webm, "-ar", "16000", "-ac", "1", wav],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
+        from backend.brain import local_multimodal
+    except ImportError:
+        from brain import local_multimodal
+    return local_multimodal
+
+@app.post("/image_qa", response_model=ChatResponse)
+async def image_qa(
+    file: UploadFile = File(...),
+    question: str = Form(""),
+    chat_id: Optional[str] = Form(None),
+    current_user=Depends(auth.get_optional_user)
+):
+    """
+    Answer a question about an uploaded image with the local BLIP model.
+    Signed-in users get the exchange saved to their chat; anonymous callers get a throwaway chat id.
+    """
+    vision = _vision()
+    image_bytes = await file.read()
+
+    if not vision.is_available():
+        response = IMAGE_QA_UNAVAILABLE
+    else:
+        # Blocks on the vision batcher, so keep it off the event loop
+        answer, error = await asyncio.get_running_loop().run_in_executor(
+            None, vision.analyze_image_with_local_llm, image_bytes, question or None
         )
+        if error or not answer:
+            print("Image QA error:", error)
+            response = f"I'm unable to analyze this image: {error or 'no answer was produced'}."
+        else:
+            response = answer[0].upper() + answer[1:]
 
-        model = await get_whisper()
-        result = model.transcribe(wav, language="en")
-        text = " ".join(seg["text"] for seg in result["segments"])
+    if current_user is None:
+        return ChatResponse(response=response, chat_id=chat_id or uuid.uuid4().hex)
 
-        return {"text": text.strip()}
-    finally:
-        for p in [webm, wav]:
-            if os.path.exists(p):
-                os.remove(p)
+    user_id = current_user["username"]
+    if not chat_id:
+        chat_id = (await run_storage(mem.create_new_chat, user_id))["chat_id"]
+    await _save_turn(chat_id, user_id, f"[Image: {file.filename}] {question}".strip(), response)
+    return ChatResponse(response=response, chat_id=chat_id)
 
 # ---------------- TTS ----------------
+async def _local_tts(req: TTSRequest):
+    """Offline SpeechT5 synthesis on the batching worker; returns a WAV built in memory."""
+    text = tts_services.clean_text(req.text).strip()
+    if not text:
+        raise HTTPException(400, "Nothing to say")
+    try:
+        samples = await speech_services.tts_worker.synthesize(text, req.voice)
+    except ImportError:
+        raise HTTPException(503, "Local TTS unavailable")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return Response(speech_services.to_wav_bytes(samples), media_type="audio/wav")
+
 @app.post("/tts")
 async def tts(req: TTSRequest):
-    clean = re.sub(r'[*#`_~]', '', req.text)
-    out = f"tts_{uuid.uuid4().hex}.mp3"
+    """
+    Serve from the TTS cache when this (text, voice, rate) was rendered before;
+    otherwise relay edge_tts audio chunks as they arrive and cache the result.
+    With engine="local", synthesize offline instead.
+    """
+    engine = req.engine or tts_services.TTS_ENGINE
+    if engine == "local":
+        return await _local_tts(req)
+    if engine != "edge":
+        raise HTTPException(400, f"Unknown TTS engine: {engine}")
+
+    cache = tts_services.cache
+    key = tts_services.cache_key(req.text, req.voice, req.rate)
+
+    data = cache.get_memory(key)
+    if data is not None:
+        return Response(data, media_type=tts_services.TTS_MEDIA_TYPE)
+    path = await run_storage(cache.get_path, key)
+    if path:
+        return FileResponse(path, media_type=tts_services.TTS_MEDIA_TYPE)
+
+    audio = tts_services.stream_speech(req.text, req.voice, req.rate)
+    # Pull the first chunk before answering, so a failed synthesis is a clean 502
+    # instead of a 200 with a truncated body
     try:
-        await edge_tts.Communicate(clean, "en-GB-RyanNeural").save(out)
-        return StreamingResponse(open(out, "rb"), media_type="audio/mpeg")
-    finally:
-        if os.path.exists(out):
-            os.remove(out)
+        first = await audio.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(502, "TTS produced no audio")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        print("TTS error:", e)
+        raise HTTPException(502, "TTS Generation failed")
+
+    async def body():
+        parts = [first]
+        yield first
+        async for chunk in audio:
+            parts.append(chunk)
+            yield chunk
+        # Only complete renders are cached; a dropped client never gets here
+        await run_storage(cache.put, key, b"".join(parts))
+
+    return StreamingResponse(body(), media_type=tts_services.TTS_MEDIA_TYPE)
+
+@app.post("/tts/stream")
+async def tts_stream(req: TTSRequest):
+    """
+    Long replies: split at sentence boundaries, synthesize a few sentences ahead in
+    parallel, and send them back to back as one continuous mp3 stream.
+    With engine="local", synthesize the whole text offline instead.
+    """
+    engine = req.engine or tts_services.TTS_ENGINE
+    if engine == "local":
+        return await _local_tts(req)
+    if engine != "edge":
+        raise HTTPException(400, f"Unknown TTS engine: {engine}")
+
+    sentences = tts_services.split_sentences(tts_services.clean_text(req.text))
+    if not sentences:
+        raise HTTPException(400, "Nothing to say")
+    audio = tts_services.speak_sentences(sentences, req.voice, req.rate)
+    try:
+        first = await audio.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(502, "TTS produced no audio")
+
+    async def body():
+        yield first
+        async for clip in audio:
+            yield clip
+
+    return StreamingResponse(body(), media_type=tts_services.TTS_MEDIA_TYPE)
 
 
 
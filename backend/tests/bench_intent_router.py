@@ -0,0 +1,98 @@
+"""
+End-to-end /chat latency on a corpus of device commands, with and without the intent router.
+
+    python backend/tests/bench_intent_router.py                 # simulated LLM round trip
+    python backend/tests/bench_intent_router.py --real-llm      # Groq, needs GROQ_API_KEY
+
+The local agent is replaced by a no-op, so the numbers cover the backend only. Everything else
+(history, summaries, memory retrieval) runs with the default configuration.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Make sure the backend package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from fastapi.testclient import TestClient
+from backend import main
+
+COMMANDS = [
+    "open notepad",
+    "launch calculator",
+    "open google chrome",
+    "please open vs code",
+    "start spotify",
+    "close notepad",
+    "close the chrome browser",
+    "go to github.com",
+    "open youtube.com",
+    "set volume to 40",
+    "turn the volume to 75%",
+    "Jarvis, open the task manager",
+    # Not obvious: these still go to the LLM in both runs
+    "open notepad and write a haiku",
+    "make it a bit louder",
+]
+
+
+def _simulated_llm(latency_ms: float):
+    async def respond(text, history, long_mem, **kwargs):
+        await asyncio.sleep(latency_ms / 1000)
+        return '{"type":"local_action","action":"open_app","app":"notepad"}'
+    return respond
+
+
+def _run(client, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        for text in COMMANDS:
+            start = time.perf_counter()
+            res = client.post("/chat", json={"text": text})
+            res.raise_for_status()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _summary(label: str, timings: list) -> str:
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return (f"{label:<16} n={len(timings):<4} mean={statistics.mean(timings):8.1f}ms  "
+            f"p50={statistics.median(timings):8.1f}ms  p95={p95:8.1f}ms")
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=700,
+                        help="round trip of the simulated LLM (ignored with --real-llm)")
+    parser.add_argument("--real-llm", action="store_true")
+    args = parser.parse_args()
+
+    async def no_agent(cmd):
+        pass
+
+    main.mem.USERS_DIR = tempfile.mkdtemp(prefix="jarvis-bench-")
+    main.send_to_agent = no_agent
+    if not args.real_llm:
+        main.brain.aget_brain_response = _simulated_llm(args.llm_latency_ms)
+    main.app.dependency_overrides[main.auth.get_current_user] = lambda: {"username": "bench"}
+
+    client = TestClient(main.app)
+    results = {}
+    for enabled in (False, True):
+        main.intent_router.INTENT_ROUTER = enabled
+        results[enabled] = _run(client, args.repeat)
+
+    print(_summary("LLM only", results[False]))
+    print(_summary("router + LLM", results[True]))
+    print(f"routed: {main.intent_router.stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,81 @@
+"""Local stand-in for an OpenAI-compatible chat completions API, for tests of the LLM providers."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLM:
+    """
+    Threaded HTTP server speaking POST /v1/chat/completions, streaming included.
+    `script` is a list of HTTP statuses served one per request (then 200 forever),
+    so tests can stage 429s and 5xx before a success. Records every request body.
+    """
+
+    def __init__(self, reply="Certainly, sir.", script=(), delay=0.0, retry_after=None):
+        self.reply = reply
+        self.script = list(script)
+        self.delay = delay
+        self.retry_after = retry_after
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, body: bytes, content_type="application/json", headers=()):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(body)
+                    status = fake.script.pop(0) if fake.script else 200
+                time.sleep(fake.delay)
+
+                if status != 200:
+                    headers = [("Retry-After", str(fake.retry_after))] if fake.retry_after is not None else []
+                    self._send(status, json.dumps({"error": {"message": f"status {status}"}}).encode(), headers=headers)
+                    return
+
+                if body.get("stream"):
+                    words = fake.reply.split(" ")
+                    events = [
+                        {"choices": [{"delta": {"content": w if i == 0 else f" {w}"}}]}
+                        for i, w in enumerate(words)
+                    ]
+                    payload = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+                    self._send(200, payload.encode(), content_type="text/event-stream")
+                    return
+
+                payload = {"choices": [{"message": {"role": "assistant", "content": fake.reply}}]}
+                self._send(200, json.dumps(payload).encode())
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
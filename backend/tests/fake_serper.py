@@ -0,0 +1,71 @@
+"""Local stand-in for the Serper search API, for tests that exercise web search."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSerper:
+    """
+    Threaded HTTP server speaking Serper's POST /search protocol.
+    Records every query and the client port it arrived on, so tests can
+    check both caching and connection reuse.
+    """
+
+    def __init__(self, results=None, delay=0.0, status=200):
+        self.results = results or {}
+        self.delay = delay
+        self.status = status
+        self.queries = []
+        self.client_ports = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/search"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.queries.append(body["q"])
+                    fake.client_ports.add(self.client_address[1])
+                time.sleep(fake.delay)
+
+                snippet = fake.results.get(body["q"], f"Top result for {body['q']}")
+                payload = json.dumps({"organic": [{"title": body["q"], "snippet": snippet}]}).encode()
+                self.send_response(fake.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def install(self, monkeypatch, web_search_module):
+        """Point web_search at this server with a fresh client, cache and stats."""
+        self._thread.start()
+        monkeypatch.setenv("SERPER_API_KEY", "test-key")
+        monkeypatch.setattr(web_search_module, "SERPER_API_URL", self.url)
+        web_search_module.reset_search_client()
+        web_search_module._cache.clear()
+        web_search_module.stats.reset()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from backend.brain.batching import MicroBatcher
+
+
+def test_short_result_list_fails_every_caller():
+    # Drops the last result, as a buggy process_batch might
+    batcher = MicroBatcher(lambda items: [i * 2 for i in items][:-1], max_batch=4, batch_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(3)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="results for a batch of"):
+            future.result(timeout=5)
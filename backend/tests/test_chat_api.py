@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.mem, "USERS_DIR", str(tmp_path / "users"))
+    main.app.dependency_overrides[main.auth.get_current_user] = lambda: {"username": "tester"}
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_history_endpoint_pages_backwards(client):
+    chat_id = main.mem.create_new_chat("tester")["chat_id"]
+    for i in range(5):
+        main.mem.append_to_chat(chat_id, "human", str(i), "tester")
+
+    res = client.get(f"/chats/{chat_id}/history", params={"limit": 2})
+    assert res.status_code == 200
+    page = res.json()
+    assert [m["content"] for m in page["messages"]] == ["3", "4"]
+    assert page["next_before"] == 3
+
+    page = client.get(f"/chats/{chat_id}/history", params={"limit": 3, "before": 3}).json()
+    assert [m["content"] for m in page["messages"]] == ["0", "1", "2"]
+    assert page["next_before"] is None
+
+
+def test_chat_sends_only_recent_history(client, monkeypatch):
+    chat_id = main.mem.create_new_chat("tester")["chat_id"]
+    for i in range(10):
+        main.mem.append_to_chat(chat_id, "human", f"old {i}", "tester")
+
+    seen = {}
+
+    async def fake_response(text, history, long_mem, **kwargs):
+        seen["history"] = [m["content"] for m in history]
+        return "ok"
+
+    monkeypatch.setattr(main, "HISTORY_MAX_MESSAGES", 4)
+    monkeypatch.setattr(main.brain, "aget_brain_response", fake_response)
+
+    res = client.post("/chat", json={"text": "hi", "chatId": chat_id})
+    assert res.status_code == 200
+    assert seen["history"] == ["old 6", "old 7", "old 8", "old 9"]
+
+
+def _fake_stream(*chunks):
+    async def stream(text, history, long_mem, summary="", window=None):
+        for chunk in chunks:
+            yield chunk
+    return stream
+
+
+def _sse_events(res):
+    return [json.loads(line[len("data: "):]) for line in res.text.splitlines() if line.startswith("data: ")]
+
+
+def test_chat_stream_relays_tokens_and_persists(client, monkeypatch):
+    monkeypatch.setattr(main.brain, "stream_brain_response", _fake_stream("Hello", ", sir", "."))
+
+    res = client.post("/chat/stream", json={"text": "hi"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+
+    events = _sse_events(res)
+    assert events[0]["type"] == "start"
+    assert [e["text"] for e in events if e["type"] == "token"] == ["Hello", ", sir", "."]
+    assert events[-1] == {"type": "done", "chat_id": events[0]["chat_id"], "response": "Hello, sir."}
+
+    history = main.mem.get_chat_history(events[0]["chat_id"], "tester")
+    assert [(m["role"], m["content"]) for m in history] == [("human", "hi"), ("ai", "Hello, sir.")]
+
+
+def test_chat_stream_buffers_tool_call_json(client, monkeypatch):
+    sent = []
+
+    async def fake_send(payload):
+        sent.append(payload)
+
+    monkeypatch.setattr(main, "send_to_agent", fake_send)
+    monkeypatch.setattr(main.brain, "stream_brain_response", _fake_stream(
+        " ", "`", '``json\n{"type":"local_action",', '"action":"open_app","app":"notepad"}', "\n```"
+    ))
+
+    events = _sse_events(client.post("/chat/stream", json={"text": "open notepad"}))
+    assert [e for e in events if e["type"] == "token"] == []
+    assert events[-1]["response"] == "✅ Done on your system"
+    assert sent == [{"type": "local_action", "action": "open_app", "app": "notepad"}]
+
+
+def test_chat_websocket_streams_events(client, monkeypatch):
+    monkeypatch.setattr(main.auth, "get_user", lambda username: {"username": username})
+    monkeypatch.setattr(main.brain, "stream_brain_response", _fake_stream("Good ", "evening."))
+    token = main.auth.create_access_token({"sub": "tester"})
+
+    with client.websocket_connect(f"/ws/chat?token={token}") as ws:
+        ws.send_json({"text": "hello"})
+        events = []
+        while not events or events[-1]["type"] != "done":
+            events.append(ws.receive_json())
+
+    assert [e["type"] for e in events] == ["start", "token", "token", "done"]
+    assert events[-1]["response"] == "Good evening."
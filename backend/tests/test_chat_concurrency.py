@@ -0,0 +1,96 @@
+"""
+Load test: concurrent /chat requests must overlap instead of queueing
+behind each other on the event loop.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+import pytest
+from backend import main
+
+LLM_DELAY = 0.3
+STORAGE_DELAY = 0.2
+CONCURRENCY = 6
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.mem, "USERS_DIR", str(tmp_path / "users"))
+    main.app.dependency_overrides[main.auth.get_current_user] = lambda: {"username": "loadtest"}
+    yield main.app
+    main.app.dependency_overrides.clear()
+
+
+async def _fire(app, n):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/chat", json={"text": f"question {i}"}) for i in range(n)
+        ], client.get("/agent-status"))
+        return time.perf_counter() - start, responses
+
+
+def test_concurrent_chats_overlap_on_slow_llm(app, monkeypatch):
+    async def slow_llm(text, history, long_mem, summary="", window=None):
+        await asyncio.sleep(LLM_DELAY)
+        return f"answer to {text}"
+
+    monkeypatch.setattr(main.brain, "aget_brain_response", slow_llm)
+
+    elapsed, responses = asyncio.run(_fire(app, CONCURRENCY))
+
+    assert all(r.status_code == 200 for r in responses)
+    # Serialized this would take CONCURRENCY * LLM_DELAY = 1.8s
+    assert elapsed < LLM_DELAY * 3, f"chats ran serially: {elapsed:.2f}s"
+
+
+def test_blocking_storage_does_not_stall_the_loop(app, monkeypatch):
+    async def fast_llm(text, history, long_mem, summary="", window=None):
+        return "ok"
+
+    real_get_memory = main.mem.get_long_term_memory
+
+    def slow_memory(user_id):
+        time.sleep(STORAGE_DELAY)  # blocking file I/O stand-in
+        return real_get_memory(user_id)
+
+    monkeypatch.setattr(main.brain, "aget_brain_response", fast_llm)
+    monkeypatch.setattr(main.mem, "get_long_term_memory", slow_memory)
+
+    elapsed, responses = asyncio.run(_fire(app, CONCURRENCY))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert elapsed < STORAGE_DELAY * 3, f"storage calls blocked the event loop: {elapsed:.2f}s"
+
+
+def test_slow_summary_refreshes_do_not_starve_storage(app, monkeypatch):
+    async def fast_llm(text, history, long_mem, summary="", window=None):
+        return "ok"
+
+    release = threading.Event()
+    monkeypatch.setattr(main.brain, "aget_brain_response", fast_llm)
+    monkeypatch.setattr(main.context_builder, "refresh_summary", lambda *args: release.wait(5))
+
+    async def run():
+        # More stuck summaries than there are storage workers
+        window = main.context_builder.HistoryWindow()
+        window.record(0)
+        for i in range(main.STORAGE_WORKERS + 2):
+            main._schedule_summary_refresh(f"chat{i}", "loadtest", window)
+        return await _fire(app, CONCURRENCY)
+
+    try:
+        elapsed, responses = asyncio.run(run())
+    finally:
+        release.set()
+
+    assert all(r.status_code == 200 for r in responses)
+    assert elapsed < 2, f"summary refreshes held the storage pool: {elapsed:.2f}s"
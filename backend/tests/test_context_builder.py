@@ -0,0 +1,71 @@
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+from backend.brain import context_builder as cb
+from backend.brain import llm_services
+from backend.brain import memory_manager as mem
+
+
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(mem, "USERS_DIR", str(tmp_path / "users"))
+
+
+def test_build_messages_keeps_newest_turns_within_budget(monkeypatch):
+    monkeypatch.setattr(cb, "RESPONSE_TOKEN_RESERVE", 0)
+    history = [{"role": "human" if i % 2 == 0 else "ai", "content": "x" * 40} for i in range(10)]
+
+    # system (2) + summary (~12) + user (2) leaves room for 3 history messages at 11 tokens each
+    messages = cb.build_messages("sys", "hi", history=history, summary="user likes tea", budget=50)
+
+    assert isinstance(messages[0], SystemMessage)
+    assert "user likes tea" in messages[1].content
+    assert isinstance(messages[-1], HumanMessage) and messages[-1].content == "hi"
+    assert len(messages) == 2 + 3 + 1
+
+
+def test_build_messages_reports_where_the_kept_history_starts(monkeypatch):
+    monkeypatch.setattr(cb, "RESPONSE_TOKEN_RESERVE", 0)
+    history = [{"seq": 20 + i, "role": "human", "content": "x" * 40} for i in range(10)]
+
+    window = cb.HistoryWindow()
+    cb.build_messages("sys", "hi", history=history, summary="user likes tea", budget=50, window=window)
+    assert window.start_seq == 27
+
+    # A long pasted message squeezes out the rest; the narrower window wins
+    cb.build_messages("sys", "y" * 200, history=history, budget=60, window=window)
+    assert window.start_seq == 30
+
+
+def test_summary_refreshes_only_after_enough_turns(monkeypatch):
+    monkeypatch.setattr(cb, "SUMMARY_REFRESH_TURNS", 4)
+    calls = []
+
+    def fake_summarize(previous, messages):
+        calls.append([m["seq"] for m in messages])
+        return f"{previous}+{len(messages)}"
+
+    monkeypatch.setattr(llm_services, "summarize_conversation", fake_summarize)
+
+    chat_id = mem.create_new_chat("erin")["chat_id"]
+    for i in range(12):
+        mem.append_to_chat(chat_id, "human", str(i), "erin")
+
+    # Verbatim window starts at seq 3: only 3 messages are outside it
+    assert not cb.refresh_summary(chat_id, "erin", 3)
+    assert calls == []
+
+    assert cb.refresh_summary(chat_id, "erin", 5)
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert mem.get_chat_summary(chat_id, "erin")["upto_seq"] == 4
+
+    # Incremental: only messages after the cached summary are sent
+    assert not cb.refresh_summary(chat_id, "erin", 8)
+    assert cb.refresh_summary(chat_id, "erin", 9)
+    assert calls[-1] == [5, 6, 7, 8]
+    assert mem.get_chat_summary(chat_id, "erin")["text"] == "+5+4"
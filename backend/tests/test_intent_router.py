@@ -0,0 +1,86 @@
+import ast
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.brain import intent_router
+
+OS_CONTROLLER = os.path.join(os.path.dirname(__file__), "..", "..", "local_agent", "os_controller.py")
+
+
+@pytest.mark.parametrize("text, cmd", [
+    ("open notepad", {"action": "open_app", "app": "notepad"}),
+    ("Jarvis, please launch Google Chrome.", {"action": "open_app", "app": "chrome"}),
+    ("can you open vs code", {"action": "open_app", "app": "vscode"}),
+    ("start the task manager", {"action": "open_app", "app": "task_manager"}),
+    ("close word", {"action": "close_app", "app": "winword"}),
+    ("close the chrome browser", {"action": "close_website", "browser": "chrome"}),
+    ("go to github.com", {"action": "open_website", "url": "https://github.com"}),
+    ("open https://news.ycombinator.com/news", {"action": "open_website", "url": "https://news.ycombinator.com/news"}),
+    ("set volume to 40", {"action": "set_volume", "level": 40}),
+    ("Turn the volume to 75% please", {"action": "set_volume", "level": 75}),
+])
+def test_obvious_commands_are_routed(text, cmd):
+    assert intent_router.route(text) == {"type": "local_action", **cmd}
+
+
+@pytest.mark.parametrize("text", [
+    "open notepad and write a poem about the sea",
+    "open youtube",
+    "open report.pdf",
+    "open config.py",
+    "open notepad.exe",
+    "go to notes.txt",
+    "open my resume",
+    "set volume to 140",
+    "turn the volume up a bit",
+    "close settings",
+    "close docker desktop",
+    "quit docker",
+    "delete C:\\Users\\me\\file.txt",
+    "what is the capital of France?",
+    "how do I open notepad",
+])
+def test_ambiguous_input_goes_to_the_llm(text):
+    assert intent_router.route(text) is None
+
+
+def test_app_table_matches_the_local_agent():
+    tree = ast.parse(open(OS_CONTROLLER, encoding="utf-8").read())
+    func = next(n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == "open_application")
+    apps = next(n.value for n in ast.walk(func) if isinstance(n, ast.Assign) and n.targets[0].id == "apps")
+    assert ast.literal_eval(apps) == intent_router.APPS
+
+
+def test_routed_chat_skips_the_llm(tmp_path, monkeypatch):
+    sent = []
+
+    async def fake_send(cmd):
+        sent.append(cmd)
+
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called for a routed command")
+
+    def no_retrieval(*args, **kwargs):
+        raise AssertionError("memories retrieved for a routed command")
+
+    monkeypatch.setattr(main.mem, "USERS_DIR", str(tmp_path / "users"))
+    monkeypatch.setattr(main, "send_to_agent", fake_send)
+    monkeypatch.setattr(main.brain, "aget_brain_response", no_llm)
+    monkeypatch.setattr(main.memory_services, "retrieve_relevant_memories", no_retrieval)
+    monkeypatch.setattr(main, "MEMORY_RETRIEVAL", True)
+    main.mem.add_long_term_memory("User prefers the volume low", "tester")
+    main.app.dependency_overrides[main.auth.get_current_user] = lambda: {"username": "tester"}
+    try:
+        res = TestClient(main.app).post("/chat", json={"text": "set volume to 30"})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert res.status_code == 200
+    assert res.json()["response"] == "✅ Done on your system"
+    assert sent == [{"type": "local_action", "action": "set_volume", "level": 30}]
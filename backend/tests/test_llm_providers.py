@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+import time
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+from backend.brain import llm_providers, llm_services
+from fake_llm import FakeLLM
+
+MESSAGES = [SystemMessage(content="You are J.A.R.V.I.S"), HumanMessage(content="Hello")]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(llm_providers, "LLM_BACKOFF_BASE", 0.01)
+    servers = []
+
+    def start(**kwargs):
+        server = FakeLLM(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def _provider(server, name="local", timeout=2):
+    return llm_providers.OpenAICompatibleProvider(name, server.base_url, "stub-model", timeout=timeout)
+
+
+def test_retries_rate_limits_and_server_errors(fake_llm):
+    server = fake_llm(script=[429, 503])
+    chain = llm_providers.ProviderChain([_provider(server)], max_retries=2)
+
+    assert chain.invoke(MESSAGES) == "Certainly, sir."
+    assert len(server.requests) == 3
+    assert server.requests[0]["messages"][0] == {"role": "system", "content": "You are J.A.R.V.I.S"}
+
+    stats = chain.stats()["providers"][0]
+    assert stats["retries"] == 2
+    assert stats["errors"] == {"429": 1, "5xx": 1}
+    assert sum(stats["latency_histogram"].values()) == 3
+
+
+def test_fails_over_and_opens_the_circuit(fake_llm, monkeypatch):
+    monkeypatch.setattr(llm_providers, "LLM_BREAKER_FAILURES", 2)
+    broken = fake_llm(script=[500] * 20)
+    backup = fake_llm(reply="Backup here, sir.")
+    chain = llm_providers.ProviderChain([_provider(broken, "primary"), _provider(backup, "backup")], max_retries=1)
+
+    for _ in range(3):
+        assert asyncio.run(chain.ainvoke(MESSAGES)) == "Backup here, sir."
+
+    # Two calls with one retry each, then the breaker skips the primary
+    assert len(broken.requests) == 4
+    assert chain.stats()["providers"][0]["circuit"] == "open"
+    assert chain.stats()["failovers"] == 2
+
+
+def test_client_errors_are_not_retried(fake_llm):
+    server = fake_llm(script=[401])
+    chain = llm_providers.ProviderChain([_provider(server)], max_retries=3)
+
+    with pytest.raises(llm_providers.ProviderError) as exc:
+        chain.invoke(MESSAGES)
+    assert exc.value.status == 401
+    assert len(server.requests) == 1
+
+
+def test_slow_calls_hit_the_deadline(fake_llm):
+    slow = fake_llm(delay=1.0)
+    chain = llm_providers.ProviderChain([_provider(slow, timeout=0.2)], deadline=0.5, max_retries=5)
+
+    start = time.monotonic()
+    with pytest.raises(llm_providers.ProviderError) as exc:
+        asyncio.run(chain.ainvoke(MESSAGES))
+    assert time.monotonic() - start < 0.9
+    assert exc.value.kind == "timeout"
+
+
+def test_stream_fails_over_before_the_first_token(fake_llm):
+    broken = fake_llm(script=[503])
+    backup = fake_llm(reply="Streaming from the backup.")
+    chain = llm_providers.ProviderChain([_provider(broken, "primary"), _provider(backup, "backup")], max_retries=0)
+
+    async def collect():
+        return [delta async for delta in chain.astream(MESSAGES)]
+
+    assert "".join(asyncio.run(collect())) == "Streaming from the backup."
+    assert backup.requests[0]["stream"] is True
+
+
+def test_trickling_stream_is_cut_off_at_the_deadline():
+    class Trickle(llm_providers.Provider):
+        async def astream(self, messages, timeout):
+            while True:
+                await asyncio.sleep(0.05)
+                yield "."
+
+    chain = llm_providers.ProviderChain([Trickle("trickle", "stub-model")], deadline=0.3, max_retries=0)
+
+    async def collect():
+        deltas = []
+        with pytest.raises(llm_providers.ProviderError) as exc:
+            async for delta in chain.astream(MESSAGES):
+                deltas.append(delta)
+        return deltas, exc.value
+
+    start = time.monotonic()
+    deltas, err = asyncio.run(collect())
+    assert time.monotonic() - start < 0.6
+    assert deltas and err.kind == "timeout"
+
+
+def test_brain_runs_on_a_local_endpoint(fake_llm, monkeypatch):
+    server = fake_llm(reply="Local model online, sir.")
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.setattr(llm_providers, "LOCAL_LLM_BASE_URL", server.base_url)
+    monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", "groq,local")
+
+    brain = llm_services.Brain()
+    assert brain._init_error is None
+    assert [p.name for p in brain.llm.providers] == ["local"]
+    assert brain.generate_response("Status report") == "Local model online, sir."
+    assert server.requests[0]["messages"][-1] == {"role": "user", "content": "Status report"}
@@ -0,0 +1,162 @@
+import io
+import os
+import sys
+import threading
+import time
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from PIL import Image
+from fastapi.testclient import TestClient
+from backend import main
+from backend.brain import local_multimodal as lm
+
+
+def _png(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (4, 4), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class FakeTokenizer:
+    def __call__(self, text):
+        return {"input_ids": text.split()}
+
+
+class FakeProcessor:
+    """Pads prompts on the right like the BLIP processor, so mixed lengths would show up as [PAD]s."""
+
+    tokenizer = FakeTokenizer()
+
+    def __call__(self, images, prompts, return_tensors=None, padding=True):
+        tokens = [self.tokenizer(p)["input_ids"] for p in prompts]
+        width = max(len(t) for t in tokens)
+        padded = [" ".join(t + ["[PAD]"] * (width - len(t))) for t in tokens]
+        return {"prompts": padded, "colors": [img.getpixel((0, 0)) for img in images]}
+
+    def decode(self, tokens, skip_special_tokens=False):
+        return tokens
+
+
+class FakeBlip:
+    def __init__(self):
+        self.batches = []
+
+    def generate(self, prompts, colors, max_new_tokens):
+        self.batches.append(len(prompts))
+        return [f"{p} {c}" for p, c in zip(prompts, colors)]
+
+
+def test_concurrent_requests_share_one_generate_call(monkeypatch):
+    model = FakeBlip()
+    monkeypatch.setattr(lm, "_processor", FakeProcessor())
+    monkeypatch.setattr(lm, "_model", model)
+    monkeypatch.setattr(lm, "batcher", lm.MicroBatcher(lm._caption_batch, max_batch=8, batch_wait_ms=100))
+
+    jobs = [(_png((255, 0, 0)), "what color"), (b"not an image", "broken"), (_png((0, 0, 255)), None)]
+    results = [None] * len(jobs)
+
+    def ask(i):
+        results[i] = lm.analyze_image_with_local_llm(*jobs[i])
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(jobs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Different prompt lengths are generated separately rather than padded
+    assert sorted(model.batches) == [1, 1]
+    assert results[0] == ("what color (255, 0, 0)", None)
+    assert results[1][0] is None and results[1][1]
+    assert results[2] == ("a photography of (0, 0, 255)", None)
+
+    stats = lm.get_stats()
+    assert stats["batches"] == 1 and stats["largest_batch"] == 3 and stats["queue_depth"] == 0
+
+
+def test_prompts_of_equal_length_share_a_batch_without_padding(monkeypatch):
+    model = FakeBlip()
+    monkeypatch.setattr(lm, "_processor", FakeProcessor())
+    monkeypatch.setattr(lm, "_model", model)
+
+    jobs = [
+        (_png((255, 0, 0)), "what color"),
+        (_png((0, 255, 0)), "what is in the picture"),
+        (_png((0, 0, 255)), "how bright"),
+    ]
+    results = lm._caption_batch(jobs)
+
+    assert sorted(model.batches) == [1, 2]
+    assert results == [
+        ("what color (255, 0, 0)", None),
+        ("what is in the picture (0, 255, 0)", None),
+        ("how bright (0, 0, 255)", None),
+    ]
+    assert not any("[PAD]" in caption for caption, _ in results)
+
+
+def test_image_qa_saves_turn_for_signed_in_user(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.mem, "USERS_DIR", str(tmp_path / "users"))
+    monkeypatch.setattr(lm, "is_available", lambda: True)
+    monkeypatch.setattr(lm, "analyze_image_with_local_llm", lambda b, q: ("a red square", None))
+    main.app.dependency_overrides[main.auth.get_optional_user] = lambda: {"username": "tester"}
+    try:
+        res = TestClient(main.app).post(
+            "/image_qa",
+            files={"file": ("square.png", io.BytesIO(b"img"), "image/png")},
+            data={"question": "What is this?"},
+        )
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert res.status_code == 200
+    chat_id = res.json()["chat_id"]
+    history = main.mem.get_chat_history(chat_id, "tester")
+    assert [m["content"] for m in history] == ["[Image: square.png] What is this?", "A red square"]
+
+
+def _fresh_model_state(monkeypatch):
+    for name, value in (("_model", None), ("_processor", None), ("_dtype", None),
+                        ("_state", "not_loaded"), ("_load_error", None), ("_load_seconds", None)):
+        monkeypatch.setattr(lm, name, value)
+
+
+def test_concurrent_first_requests_load_the_model_once(monkeypatch):
+    _fresh_model_state(monkeypatch)
+    loads = []
+
+    def slow_load(precision):
+        loads.append(precision)
+        time.sleep(0.1)
+        return FakeProcessor(), FakeBlip(), None
+
+    monkeypatch.setattr(lm, "_load", slow_load)
+    monkeypatch.setattr(lm, "is_available", lambda: True)
+
+    warmup = lm.start_background_load()
+    time.sleep(0.02)
+    assert lm.readiness()["state"] == "loading"
+
+    threads = [threading.Thread(target=lm._init_model) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads + [warmup]:
+        t.join()
+
+    assert loads == [lm.VISION_PRECISION]
+    ready = lm.readiness()
+    assert ready["state"] == "ready" and ready["ready"] and ready["load_seconds"] is not None
+
+
+def test_failed_load_is_reported(monkeypatch):
+    _fresh_model_state(monkeypatch)
+
+    def broken_load(precision):
+        raise OSError("no space left on device")
+
+    monkeypatch.setattr(lm, "_load", broken_load)
+    assert lm.analyze_image_with_local_llm(b"img") == (None, "Vision model could not be loaded.")
+    assert lm.readiness()["error"] == "no space left on device"
+    assert main.brain.check_status()["local_multimodal_state"] == "failed"
@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from backend.brain import memory_manager as mem
+
+
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(mem, "USERS_DIR", str(tmp_path / "users"))
+    return tmp_path
+
+
+def test_append_and_read_history():
+    chat_id = mem.create_new_chat("alice")["chat_id"]
+    mem.append_to_chat(chat_id, "human", "hello", "alice")
+    mem.append_to_chat(chat_id, "ai", "hi there", "alice")
+
+    history = mem.get_chat_history(chat_id, "alice")
+    assert [(m["seq"], m["role"], m["content"]) for m in history] == [
+        (0, "human", "hello"),
+        (1, "ai", "hi there"),
+    ]
+
+
+def test_append_writes_only_new_bytes():
+    chat_id = mem.create_new_chat("alice")["chat_id"]
+    mem.append_to_chat(chat_id, "human", "first", "alice")
+    path = mem._get_log_path(chat_id, "alice")
+    with open(path, "rb") as f:
+        before = f.read()
+
+    mem.append_to_chat(chat_id, "ai", "second", "alice")
+    with open(path, "rb") as f:
+        after = f.read()
+
+    assert after.startswith(before)
+    assert after.count(b"\n") == 2
+
+
+def test_torn_line_is_skipped_and_not_merged():
+    chat_id = mem.create_new_chat("alice")["chat_id"]
+    mem.append_to_chat(chat_id, "human", "first", "alice")
+    with open(mem._get_log_path(chat_id, "alice"), "a", encoding="utf-8") as f:
+        f.write('{"seq": 1, "role": "ai", "cont')
+
+    mem.append_to_chat(chat_id, "ai", "recovered", "alice")
+
+    history = mem.get_chat_history(chat_id, "alice")
+    assert [m["content"] for m in history] == ["first", "recovered"]
+    assert history[-1]["seq"] == 1
+
+
+def test_rename_delete_and_listing():
+    first = mem.create_new_chat("alice")["chat_id"]
+    second = mem.create_new_chat("alice")["chat_id"]
+
+    assert mem.rename_chat(first, "Groceries", "alice")
+    assert mem.delete_chat(second, "alice")
+    assert not mem.delete_chat(second, "alice")
+    assert not mem.rename_chat("missing", "x", "alice")
+
+    chats = mem.get_all_chats("alice")
+    assert [(c["chat_id"], c["name"]) for c in chats] == [(first, "Groceries")]
+    assert mem.get_chat_history(second, "alice") == []
+
+    # Appending to a deleted chat is a no-op, as before
+    mem.append_to_chat(second, "human", "ghost", "alice")
+    assert mem.get_chat_history(second, "alice") == []
+
+
+def test_legacy_chats_json_is_migrated(isolated_store):
+    user_dir = isolated_store / "users" / "bob"
+    user_dir.mkdir(parents=True)
+    legacy = {
+        "abc123": {
+            "title": "Old chat",
+            "created_at": "2024-01-01T00:00:00",
+            "messages": [
+                {"role": "human", "content": "hey", "timestamp": "t1"},
+                {"role": "ai", "content": "hello", "timestamp": "t2"},
+            ],
+        }
+    }
+    (user_dir / "chats.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    chats = mem.get_all_chats("bob")
+    assert chats == [{"chat_id": "abc123", "name": "Old chat", "timestamp": "2024-01-01T00:00:00"}]
+    assert [m["content"] for m in mem.get_chat_history("abc123", "bob")] == ["hey", "hello"]
+    assert not (user_dir / "chats.json").exists()
+    assert (user_dir / "chats.json.migrated").exists()
+
+    mem.append_to_chat("abc123", "human", "again", "bob")
+    assert mem.get_chat_history("abc123", "bob")[-1]["seq"] == 2
+
+
+def test_index_compaction(monkeypatch):
+    monkeypatch.setattr(mem, "INDEX_COMPACT_THRESHOLD", 5)
+    chat_id = mem.create_new_chat("carol")["chat_id"]
+    for i in range(10):
+        mem.rename_chat(chat_id, f"name {i}", "carol")
+
+    # Wait for the background compactor to drain
+    mem._compactor.submit(lambda: None).result()
+
+    records = mem._read_records(mem._get_index_path("carol"))
+    assert len(records) < 6
+    assert mem.get_all_chats("carol")[0]["name"] == "name 9"
+
+
+def test_recent_history_reads_only_the_tail():
+    chat_id = mem.create_new_chat("dave")["chat_id"]
+    for i in range(10):
+        mem.append_to_chat(chat_id, "human", f"message {i:02d}", "dave")
+
+    recent = mem.get_recent_history(chat_id, "dave", limit=3)
+    assert [m["content"] for m in recent] == ["message 07", "message 08", "message 09"]
+
+    # Each "message NN" is estimated at 3 tokens
+    budgeted = mem.get_recent_history(chat_id, "dave", max_tokens=7)
+    assert [m["content"] for m in budgeted] == ["message 08", "message 09"]
+
+
+def test_reverse_reader_handles_records_spanning_blocks():
+    chat_id = mem.create_new_chat("dave")["chat_id"]
+    for i in range(5):
+        mem.append_to_chat(chat_id, "ai", f"{i}" * 5000, "dave")
+
+    records = list(mem._iter_records_reversed(mem._get_log_path(chat_id, "dave"), block=1024))
+    assert [r["seq"] for r in records] == [4, 3, 2, 1, 0]
+
+
+def test_history_pagination_cursor():
+    chat_id = mem.create_new_chat("dave")["chat_id"]
+    for i in range(7):
+        mem.append_to_chat(chat_id, "human", str(i), "dave")
+
+    page = mem.get_history_page(chat_id, "dave", limit=3)
+    assert [m["seq"] for m in page] == [4, 5, 6]
+    page = mem.get_history_page(chat_id, "dave", before=page[0]["seq"], limit=3)
+    assert [m["seq"] for m in page] == [1, 2, 3]
+    page = mem.get_history_page(chat_id, "dave", before=page[0]["seq"], limit=3)
+    assert [m["seq"] for m in page] == [0]
+
+
+def test_chat_id_index_cannot_write_into_the_index_journal():
+    chat_id = mem.create_new_chat("erin")["chat_id"]
+    mem.append_to_chat("index", "human", "sneaky", "erin")
+
+    assert list(mem._load_index("erin")) == [chat_id]
+    assert mem.get_chat_history("index", "erin") == []
+
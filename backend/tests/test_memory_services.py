@@ -0,0 +1,220 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.brain import memory_services
+
+MEMORIES = [
+    "My favourite colour is blue",
+    "I live in Pune with my family",
+    "My dog is called Rex",
+    "I am allergic to peanuts",
+]
+
+
+@pytest.fixture
+def offline_store(tmp_path, monkeypatch):
+    def install(module):
+        monkeypatch.setattr(module, "PERSIST_DIRECTORY", str(tmp_path / "chroma"))
+        monkeypatch.setattr(module, "MEMORY_EMBEDDINGS", "hashing")
+        return module
+    return install
+
+
+def test_hashing_embeddings_rank_by_shared_words():
+    emb = memory_services.HashingEmbeddings()
+    query = np.array(emb.embed_query("What's my dog's name?"))
+    docs = np.array(emb.embed_documents(MEMORIES))
+
+    scores = docs @ query
+    assert int(np.argmax(scores)) == 2
+    assert np.isclose(np.linalg.norm(docs[0]), 1.0)
+
+
+def test_retrieval_returns_only_relevant_memories(offline_store):
+    ms = offline_store(memory_services)
+
+    found = ms.retrieve_relevant_memories("tester", "what is my dog called?", MEMORIES)
+    assert found == ["My dog is called Rex"]
+
+    # Memories are embedded once; later turns only embed the query
+    with ms.get_vector_store("tester") as store:
+        assert ms.sync_memories(MEMORIES, store) == 0
+    assert ms.retrieve_relevant_memories("tester", "tell me a joke", MEMORIES) == []
+
+
+def test_chat_prompt_gets_relevant_memories_only(tmp_path, monkeypatch, offline_store):
+    offline_store(main.memory_services)
+    monkeypatch.setattr(main.mem, "USERS_DIR", str(tmp_path / "users"))
+    main.app.dependency_overrides[main.auth.get_current_user] = lambda: {"username": "tester"}
+    for memory in MEMORIES:
+        main.mem.add_long_term_memory(memory, "tester")
+
+    seen = {}
+
+    async def fake_response(text, history, long_mem, **kwargs):
+        seen["memories"] = long_mem
+        return "Certainly, sir."
+
+    monkeypatch.setattr(main.brain, "aget_brain_response", fake_response)
+    try:
+        res = TestClient(main.app).post("/chat", json={"text": "Where do I live?"})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert res.status_code == 200
+    assert seen["memories"] == ["I live in Pune with my family"]
+
+
+def test_store_pool_reuses_and_evicts_least_recently_used(offline_store, monkeypatch):
+    ms = offline_store(memory_services)
+    pool = ms.VectorStoreManager(max_open=2, idle_seconds=60, mode="per_user")
+    monkeypatch.setattr(ms, "stores", pool)
+
+    def touch(user):
+        with ms.get_vector_store(user) as store:
+            return store.store
+
+    alice = touch("alice")
+    assert touch("alice") is alice
+    touch("bob")
+    touch("alice")
+    touch("carol")  # bob was least recently used
+
+    assert pool.stats()["open_stores"] == 2
+    assert pool.stats()["closed"] == 1
+    assert touch("alice") is alice
+    assert pool.stats()["opened"] == 3
+
+    # Reopened stores still see what was persisted before eviction
+    with ms.get_vector_store("bob") as bob:
+        ms.add_text_to_memory("I play the cello", bob)
+    pool.close_all()
+    with ms.get_vector_store("bob") as bob:
+        assert ms.search_memory("cello", bob, k=1) == ["I play the cello"]
+
+    assert pool.close_idle(now=time.monotonic() + 120) == 1
+    pool.close_all()
+
+
+def test_evicted_store_stays_open_while_in_use(offline_store, monkeypatch):
+    ms = offline_store(memory_services)
+    pool = ms.VectorStoreManager(max_open=1, idle_seconds=60, mode="per_user")
+    monkeypatch.setattr(ms, "stores", pool)
+
+    with ms.get_vector_store("alice") as alice:
+        with ms.get_vector_store("bob") as bob:  # evicts alice from the pool
+            ms.add_text_to_memory("My dog is called Fido", bob)
+        assert pool.stats()["closed"] == 0
+        ms.add_text_to_memory("My dog is called Rex", alice)
+        assert ms.search_memory("dog", alice, k=1) == ["My dog is called Rex"]
+        assert pool.stats()["closed"] == 0
+
+        with ms.get_vector_store("bob"):
+            # Busy stores are never closed for being idle
+            assert pool.close_idle(now=time.monotonic() + 120) == 0
+        assert pool.close_idle(now=time.monotonic() + 120) == 1
+        assert ms.search_memory("dog", alice, k=1) == ["My dog is called Rex"]
+    assert pool.stats()["closed"] == 2
+    pool.close_all()
+
+
+def test_cold_open_does_not_block_other_users(offline_store, monkeypatch):
+    ms = offline_store(memory_services)
+    pool = ms.VectorStoreManager(max_open=4, idle_seconds=60, mode="per_user")
+    real_open = pool._open
+    opening, release = threading.Event(), threading.Event()
+
+    def slow_open(backend, user_id=None):
+        if user_id == "slow":
+            opening.set()
+            release.wait(5)
+        return real_open(backend, user_id)
+
+    monkeypatch.setattr(pool, "_open", slow_open)
+    pool.get("alice").release()
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        slow = executor.submit(lambda: pool.get("slow"))
+        assert opening.wait(5)
+        # alice is served while slow's client is still being opened
+        executor.submit(lambda: pool.get("alice").release()).result(timeout=2)
+        # A second cold open of the same store waits for the first instead of opening it again
+        racer = executor.submit(lambda: pool.get("slow"))
+        release.set()
+        handles = [slow.result(timeout=5), racer.result(timeout=5)]
+
+    assert handles[0].store is handles[1].store
+    assert pool.stats()["opened"] == 2
+    for handle in handles:
+        handle.release()
+    pool.close_all()
+
+
+def test_shared_store_keeps_users_apart(offline_store, monkeypatch):
+    ms = offline_store(memory_services)
+    pool = ms.VectorStoreManager(mode="shared")
+    monkeypatch.setattr(ms, "stores", pool)
+
+    with ms.get_vector_store("alice") as alice, ms.get_vector_store("bob") as bob:
+        ms.sync_memories(["My dog is called Rex"], alice)
+        ms.sync_memories(["My dog is called Fido"], bob)
+
+    assert ms.retrieve_relevant_memories("alice", "what is my dog called?", ["My dog is called Rex"]) == ["My dog is called Rex"]
+    with ms.get_vector_store("bob") as bob:
+        assert ms.search_memory("what is my dog called?", bob) == ["My dog is called Fido"]
+    assert pool.stats()["open_stores"] == 1
+    pool.close_all()
+
+
+class CountingEmbeddings(memory_services.HashingEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+def test_embedding_cache_hits_skip_the_embedder(tmp_path):
+    inner = CountingEmbeddings()
+    cache = memory_services.EmbeddingCache(str(tmp_path / "emb.sqlite3"), max_entries=3)
+    emb = memory_services.CachedEmbeddings(inner, "counting", cache, batch_wait_ms=0)
+
+    first = emb.embed_documents(MEMORIES[:2])
+    assert emb.embed_documents(MEMORIES[:2]) == first
+    assert emb.embed_query(MEMORIES[0]) == first[0]
+    assert sum(inner.calls, []) == MEMORIES[:2]
+    assert cache.stats()["hit_rate"] == 0.6
+
+    # Oldest entries are evicted past max_entries, and the rest survive a restart
+    emb.embed_documents(MEMORIES[2:])
+    cache.close()
+    reopened = memory_services.EmbeddingCache(cache.path, max_entries=3)
+    keys = [reopened.key("counting", t) for t in MEMORIES]
+    assert reopened.stats()["entries"] == 3
+    assert set(reopened.get_many(keys)) == {keys[0], keys[2], keys[3]}
+
+
+def test_concurrent_embeddings_share_one_call(tmp_path):
+    inner = CountingEmbeddings()
+    cache = memory_services.EmbeddingCache(str(tmp_path / "emb.sqlite3"))
+    emb = memory_services.CachedEmbeddings(inner, "counting", cache, max_batch=16, batch_wait_ms=100)
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(emb.embed_query, MEMORIES))
+
+    assert len(inner.calls) == 1
+    assert sorted(inner.calls[0]) == sorted(MEMORIES)
+    assert results == emb.embed_documents(MEMORIES)
+    assert emb.stats()["batching"]["largest_batch"] == 4
@@ -0,0 +1,104 @@
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.brain import memory_services, response_cache
+
+
+def test_only_stateless_questions_are_cacheable():
+    assert response_cache.is_cacheable("What is the capital of France?")
+    assert response_cache.is_cacheable("What does NASA stand for")
+    assert not response_cache.is_cacheable("What is the capital of France?", ["I live in Paris"])
+    assert not response_cache.is_cacheable("Why did you say that?")
+    assert not response_cache.is_cacheable("what's my name")
+    assert not response_cache.is_cacheable("what is the weather today")
+    assert not response_cache.is_cacheable("what is the population", history=[{"role": "human"}])
+    assert not response_cache.is_cacheable("what is the population", summary="Talking about Paris")
+
+
+def test_exact_hits_are_scoped_to_the_system_prompt():
+    cache = response_cache.ResponseCache(ttl=60, max_size=2)
+    cache.put("prompt", "What is the capital of France?", "Paris, sir.")
+
+    assert cache.get("prompt", "  what is the CAPITAL of france ") == "Paris, sir."
+    assert cache.get("other prompt", "What is the capital of France?") is None
+
+    cache.put("prompt", "a", "1")
+    cache.put("prompt", "b", "2")  # evicts the oldest
+    assert cache.get("prompt", "What is the capital of France?") is None
+    assert cache.stats()["hits"] == {"exact": 1, "semantic": 0}
+
+
+def test_entries_expire():
+    cache = response_cache.ResponseCache(ttl=0)
+    cache.put("prompt", "What is the capital of France?", "Paris, sir.")
+    assert cache.get("prompt", "What is the capital of France?") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_near_duplicates_hit_with_embeddings():
+    emb = memory_services.HashingEmbeddings()
+    cache = response_cache.ResponseCache(embed=emb.embed_query, similarity=0.9)
+    cache.put("prompt", "What is the capital city of France?", "Paris, sir.")
+
+    assert cache.get("prompt", "capital city of france") == "Paris, sir."
+    assert cache.get("prompt", "What is the capital city of Spain?") is None
+    assert cache.stats()["hits"] == {"exact": 0, "semantic": 1}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.mem, "USERS_DIR", str(tmp_path / "users"))
+    monkeypatch.setattr(main.response_cache, "RESPONSE_CACHE", True)
+    monkeypatch.setattr(main.response_cache, "cache", main.response_cache.ResponseCache())
+    monkeypatch.setattr(main.brain, "system_prompt", lambda: "You are J.A.R.V.I.S")
+    main.app.dependency_overrides[main.auth.get_current_user] = lambda: {"username": "tester"}
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_chat_reports_cache_hits(client, monkeypatch):
+    calls = []
+
+    async def fake_response(text, history, long_mem, **kwargs):
+        calls.append(text)
+        if "search" in text:
+            return '{"type":"local_action","action":"open_app","app":"notepad"}'
+        return "Paris, sir."
+
+    async def fake_send(cmd):
+        pass
+
+    monkeypatch.setattr(main.brain, "aget_brain_response", fake_response)
+    monkeypatch.setattr(main, "send_to_agent", fake_send)
+
+    first = client.post("/chat", json={"text": "What is the capital of France?"}).json()
+    second = client.post("/chat", json={"text": "what is the capital of france"}).json()
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["response"] == "Paris, sir."
+    assert len(calls) == 1
+
+    # Tool calls and personal questions always go to the model
+    for _ in range(2):
+        assert client.post("/chat", json={"text": "open notepad search"}).json()["cached"] is False
+        assert client.post("/chat", json={"text": "what is my name"}).json()["cached"] is False
+    assert len(calls) == 5
+
+
+def test_follow_ups_in_a_chat_are_not_cached(client, monkeypatch):
+    async def fake_response(text, history, long_mem, **kwargs):
+        return "About two million." if history else "Which place, sir?"
+
+    monkeypatch.setattr(main.brain, "aget_brain_response", fake_response)
+
+    chat_id = client.post("/chat", json={"text": "Tell me about Paris"}).json()["chat_id"]
+    follow_up = client.post("/chat", json={"text": "what is the population", "chatId": chat_id}).json()
+    fresh = client.post("/chat", json={"text": "what is the population"}).json()
+
+    assert (follow_up["response"], follow_up["cached"]) == ("About two million.", False)
+    assert (fresh["response"], fresh["cached"]) == ("Which place, sir?", False)
@@ -0,0 +1,157 @@
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.brain import speech_services
+
+
+def test_import_loads_no_models():
+    # A fresh interpreter, so modules imported by other tests don't count
+    code = (
+        "import sys; import backend.brain.speech_services as s; "
+        "heavy = {'torch', 'whisper', 'transformers', 'speechbrain'} & set(sys.modules); "
+        "assert not heavy, heavy; "
+        "assert not any(m.loaded for m in s.engine.models)"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+def test_lazy_model_loads_once_under_concurrency():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    model = speech_services.LazyModel("fake", loader)
+    assert not model.loaded
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(model.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+    status = model.status()
+    assert status["loaded"] and status["loads"] == 1 and status["load_seconds"] >= 0.05
+
+
+def test_engine_unloads_idle_models():
+    engine = speech_services.LocalSpeechEngine(idle_unload_seconds=30)
+    engine.stt._loader = object
+    engine.tts._loader = object
+
+    engine.stt.get()
+    engine.tts.get()
+    engine.tts.last_used -= 60
+
+    assert engine.unload_idle() == [engine.tts.name]
+    assert engine.stt.loaded and not engine.tts.loaded
+
+    # Reloads on the next use
+    engine.tts.get()
+    assert engine.tts.status()["loads"] == 2
+
+
+def test_worker_batches_concurrent_requests():
+    batches = []
+
+    def fake_batch(texts, voices):
+        batches.append(list(texts))
+        time.sleep(0.05)
+        return [np.full(len(t), 0.5, dtype=np.float32) for t in texts]
+
+    worker = speech_services.BatchedSpeechWorker(fake_batch, max_batch=4, batch_wait_ms=20)
+    futures = [worker.submit("x" * n) for n in range(1, 7)]
+    results = [f.result(timeout=5) for f in futures]
+
+    assert [len(r) for r in results] == [1, 2, 3, 4, 5, 6]
+    assert [len(b) for b in batches] == [4, 2]
+    assert worker.stats()["largest_batch"] == 4
+
+
+def test_worker_reports_batch_failures_to_every_caller():
+    def broken(texts, voices):
+        raise ValueError("Unknown voice profile: nobody")
+
+    worker = speech_services.BatchedSpeechWorker(broken, batch_wait_ms=0)
+    with pytest.raises(ValueError, match="nobody"):
+        worker.submit("hello", "nobody").result(timeout=5)
+
+
+def test_unknown_voice_fails_only_its_own_request(monkeypatch):
+    batches = []
+
+    def fake_batch(texts, voices):
+        batches.append(list(voices))
+        return [np.zeros(160, dtype=np.float32) for _ in texts]
+
+    def check_voice(voice):
+        if voice != "jarvis":
+            raise ValueError(f"Unknown voice profile: {voice}")
+
+    worker = speech_services.BatchedSpeechWorker(fake_batch, batch_wait_ms=200, check_voice=check_voice)
+    monkeypatch.setattr(main.speech_services, "tts_worker", worker)
+    client = TestClient(main.app)
+    results = {}
+
+    def speak(voice):
+        results[voice] = client.post("/tts", json={"text": "Hello sir", "engine": "local", "voice": voice})
+
+    threads = [threading.Thread(target=speak, args=(v,)) for v in ("jarvis", "nobody")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results["jarvis"].status_code == 200
+    assert results["nobody"].status_code == 400
+    assert batches == [["jarvis"]]
+
+
+def test_local_tts_endpoint_returns_wav(monkeypatch):
+    def fake_batch(texts, voices):
+        assert texts == ["Hello sir"] and voices == [None]
+        return [np.linspace(-1, 1, 1600, dtype=np.float32) for _ in texts]
+
+    monkeypatch.setattr(main.speech_services, "tts_worker", speech_services.BatchedSpeechWorker(fake_batch))
+    res = TestClient(main.app).post("/tts", json={"text": "Hello *sir*", "engine": "local"})
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "audio/wav"
+    with wave.open(io.BytesIO(res.content)) as wav:
+        assert wav.getframerate() == 16000 and wav.getsampwidth() == 2 and wav.getnframes() == 1600
+
+
+def test_local_engine_is_honoured_by_tts_stream(monkeypatch):
+    def fake_batch(texts, voices):
+        return [np.zeros(1600, dtype=np.float32) for _ in texts]
+
+    def no_edge(*args, **kwargs):
+        raise AssertionError("edge_tts called for the local engine")
+
+    monkeypatch.setattr(main.speech_services, "tts_worker", speech_services.BatchedSpeechWorker(fake_batch))
+    monkeypatch.setattr(main.tts_services.edge_tts, "Communicate", no_edge)
+    monkeypatch.setattr(main.tts_services, "TTS_ENGINE", "local")
+    client = TestClient(main.app)
+
+    res = client.post("/tts/stream", json={"text": "Good evening, sir. All systems online."})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "audio/wav"
+    assert client.post("/tts/stream", json={"text": "Hi", "engine": "robot"}).status_code == 400
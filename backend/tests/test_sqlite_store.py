@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+import threading
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from backend.brain import memory_manager as mem
+from backend.brain import sqlite_store
+from backend.brain.migrate_to_sqlite import migrate
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(mem, "USERS_DIR", str(tmp_path / "users"))
+    monkeypatch.setattr(mem, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(sqlite_store, "DB_PATH", str(tmp_path / "jarvis.db"))
+    return tmp_path
+
+
+def test_public_api_round_trip(sqlite_backend):
+    chat_id = mem.create_new_chat("alice")["chat_id"]
+    mem.append_to_chat(chat_id, "human", "hello", "alice")
+    mem.append_to_chat(chat_id, "ai", "hi", "alice")
+    mem.add_long_term_memory("likes tea", "alice")
+    mem.add_long_term_memory("likes tea", "alice")
+
+    assert [m["content"] for m in mem.get_chat_history(chat_id, "alice")] == ["hello", "hi"]
+    assert mem.get_long_term_memory("alice") == ["likes tea"]
+    assert mem.rename_chat(chat_id, "Tea", "alice")
+    assert mem.get_all_chats("alice")[0]["name"] == "Tea"
+
+    # Other users can neither see nor modify the chat
+    assert mem.get_chat_history(chat_id, "mallory") == []
+    assert not mem.delete_chat(chat_id, "mallory")
+
+    assert mem.delete_chat(chat_id, "alice")
+    assert mem.get_all_chats("alice") == []
+    assert mem.get_chat_history(chat_id, "alice") == []
+
+
+def test_wal_mode_enabled(sqlite_backend):
+    mem.init_db("alice")
+    mode = sqlite_store._get_conn().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode.lower() == "wal"
+
+
+def test_concurrent_appends_are_not_lost(sqlite_backend):
+    chat_id = mem.create_new_chat("alice")["chat_id"]
+
+    def writer(n):
+        for i in range(25):
+            mem.append_to_chat(chat_id, "human", f"{n}-{i}", "alice")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    history = mem.get_chat_history(chat_id, "alice")
+    assert len(history) == 100
+    assert [m["seq"] for m in history] == list(range(100))
+
+
+def test_migration_imports_json_tree(tmp_path, monkeypatch):
+    users_dir = tmp_path / "users"
+    (users_dir / "bob").mkdir(parents=True)
+    legacy = {
+        "abc123": {
+            "title": "Old chat",
+            "created_at": "2024-01-01T00:00:00",
+            "messages": [
+                {"role": "human", "content": "hey", "timestamp": "t1"},
+                {"role": "ai", "content": "hello", "timestamp": "t2"},
+            ],
+        }
+    }
+    (users_dir / "bob" / "chats.json").write_text(json.dumps(legacy), encoding="utf-8")
+    (users_dir / "bob" / "memory.json").write_text(json.dumps(["owns a cat"]), encoding="utf-8")
+
+    monkeypatch.setattr(mem, "USERS_DIR", mem.USERS_DIR)
+    monkeypatch.setattr(sqlite_store, "DB_PATH", sqlite_store.DB_PATH)
+    db_path = str(tmp_path / "jarvis.db")
+
+    totals = migrate(str(users_dir), db_path)
+    assert totals == {"users": 1, "chats": 1, "messages": 2}
+
+    # Re-running is a no-op
+    assert migrate(str(users_dir), db_path)["messages"] == 0
+    # The source tree is only read
+    assert sorted(p.name for p in (users_dir / "bob").iterdir()) == ["chats.json", "memory.json"]
+    assert mem.USERS_DIR != str(users_dir)
+
+    monkeypatch.setattr(mem, "STORAGE_BACKEND", "sqlite")
+    assert [m["content"] for m in mem.get_chat_history("abc123", "bob")] == ["hey", "hello"]
+    assert mem.get_long_term_memory("bob") == ["owns a cat"]
+
+
+def test_migration_reads_append_only_logs(tmp_path, monkeypatch):
+    monkeypatch.setattr(mem, "USERS_DIR", str(tmp_path / "users"))
+    chat_id = mem.create_new_chat("carol")["chat_id"]
+    mem.append_to_chat(chat_id, "human", "ping", "carol")
+    mem.append_to_chat(chat_id, "ai", "pong", "carol")
+    mem.rename_chat(chat_id, "Ping pong", "carol")
+
+    monkeypatch.setattr(sqlite_store, "DB_PATH", sqlite_store.DB_PATH)
+    assert migrate(str(tmp_path / "users"), str(tmp_path / "jarvis.db")) == {"users": 1, "chats": 1, "messages": 2}
+
+    monkeypatch.setattr(mem, "STORAGE_BACKEND", "sqlite")
+    assert mem.get_all_chats("carol")[0]["name"] == "Ping pong"
+    assert [m["content"] for m in mem.get_chat_history(chat_id, "carol")] == ["ping", "pong"]
+
+
+def test_tail_and_pagination(sqlite_backend):
+    chat_id = mem.create_new_chat("alice")["chat_id"]
+    for i in range(7):
+        mem.append_to_chat(chat_id, "human", f"message {i:02d}", "alice")
+
+    assert [m["seq"] for m in mem.get_recent_history(chat_id, "alice", limit=2)] == [5, 6]
+    assert [m["seq"] for m in mem.get_recent_history(chat_id, "alice", max_tokens=7)] == [5, 6]
+    assert [m["seq"] for m in mem.get_history_page(chat_id, "alice", before=5, limit=3)] == [2, 3, 4]
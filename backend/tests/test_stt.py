@@ -0,0 +1,165 @@
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.brain import stt_services
+
+# Stand-ins for ffmpeg: treat stdin as already-decoded s16le PCM, or fail like a bad upload
+PASSTHROUGH = "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read())"
+FAILING = "import sys; sys.stdin.buffer.read(); sys.stderr.write('Invalid data found'); sys.exit(1)"
+
+
+def _fake_ffmpeg(tmp_path, body):
+    script = tmp_path / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\n{body}\n")
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_decode_audio_pipes_pcm_to_float32(tmp_path, monkeypatch):
+    monkeypatch.setattr(stt_services, "FFMPEG_PATH", _fake_ffmpeg(tmp_path, PASSTHROUGH))
+    samples = np.array([0, 16384, -32768, 32767], dtype=np.int16)
+
+    audio = asyncio.run(stt_services.decode_audio(samples.tobytes() + b"\x01"))
+
+    assert audio.dtype == np.float32
+    np.testing.assert_allclose(audio, [0.0, 0.5, -1.0, 32767 / 32768])
+
+
+def test_decode_audio_reports_ffmpeg_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(stt_services, "FFMPEG_PATH", _fake_ffmpeg(tmp_path, FAILING))
+
+    with pytest.raises(stt_services.AudioDecodeError, match="Invalid data"):
+        asyncio.run(stt_services.decode_audio(b"not audio"))
+
+
+class FakeWhisper:
+    """Mimics faster-whisper: transcribe() returns a lazy segment generator plus info."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append(options)
+
+        def segments():
+            for i, text in enumerate(self.texts):
+                yield SimpleNamespace(text=f" {text}", start=float(i), end=float(i + 1))
+
+        return segments(), SimpleNamespace(language="en", duration=len(audio) / stt_services.SAMPLE_RATE)
+
+
+@pytest.fixture
+def fake_whisper(monkeypatch):
+    def install(module, texts):
+        model = FakeWhisper(texts)
+        monkeypatch.setattr(module, "_model", model)
+        module.stats.reset()
+        return model
+    return install
+
+
+def test_transcribe_stream_yields_segments_with_options(fake_whisper, monkeypatch):
+    model = fake_whisper(stt_services, ["Hello", "there", "sir"])
+    monkeypatch.setattr(stt_services, "WHISPER_BEAM_SIZE", 1)
+    monkeypatch.setattr(stt_services, "WHISPER_VAD_FILTER", True)
+    audio = np.zeros(stt_services.SAMPLE_RATE * 3, dtype=np.float32)
+
+    async def collect():
+        return [seg async for seg in stt_services.transcribe_stream(audio)]
+
+    segments = asyncio.run(collect())
+    assert [s["text"] for s in segments] == ["Hello", "there", "sir"]
+    assert segments[1] == {"text": "there", "start": 1.0, "end": 2.0}
+    assert model.calls == [{"language": "en", "beam_size": 1, "vad_filter": True}]
+
+    snapshot = stt_services.get_stt_stats()
+    assert snapshot["completed"] == 1 and snapshot["queue_depth"] == 0 and snapshot["active"] == 0
+
+
+def test_stt_endpoints_transcribe_on_worker_pool(fake_whisper, monkeypatch):
+    fake_whisper(main.stt_services, ["What time", "is it?"])
+
+    async def fake_decode(data, sample_rate=stt_services.SAMPLE_RATE):
+        return np.zeros(sample_rate, dtype=np.float32)
+
+    monkeypatch.setattr(main.stt_services, "FFMPEG_PATH", "ffmpeg")
+    monkeypatch.setattr(main.stt_services, "decode_audio", fake_decode)
+    client = TestClient(main.app)
+
+    res = client.post("/stt", files={"file": ("a.webm", b"audio")})
+    assert res.status_code == 200
+    assert res.json() == {"text": "What time is it?"}
+
+    res = client.post("/stt/stream", files={"file": ("a.webm", b"audio")})
+    events = [json.loads(line[len("data: "):]) for line in res.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["segment", "segment", "done"]
+    assert events[-1]["text"] == "What time is it?"
+
+    assert client.get("/status").json()["stt"]["completed"] == 2
+
+
+def test_ring_buffer_keeps_newest_samples():
+    ring = stt_services.RingBuffer(5)
+    ring.extend(np.arange(3, dtype=np.float32))
+    ring.extend(np.arange(3, 7, dtype=np.float32))
+    assert ring.full
+    np.testing.assert_array_equal(ring.get(), [2, 3, 4, 5, 6])
+
+    ring.keep_last(2)
+    np.testing.assert_array_equal(ring.get(), [5, 6])
+    ring.extend(np.arange(10, 20, dtype=np.float32))
+    np.testing.assert_array_equal(ring.get(), [15, 16, 17, 18, 19])
+
+
+def _pcm16(seconds, amplitude):
+    t = np.arange(int(seconds * stt_services.SAMPLE_RATE)) / stt_services.SAMPLE_RATE
+    return (amplitude * 32767 * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+def test_ws_stt_emits_final_after_silence(fake_whisper, monkeypatch):
+    model = fake_whisper(main.stt_services, ["Open", "the pod bay doors"])
+    monkeypatch.setattr(main.stt_services, "STT_ENDPOINT_SILENCE", 0.3)
+    monkeypatch.setattr(main.stt_services, "STT_PARTIAL_INTERVAL", 60)
+    client = TestClient(main.app)
+
+    # Two utterances separated by silence, sent in 100 ms chunks like a live mic
+    audio = _pcm16(0.2, 0) + _pcm16(0.6, 0.3) + _pcm16(0.5, 0) + _pcm16(0.4, 0.3) + _pcm16(0.1, 0)
+    chunk = stt_services.SAMPLE_RATE // 10 * 2
+    with client.websocket_connect("/ws/stt?format=pcm16") as ws:
+        for i in range(0, len(audio), chunk):
+            ws.send_bytes(audio[i:i + chunk])
+        ws.send_json({"type": "end"})
+
+        events = []
+        while not events or events[-1]["type"] != "done":
+            events.append(ws.receive_json())
+
+    finals = [e for e in events if e["type"] == "final"]
+    assert len(finals) == 2
+    assert finals[0]["text"] == "Open the pod bay doors"
+    # Finals decode with full beam search plus VAD; the second was cut off by "end"
+    assert all(call["vad_filter"] for call in model.calls)
+
+
+def test_ws_stt_rejects_malformed_control_frames(fake_whisper):
+    fake_whisper(main.stt_services, [])
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws/stt?format=pcm16") as ws:
+        for frame in ("not json", "[1, 2]", '"end"'):
+            ws.send_text(frame)
+            assert ws.receive_json()["type"] == "error"
+        # The session survives bad frames
+        ws.send_json({"type": "end"})
+        assert ws.receive_json() == {"type": "done"}
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.brain import tts_services
+
+
+class FakeCommunicate:
+    """Local stand-in for edge_tts.Communicate: yields canned chunks instead of calling the service."""
+
+    instances = []
+
+    def __init__(self, text, voice, **kwargs):
+        self.text = text
+        self.voice = voice
+        self.kwargs = kwargs
+        FakeCommunicate.instances.append(self)
+
+    async def stream(self):
+        if self.text == "fail":
+            raise ConnectionError("service unavailable")
+        yield {"type": "WordBoundary", "offset": 0, "duration": 1, "text": "Hello"}
+        for part in (b"ID3", b"chunk-1", b"chunk-2"):
+            yield {"type": "audio", "data": part}
+
+
+@pytest.fixture
+def tts_client(monkeypatch, tmp_path):
+    FakeCommunicate.instances = []
+    monkeypatch.setattr(main.tts_services.edge_tts, "Communicate", FakeCommunicate)
+    monkeypatch.setattr(main.tts_services, "cache", main.tts_services.TTSCache(str(tmp_path / "tts_cache")))
+    monkeypatch.chdir(tmp_path)
+    return TestClient(main.app)
+
+
+def test_tts_streams_audio_chunks_without_temp_files(tts_client, tmp_path):
+    res = tts_client.post("/tts", json={"text": "**Hello** `sir`"})
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "audio/mpeg"
+    assert res.content == b"ID3chunk-1chunk-2"
+    assert FakeCommunicate.instances[0].text == "Hello sir"
+    assert FakeCommunicate.instances[0].voice == "en-GB-RyanNeural"
+    # The only file written is the cached clip
+    assert [p.name for p in tmp_path.iterdir()] == ["tts_cache"]
+
+
+def test_tts_failure_before_first_chunk_is_502(tts_client):
+    res = tts_client.post("/tts", json={"text": "fail"})
+    assert res.status_code == 502
+
+
+def test_tts_repeats_are_served_from_cache(tts_client, monkeypatch):
+    first = tts_client.post("/tts", json={"text": "Done on your system"})
+    again = tts_client.post("/tts", json={"text": "  *Done*  on your system"})
+    assert again.content == first.content
+    assert len(FakeCommunicate.instances) == 1
+    assert main.tts_services.cache.stats()["hits"]["memory"] == 1
+
+    # Without the memory tier the clip comes off disk
+    main.tts_services.cache.memory_bytes = 0
+    main.tts_services.cache._memory.clear()
+    res = tts_client.post("/tts", json={"text": "Done on your system"})
+    assert res.content == first.content
+    assert main.tts_services.cache.stats()["hits"]["disk"] == 1
+
+    # A different voice is a different rendering
+    tts_client.post("/tts", json={"text": "Done on your system", "voice": "en-US-GuyNeural"})
+    assert FakeCommunicate.instances[-1].voice == "en-US-GuyNeural"
+    assert len(FakeCommunicate.instances) == 2
+
+
+def test_tts_cache_evicts_least_recently_used_under_byte_cap(tmp_path):
+    cache = tts_services.TTSCache(str(tmp_path), max_bytes=25, memory_bytes=0)
+    for key in ("a", "b", "c"):
+        cache.put(key, b"x" * 10)
+
+    assert cache.get_path("a") is None
+    assert cache.get_path("b")
+    cache.put("d", b"x" * 10)  # "c" is now the least recently used
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["b.mp3", "d.mp3"]
+    assert cache.stats()["disk_bytes"] == 20
+
+    # A fresh instance rebuilds the index from disk
+    assert "b" in tts_services.TTSCache(str(tmp_path), max_bytes=25)
+
+
+def test_tts_cache_does_file_io_outside_the_lock(tmp_path, monkeypatch):
+    cache = tts_services.TTSCache(str(tmp_path), max_bytes=15)
+    held = []
+    real_replace, real_remove = os.replace, os.remove
+
+    def replace(src, dst):
+        held.append(cache._lock.locked())
+        real_replace(src, dst)
+
+    def remove(path):
+        held.append(cache._lock.locked())
+        real_remove(path)
+
+    monkeypatch.setattr(tts_services.os, "replace", replace)
+    monkeypatch.setattr(tts_services.os, "remove", remove)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 10)  # evicts "a"
+
+    assert held == [False, False, False]
+    assert cache.get_memory("b") == b"x" * 10
+
+
+def test_sentence_splitter_handles_streamed_tokens():
+    splitter = tts_services.SentenceSplitter(min_chars=10)
+    out = []
+    for token in ["Certainly, sir", ". The time is 3.", "15 p", "m. Ok. Anything", " else?\nNo"]:
+        out += splitter.feed(token)
+    out += splitter.flush()
+
+    # "3." mid-number is not a boundary; the too-short "Ok." rides along with the next sentence
+    assert out == ["Certainly, sir.", "The time is 3.15 pm.", "Ok. Anything else?", "No"]
+
+
+def test_speak_sentences_keeps_order_with_bounded_parallelism(monkeypatch):
+    running = {"now": 0, "peak": 0}
+
+    async def fake_render(text, voice=None, rate=None):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        # Later sentences finish first
+        await asyncio.sleep(0.05 / len(text))
+        running["now"] -= 1
+        return text.encode()
+
+    monkeypatch.setattr(tts_services, "render_cached", fake_render)
+    sentences = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]
+
+    async def collect():
+        return [clip async for clip in tts_services.speak_sentences(sentences, parallelism=2)]
+
+    assert asyncio.run(collect()) == [s.encode() for s in sentences]
+    assert running["peak"] == 2
+
+
+def test_tts_stream_endpoint_joins_sentence_clips(tts_client):
+    text = "Good evening, sir. All systems are online. Shall I begin the diagnostic?"
+    res = tts_client.post("/tts/stream", json={"text": text})
+
+    assert res.status_code == 200
+    assert res.content == b"ID3chunk-1chunk-2" * 2
+    assert [c.text for c in FakeCommunicate.instances] == [
+        "Good evening, sir. All systems are online.", "Shall I begin the diagnostic?"
+    ]
+
+
+def test_tts_stream_rejects_empty_text(tts_client):
+    for text in ("", "   \n "):
+        res = tts_client.post("/tts/stream", json={"text": text})
+        assert res.status_code == 400
+    assert FakeCommunicate.instances == []
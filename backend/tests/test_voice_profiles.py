@@ -0,0 +1,44 @@
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+from backend.brain import voice_profiles
+
+
+def test_same_recording_is_encoded_once(tmp_path):
+    wav = tmp_path / "voice.wav"
+    wav.write_bytes(b"RIFF fake wav")
+    calls = []
+
+    def encode(path):
+        calls.append(path)
+        return np.arange(voice_profiles.EMBEDDING_DIM, dtype=np.float64)
+
+    store = voice_profiles.VoiceProfileStore(str(tmp_path / "profiles"))
+    digest = store.add_wav("jarvis", str(wav), encode)
+    assert store.add_wav("butler", str(wav), encode) == digest
+    assert calls == [str(wav)]
+
+    # Another process sees the same profiles, memory-mapped from disk
+    reloaded = voice_profiles.VoiceProfileStore(str(tmp_path / "profiles"))
+    vector = reloaded.get("butler")
+    assert reloaded.names() == ["butler", "jarvis"]
+    assert isinstance(vector, np.memmap) and vector.dtype == np.float32
+    assert vector[5] == 5.0
+    assert sorted(os.listdir(tmp_path / "profiles")) == [f"{digest}.npy", "index.json"]
+
+
+def test_vectors_are_validated_and_unknown_names_rejected(tmp_path):
+    store = voice_profiles.VoiceProfileStore(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        store.add_vector("short", np.zeros(10))
+    with pytest.raises(ValueError, match="Unknown voice profile"):
+        store.get("nobody")
+
+    store.add_vector("imported", np.ones((1, voice_profiles.EMBEDDING_DIM)))
+    assert "imported" in store and float(store.get("imported").sum()) == voice_profiles.EMBEDDING_DIM
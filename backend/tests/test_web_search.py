@@ -0,0 +1,169 @@
+import asyncio
+import os
+import sys
+
+# Make sure the backend package is importable during tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from fake_serper import FakeSerper
+
+searcher = main.searcher
+
+
+@pytest.fixture
+def fake_serper(monkeypatch):
+    servers = []
+
+    def start(**kwargs):
+        server = FakeSerper(**kwargs).install(monkeypatch, searcher)
+        servers.append(server)
+        return server
+
+    yield start
+    searcher.reset_search_client()
+    for server in servers:
+        server.stop()
+
+
+def test_cache_is_keyed_on_normalized_query(fake_serper):
+    fake = fake_serper()
+
+    first = asyncio.run(searcher.search("Weather in Paris?"))
+    second = asyncio.run(searcher.search("  weather   in PARIS "))
+
+    assert first == second
+    assert fake.queries == ["Weather in Paris?"]
+
+
+def test_cache_ttl_and_lru_eviction():
+    cache = searcher.SearchCache(ttl=60, max_size=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    expired = searcher.SearchCache(ttl=-1, max_size=2)
+    expired.put("a", "1")
+    assert expired.get("a") is None
+
+
+def test_concurrent_identical_queries_share_one_request(fake_serper):
+    fake = fake_serper(delay=0.2)
+
+    async def burst():
+        return await asyncio.gather(*[searcher.search("nba scores") for _ in range(5)])
+
+    results = asyncio.run(burst())
+    assert len(set(results)) == 1
+    assert fake.queries == ["nba scores"]
+
+
+def test_followers_survive_a_cancelled_leader(fake_serper):
+    fake = fake_serper(delay=0.2)
+
+    async def scenario():
+        leader = asyncio.create_task(searcher.search("nba scores"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(searcher.search("nba scores"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        result = await asyncio.wait_for(follower, 2)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    assert asyncio.run(scenario()) == "Top result for nba scores"
+    assert searcher._inflight == {}
+
+
+def test_errors_are_counted_and_not_cached(fake_serper):
+    fake = fake_serper(status=500)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(searcher.search("q"))
+
+    assert len(fake.queries) == 2
+    stats = searcher.get_search_stats()
+    assert stats["requests"] == 2 and stats["errors"] == 2 and stats["error_rate"] == 1.0
+
+
+def test_client_is_shared_and_keeps_connections_alive(fake_serper):
+    fake = fake_serper()
+    tool = searcher.get_search_tool()
+    assert searcher.get_search_tool().func.__self__ is tool.func.__self__
+
+    for q in ("one", "two", "three"):
+        assert tool.func(q) == f"Top result for {q}"
+
+    assert fake.queries == ["one", "two", "three"]
+    assert len(fake.client_ports) == 1
+    assert searcher.get_search_stats()["requests"] == 3
+
+
+def test_missing_key_disables_search(monkeypatch):
+    monkeypatch.delenv("SERPER_API_KEY", raising=False)
+    searcher.reset_search_client()
+    assert asyncio.run(searcher.search("anything")) == searcher.DISABLED_MESSAGE
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.mem, "USERS_DIR", str(tmp_path / "users"))
+    main.app.dependency_overrides[main.auth.get_current_user] = lambda: {"username": "tester"}
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_chat_runs_search_and_returns_grounded_answer(client, fake_serper, monkeypatch):
+    fake = fake_serper(results={"paris weather": "Paris: 18°C, light rain"})
+
+    async def fake_llm(text, history, long_mem, summary="", search_results="", window=None):
+        if not search_results:
+            return '{"type":"web_search","query":"paris weather"}'
+        return f"Grounded: {search_results.splitlines()[-1]}"
+
+    monkeypatch.setattr(main.brain, "aget_brain_response", fake_llm)
+
+    res = client.post("/chat", json={"text": "What's the weather in Paris?"})
+    assert res.status_code == 200
+    assert res.json()["response"] == "Grounded: Paris: 18°C, light rain"
+    assert fake.queries == ["paris weather"]
+
+    history = main.mem.get_chat_history(res.json()["chat_id"], "tester")
+    assert history[-1]["content"] == "Grounded: Paris: 18°C, light rain"
+
+
+def test_chat_stream_streams_grounded_answer(client, fake_serper, monkeypatch):
+    fake_serper(results={"paris weather": "18°C"})
+
+    async def fake_stream(text, history, long_mem, summary="", search_results="", window=None):
+        chunks = ['{"type":"web_search",', '"query":"paris weather"}'] if not search_results else ["It is ", "18°C."]
+        for chunk in chunks:
+            yield chunk
+
+    monkeypatch.setattr(main.brain, "stream_brain_response", fake_stream)
+
+    res = client.post("/chat/stream", json={"text": "Weather in Paris?"})
+    events = [main.json.loads(line[6:]) for line in res.text.splitlines() if line.startswith("data: ")]
+
+    assert [e["type"] for e in events] == ["start", "search", "token", "token", "done"]
+    assert events[-1]["response"] == "It is 18°C."
+
+
+def test_status_endpoint_reports_search_metrics(client, fake_serper):
+    fake_serper()
+    asyncio.run(searcher.search("ping"))
+
+    res = client.get("/status")
+    assert res.status_code == 200
+    search = res.json()["search"]
+    assert search["configured"] is True
+    assert search["requests"] == 1
+    assert sum(search["latency_histogram"].values()) == 1
@@ -10,6 +10,12 @@ export interface ChatItem {
 export interface ChatMessage {
   role: "human" | "ai";
   content: string;
+  seq?: number;
+}
+
+export interface ChatHistoryPage {
+  messages: ChatMessage[];
+  next_before: number | null;
 }
 
 // AUTH HELPER
@@ -40,8 +46,16 @@ export const createNewChat = async (): Promise<ChatItem> => {
   return await res.json();
 };
 
-export const fetchChatHistory = async (chatId: string): Promise<ChatMessage[]> => {
-  const res = await fetch(`${API_BASE}/chats/${chatId}/history`, {
+// Newest page by default; pass the previous page's next_before to load older messages
+export const fetchChatHistory = async (
+  chatId: string,
+  before: number | null = null,
+  limit = 50
+): Promise<ChatHistoryPage> => {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (before !== null) params.set("before", String(before));
+
+  const res = await fetch(`${API_BASE}/chats/${chatId}/history?${params}`, {
     headers: { ...getAuthHeaders() }
   });
   return await res.json();
@@ -86,6 +100,55 @@ export const sendMessage = async (text: string, chatId: string | null) => {
   return await res.json();
 };
 
+export interface ChatStreamEvent {
+  type: "start" | "token" | "search" | "done" | "error";
+  chat_id?: string;
+  query?: string;
+  text?: string;
+  response?: string;
+  cached?: boolean;
+  detail?: string;
+}
+
+// Streams /chat/stream (Server-Sent Events) and calls onEvent as each event arrives
+export const streamMessage = async (
+  text: string,
+  chatId: string | null,
+  onEvent: (event: ChatStreamEvent) => void
+) => {
+  const res = await fetch(`${API_BASE}/chat/stream`, {
+    method: "POST",
+    headers: {
+        "Content-Type": "application/json",
+        ...getAuthHeaders()
+    },
+    body: JSON.stringify({ text, chatId: chatId }),
+  });
+
+  if (res.status === 401) {
+    window.location.href = "/login";
+    return;
+  }
+  if (!res.ok || !res.body) throw new Error(`Chat stream failed (${res.status})`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const frames = buffer.split("\n\n");
+    buffer = frames.pop() ?? "";
+
+    for (const frame of frames) {
+      if (frame.startsWith("data: ")) onEvent(JSON.parse(frame.slice(6)));
+    }
+  }
+};
+
 // MULTIMEDIA (Vision/Voice)
 export const sendImageQuestion = async (file: File, question: string, chatId: string | null) => {
     const form = new FormData();
@@ -116,6 +179,28 @@ export async function sendAudio(audio: Blob, chatId: string | null) {
 }
 
 
+const playStream = async (body: ReadableStream<Uint8Array>) => {
+  const mediaSource = new MediaSource();
+  const audio = new Audio(URL.createObjectURL(mediaSource));
+  await new Promise((resolve) => mediaSource.addEventListener("sourceopen", resolve, { once: true }));
+
+  const buffer = mediaSource.addSourceBuffer("audio/mpeg");
+  const reader = body.getReader();
+  let started = false;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer.appendBuffer(value);
+    await new Promise((resolve) => buffer.addEventListener("updateend", resolve, { once: true }));
+    if (!started) {
+      started = true;
+      audio.play();
+    }
+  }
+  mediaSource.endOfStream();
+};
+
 export const playTTS = async (text: string) => {
   try {
     const res = await fetch(`${API_BASE}/tts`, {
@@ -126,6 +211,12 @@ export const playTTS = async (text: string) => {
 
     if (!res.ok) throw new Error("TTS Generation failed");
 
+    // Start playing as soon as the first mp3 chunk arrives, where the browser allows it
+    if (res.body && typeof MediaSource !== "undefined" && MediaSource.isTypeSupported("audio/mpeg")) {
+      await playStream(res.body);
+      return;
+    }
+
     const blob = await res.blob();
     const audioUrl = URL.createObjectURL(blob);
     const audio = new Audio(audioUrl);
@@ -134,3 +225,95 @@ export const playTTS = async (text: string) => {
     console.error("Audio Playback Error:", e);
   }
 };
+
+// Sentence boundary: terminal punctuation before whitespace, or a line break
+const SENTENCE_END = /(?<=[.!?…])["')\]]*\s+|\n+/g;
+const MIN_SENTENCE_CHARS = 20;
+
+// Incremental splitter for streamed tokens; mirrors tts_services.SentenceSplitter
+export const createSentenceSplitter = () => {
+  let buffer = "";
+  return {
+    feed(text: string): string[] {
+      buffer += text;
+      const sentences: string[] = [];
+      let start = 0;
+      for (const match of buffer.matchAll(SENTENCE_END)) {
+        const end = (match.index ?? 0) + match[0].length;
+        const sentence = buffer.slice(start, end).trim();
+        if (sentence.length >= MIN_SENTENCE_CHARS) {
+          sentences.push(sentence);
+          start = end;
+        }
+      }
+      buffer = buffer.slice(start);
+      return sentences;
+    },
+    flush(): string[] {
+      const rest = buffer.trim();
+      buffer = "";
+      return rest ? [rest] : [];
+    },
+  };
+};
+
+export interface SpeechQueue {
+  push: (sentence: string) => void;
+  finished: () => Promise<void>;
+  stop: () => void;
+  spoken: () => boolean;
+}
+
+// Speak sentences in order as they are pushed. Each sentence's audio is fetched
+// as soon as it is pushed, so sentence N+1 is synthesized while sentence N plays.
+export const createSpeechQueue = (onSpeakingChange: (speaking: boolean) => void): SpeechQueue => {
+  let chain = Promise.resolve();
+  let current: HTMLAudioElement | null = null;
+  let stopped = false;
+  let pushed = false;
+
+  const fetchClip = (text: string) =>
+    fetch(`${API_BASE}/tts`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ text }),
+    })
+      .then((res) => (res.ok ? res.blob() : null))
+      .catch(() => null);
+
+  const play = (clip: Blob | null) =>
+    new Promise<void>((resolve) => {
+      if (stopped || !clip) return resolve();
+      const audio = new Audio(URL.createObjectURL(clip));
+      current = audio;
+      audio.onended = audio.onerror = () => {
+        current = null;
+        resolve();
+      };
+      audio.play().catch(() => resolve());
+    });
+
+  return {
+    push(sentence: string) {
+      if (stopped || !sentence.trim()) return;
+      if (!pushed) onSpeakingChange(true);
+      pushed = true;
+      const clip = fetchClip(sentence);
+      chain = chain.then(async () => play(await clip));
+    },
+    finished() {
+      return chain.then(() => {
+        if (!stopped) onSpeakingChange(false);
+      });
+    },
+    stop() {
+      stopped = true;
+      current?.pause();
+      current = null;
+      onSpeakingChange(false);
+    },
+    spoken() {
+      return pushed;
+    },
+  };
+};
@@ -34,31 +34,65 @@ export default function ChatInterface() {
   // UI STATE 
   const [showSidebar, setShowSidebar] = useState(false);
   const [activeChatId, setActiveChatId] = useState<string | null>(null);
+  // Cursor for the next older page of the open chat; null once the start is loaded
+  const [olderCursor, setOlderCursor] = useState<number | null>(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
 
   // REFS 
   const mediaRecorderRef = useRef<MediaRecorder | null>(null);
   const audioChunksRef = useRef<Blob[]>([]);
   const chatEndRef = useRef<HTMLDivElement | null>(null);
+  const skipScrollRef = useRef(false);
+  const activeChatIdRef = useRef<string | null>(null);
   
   const audioPlayerRef = useRef<HTMLAudioElement | null>(null);
+  const speechQueueRef = useRef<api.SpeechQueue | null>(null);
 
-  // Scroll to bottom
   useEffect(() => {
+    activeChatIdRef.current = activeChatId;
+  }, [activeChatId]);
+
+  // Scroll to bottom (but not when older messages were prepended)
+  useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     chatEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
+  const formatHistory = (page: api.ChatHistoryPage): Message[] =>
+    page.messages.map((h: { role: string; content: string }) => ({
+      sender: h.role === "human" ? "user" : "jarvis",
+      text: h.content
+    }));
+
   // SIDEBAR ACTIONS
   const handleSelectChat = async (id: string) => {
     stopSpeaking(); 
     setActiveChatId(id);
-    const history = await api.fetchChatHistory(id);
-    
-    const formatted: Message[] = history.map((h: { role: string; content: string }) => ({
-        sender: h.role === "human" ? "user" : "jarvis",
-        text: h.content
-    }));
-    
-    setMessages(formatted);
+    const page = await api.fetchChatHistory(id);
+
+    setMessages(formatHistory(page));
+    setOlderCursor(page.next_before);
+  };
+
+  const handleLoadOlder = async () => {
+    if (!activeChatId || olderCursor === null || isLoadingOlder) return;
+    const chatId = activeChatId;
+    setIsLoadingOlder(true);
+    try {
+      const page = await api.fetchChatHistory(chatId, olderCursor);
+      // Ignore the page if the user switched chats meanwhile
+      if (chatId !== activeChatIdRef.current) return;
+      skipScrollRef.current = true;
+      setMessages((prev) => [...formatHistory(page), ...prev]);
+      setOlderCursor(page.next_before);
+    } catch (error) {
+      console.error("Error loading older messages:", error);
+    } finally {
+      setIsLoadingOlder(false);
+    }
   };
 
   const handleNewChat = async () => {
@@ -66,6 +100,7 @@ export default function ChatInterface() {
     const newChat = await api.createNewChat();
     setActiveChatId(newChat.chat_id);
     setMessages([]); 
+    setOlderCursor(null);
   };
 
   // Initial Load
@@ -198,14 +233,43 @@ export default function ChatInterface() {
 
   const processResponse = async (text: string) => {
     try {
-      const data = await api.sendMessage(text, activeChatId);
-      
-      if (data.chat_id && data.chat_id !== activeChatId) {
-          setActiveChatId(data.chat_id);
-      }
+      let started = false;
+      let finalText = "";
+
+      // Speak each sentence as soon as it is complete, while the rest is still generating
+      stopSpeaking();
+      const speech = api.createSpeechQueue(setIsSpeaking);
+      const splitter = api.createSentenceSplitter();
+      speechQueueRef.current = speech;
+
+      await api.streamMessage(text, activeChatId, (event) => {
+        if (event.type === "start" && event.chat_id && event.chat_id !== activeChatId) {
+          setActiveChatId(event.chat_id);
+        } else if (event.type === "token" && event.text) {
+          splitter.feed(event.text).forEach(speech.push);
+          if (started) {
+            updateLastMessage((prev) => prev + event.text);
+          } else {
+            addMessage("jarvis", event.text);
+            started = true;
+          }
+        } else if (event.type === "done" || event.type === "error") {
+          finalText = event.response ?? "I'm having trouble connecting to my brain right now.";
+          if (started) {
+            updateLastMessage(() => finalText);
+          } else {
+            addMessage("jarvis", finalText);
+          }
+        }
+      });
 
-      addMessage("jarvis", data.response);
-      await playAudioResponse(data.response);
+      if (speech.spoken()) {
+        splitter.flush().forEach(speech.push);
+        await speech.finished();
+      } else {
+        // Nothing was streamed (e.g. a local action), so speak the final reply
+        await playAudioResponse(finalText);
+      }
 
     } catch (error) {
       console.error("Error fetching chat response:", error);
@@ -215,6 +279,8 @@ export default function ChatInterface() {
 
   // TTS & ANIMATION 
   const stopSpeaking = () => {
+    speechQueueRef.current?.stop();
+    speechQueueRef.current = null;
     if (audioPlayerRef.current) {
         audioPlayerRef.current.pause();
         audioPlayerRef.current.currentTime = 0;
@@ -229,7 +295,7 @@ export default function ChatInterface() {
     setIsSpeaking(true); 
 
     try {
-        const res = await fetch("https://jarvis-06fa.onrender.com/tts", {
+        const res = await fetch("https://jarvis-06fa.onrender.com/tts/stream", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ text })
@@ -259,6 +325,14 @@ export default function ChatInterface() {
     setMessages((prev) => [...prev, { sender, text: safeText }]);
   };
 
+  const updateLastMessage = (update: (prev: string) => string) => {
+    setMessages((prev) => {
+      if (prev.length === 0) return prev;
+      const last = prev[prev.length - 1];
+      return [...prev.slice(0, -1), { ...last, text: update(last.text) }];
+    });
+  };
+
   return (
     <div className="jarvis-container">
       {/* LEFT PANEL: Logo + Orb */}
@@ -286,6 +360,11 @@ export default function ChatInterface() {
 
         <div className="chat-container">
           <div className="chat-window">
+            {olderCursor !== null && (
+              <button type="button" className="btn btn--small load-older" onClick={handleLoadOlder} disabled={isLoadingOlder}>
+                {isLoadingOlder ? "LOADING..." : "LOAD OLDER"}
+              </button>
+            )}
             {messages.length === 0 && <div className="system-text">System Online. Awaiting Input...</div>}
             {messages.map((msg, i) => {
               // Safety check inside render loop